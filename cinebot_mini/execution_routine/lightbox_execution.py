@@ -1,4 +1,5 @@
 from cinebot_mini.robot_abstraction.robot import Robot
+from cinebot_mini.execution_routine.trajectory_validation import check_trajectory
 from cinebot_mini.web_utils.camera_client import *
 from cinebot_mini.web_utils.display_client import *
 import numpy as np
@@ -20,10 +21,17 @@ class LightboxExecution:
                  robot: Robot,
                  config_trajectory,
                  renderer_dir,
-                 duration):
+                 duration,
+                 check_limits=True):
+        """
+        check_limits: check the trajectory against the joint bounds of the robot before
+            every execution. The servos settle between frames, so the velocity and
+            acceleration limits are not checked, see trajectory_validation.check_trajectory()
+        """
         self.robot = robot
         self.config_trajectory = config_trajectory
         self.duration = duration
+        self.check_limits = check_limits
 
         self.param_dict = None
         self.photo_data = OrderedDict()
@@ -87,6 +95,9 @@ class LightboxExecution:
         frame_time = self.duration / len(self.config_trajectory)
         if frame_time < self.MIN_FRAME_TIME:
             raise RuntimeError("Unarchiveable frame rate.")
+        if self.check_limits:
+            check_trajectory(self.robot, self.config_trajectory[:self.max_available_frame], 1.0 / frame_time,
+                             bounds_only=True)
 
         start_time = time.time()
         last_time = time.time()
@@ -1,6 +1,7 @@
 from cinebot_mini import TRANSFORMS
 from cinebot_mini.robot_abstraction.cinebot import get_cinebot_chain
 from cinebot_mini.geometry_utils.transformation_tree import TransformationTree
+from cinebot_mini.geometry_utils import se3
 from cinebot_mini.web_utils.blender_client import *
 import numpy as np
 import os
@@ -71,16 +72,15 @@ class LightBoxPlanner:
 
     def set_subject_virtual_transform(self, transform):
         subject_to_real_root = self.tf_tree.get_transform(self.subject_name, self.real_root_name)
-        real_to_virtual_root = transform @ np.linalg.inv(subject_to_real_root)
-        self.tf_tree.transforms[self.real_root_name] = real_to_virtual_root
+        real_to_virtual_root = se3.compose(transform, se3.inverse(subject_to_real_root))
+        self.tf_tree.set_node_transform(self.real_root_name, real_to_virtual_root)
 
     def set_all_animation(self, subject_trajectory, robot_config_history):
         if type(subject_trajectory) != list and len(subject_trajectory.shape) == 2:
             subject_trajectory = [subject_trajectory] * len(robot_config_history)
 
-        frame_transforms = dict()
-        for frame_name in self.tf_tree.transforms.keys():
-            frame_transforms[frame_name] = []
+        frame_names = list(self.tf_tree.transforms.keys())
+        for frame_name in frame_names:
             if not test_object_exist(frame_name):
                 if frame_name.endswith("_camera"):
                     create_object(frame_name, type="CAMERA")
@@ -90,15 +90,19 @@ class LightBoxPlanner:
 
         max_len = min(len(subject_trajectory), len(robot_config_history))
         self.animation_length = max_len
-        for t in range(max_len):
-            self.set_subject_virtual_transform(subject_trajectory[t])
-            self.tf_tree.set_chain_state(self.robot_chain.name, robot_config_history[t])
-            for frame_name in self.tf_tree.transforms.keys():
-                frame_transforms[frame_name].append(
-                    self.tf_tree.get_transform(frame_name))
-
-        for frame_name in self.tf_tree.transforms.keys():
-            set_animation_matrix(frame_name, frame_transforms[frame_name])
+        # same as set_subject_virtual_transform on every frame
+        subject_to_real_root = self.tf_tree.get_transform(self.subject_name, self.real_root_name)
+        real_to_virtual_root = se3.compose(np.array(subject_trajectory[:max_len]), se3.inverse(subject_to_real_root))
+        frame_transforms = self.tf_tree.get_transforms_trajectory(
+            frame_names,
+            {self.robot_chain.name: np.array(robot_config_history[:max_len])},
+            {self.real_root_name: real_to_virtual_root})
+        # leave the tree at the last frame
+        self.set_subject_virtual_transform(subject_trajectory[max_len - 1])
+        self.tf_tree.set_chain_state(self.robot_chain.name, robot_config_history[max_len - 1])
+
+        for k, frame_name in enumerate(frame_names):
+            set_animation_matrix(frame_name, frame_transforms[:, k])
 
         for screen_name in self.screens:
             self.set_camera(screen_name)
@@ -0,0 +1,155 @@
+from cinebot_mini.robot_abstraction.robot import Robot
+from collections import deque
+import threading
+import time
+import os
+
+
+class MotionController(threading.Thread):
+    """
+    Thread that owns the servo bus and sends timestamped joint targets from a
+    bounded buffer. Producers call push() or push_trajectory() from any thread
+    and never wait for the motion thread: the lock of the buffer is only held
+    for the capacity check and the append or popleft, never while sending.
+    While the controller runs, nothing else should talk to the robot.
+
+    The handoff is not lock-free on purpose. A single deque append or popleft
+    is atomic under the GIL, but Python has no compare-and-swap to make the
+    capacity check and the append one atomic step, and push_trajectory()
+    queues all its frames or none. A short lock is the simplest correct way
+    to get both, and without bus I/O inside it, it costs microseconds.
+
+    Counters:
+    overruns: targets rejected because the buffer was full
+    underruns: times the buffer ran empty in the middle of a motion, i.e.
+        before the target marked as the end of a stream was sent
+    late_frames: targets sent more than one period after their timestamp
+    """
+    def __init__(self, robot: Robot, capacity=1024, rate_hz=120.0, priority=None, spin_time=0.002):
+        """
+        capacity: maximum number of queued targets
+        rate_hz: polling rate of the motion thread when the buffer is empty
+        priority: optional SCHED_FIFO priority for the motion thread (Linux,
+            needs the corresponding privileges)
+        """
+        super().__init__(daemon=True)
+        self.robot = robot
+        self.capacity = capacity
+        self.period = 1.0 / rate_hz
+        self.priority = priority
+        self.spin_time = spin_time
+
+        self.buffer = deque()
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.streaming = False
+
+        self.overruns = 0
+        self.underruns = 0
+        self.late_frames = 0
+        self.sent_frames = 0
+
+    def push(self, joint_angles, timestamp=None, end_of_stream=False):
+        """
+        joint_angles: joint configuration to send
+        timestamp: time.perf_counter() time at which the target is due,
+            None to send it as soon as possible
+        end_of_stream: True if no target is expected to follow this one
+        Return False if the buffer is full and the target was dropped.
+        """
+        return self._push((timestamp, joint_angles, False, end_of_stream))
+
+    def push_trajectory(self, config_trajectory, fps, start_time=None):
+        """
+        Compile a whole trajectory with the robot and queue its frames at
+        start_time + i / fps, the last one marked as the end of the stream.
+        Return False if the free capacity is smaller than the trajectory, then
+        no frame is queued and every frame counts as an overrun.
+        """
+        frames = self.robot.compile_trajectory(config_trajectory)
+        if start_time is None:
+            start_time = time.perf_counter()
+        return self._push(*[(start_time + i / fps, frame, True, i == len(frames) - 1)
+                            for i, frame in enumerate(frames)])
+
+    def _push(self, *items):
+        with self.lock:
+            if len(self.buffer) + len(items) > self.capacity:
+                self.overruns += len(items)
+                return False
+            self.buffer.extend(items)
+        return True
+
+    def _pop(self):
+        with self.lock:
+            return self.buffer.popleft() if len(self.buffer) > 0 else None
+
+    def clear(self):
+        with self.lock:
+            self.buffer.clear()
+
+    def pending(self):
+        return len(self.buffer)
+
+    def counters(self):
+        return {
+            "overruns": self.overruns,
+            "underruns": self.underruns,
+            "late_frames": self.late_frames,
+            "sent_frames": self.sent_frames,
+            "pending": len(self.buffer)
+        }
+
+    def stop(self, timeout=None):
+        """
+        Stop the motion thread, also while it waits for a target due later.
+        Targets still in the buffer are not sent.
+        """
+        self.stopping.set()
+        self.join(timeout)
+
+    def _sleep_until(self, deadline):
+        """
+        Like playback.sleep_until, but the sleeping part wakes up on stop().
+        Return False if the controller was stopped.
+        """
+        sleep_time = deadline - time.perf_counter() - self.spin_time
+        if sleep_time > 0 and self.stopping.wait(sleep_time):
+            return False
+        while time.perf_counter() < deadline:
+            pass
+        return True
+
+    def run(self):
+        if self.priority is not None:
+            self._set_realtime_priority(self.priority)
+
+        while not self.stopping.is_set():
+            item = self._pop()
+            if item is None:
+                if self.streaming:
+                    self.underruns += 1
+                    self.streaming = False
+                self.stopping.wait(self.period)
+                continue
+
+            timestamp, frame, compiled, end_of_stream = item
+            if timestamp is not None:
+                if not self._sleep_until(timestamp):
+                    break
+                if time.perf_counter() - timestamp > self.period:
+                    self.late_frames += 1
+
+            if compiled:
+                self.robot.send_compiled_frame(frame)
+            else:
+                self.robot.set_joint_angles(frame)
+            self.sent_frames += 1
+            self.streaming = not end_of_stream
+
+    def _set_realtime_priority(self, priority):
+        try:
+            # pid 0 applies to the calling thread on Linux
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except (AttributeError, OSError) as e:
+            print("Could not set real-time priority for motion thread:", e)
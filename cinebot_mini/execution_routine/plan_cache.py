@@ -0,0 +1,115 @@
+import numpy as np
+import hashlib
+import os
+import tempfile
+
+# bump when planner output changes for the same inputs, so old entries are not reused
+CACHE_VERSION = 1
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser("~"), ".cinebot_mini", "plan_cache")
+
+
+def _update_hash(digest, value):
+    if value is None:
+        digest.update(b"N")
+    elif isinstance(value, str):
+        digest.update(b"S" + str(len(value)).encode() + b":" + value.encode())
+    elif isinstance(value, dict):
+        digest.update(b"D" + str(len(value)).encode())
+        for key in sorted(value):
+            _update_hash(digest, key)
+            _update_hash(digest, value[key])
+    elif isinstance(value, (list, tuple)) and \
+            not all(np.isscalar(item) and not isinstance(item, str) for item in value):
+        # lists of numbers are hashed as arrays, anything else item by item
+        digest.update(b"L" + str(len(value)).encode())
+        for item in value:
+            _update_hash(digest, item)
+    else:
+        array = np.ascontiguousarray(value, dtype=float)
+        digest.update(b"A" + str(array.shape).encode() + array.tobytes())
+
+
+def plan_key(*parts):
+    """
+    Content hash of planner inputs.
+    parts: numpy arrays, numbers, strings, None, or (nested) lists, tuples and dicts of them
+    Return: hex digest string
+    """
+    digest = hashlib.sha256()
+    _update_hash(digest, CACHE_VERSION)
+    for part in parts:
+        _update_hash(digest, part)
+    return digest.hexdigest()
+
+
+class PlanCache:
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=256 * 2**20):
+        """
+        On-disk cache of planned configuration trajectories, one .npy file per key.
+        Reading an entry marks it as recently used, the least recently used entries are
+        deleted when the cache grows beyond max_bytes.
+        directory: cache directory, created if needed
+        max_bytes: maximum total size of the cached trajectories
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def get(self, key):
+        """
+        Return: the cached array, or None if there is no entry for key
+        """
+        path = self._path(key)
+        try:
+            array = np.load(path)
+            os.utime(path)
+        except (IOError, OSError, ValueError):
+            return None
+        return array
+
+    def put(self, key, array):
+        # write to a temporary file first, so readers never see a partial entry
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            np.save(f, np.asarray(array))
+        os.replace(temp_path, self._path(key))
+        self.evict()
+
+    def entries(self):
+        """
+        Return: list of (mtime, size, path) of the cached trajectories, least recently used first
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".npy"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for mtime, size, path in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        for mtime, size, path in self.entries():
+            os.remove(path)
@@ -3,7 +3,13 @@ from cinebot_mini.robot_abstraction.robot import Robot
 from cinebot_mini.geometry_utils import (
     ArcNDInterpolator,
     Gaze3DInterpolator,
+    StreamingArcInterpolator,
     TransformationTree)
+from cinebot_mini.execution_routine.retiming import retime
+from cinebot_mini.execution_routine.plan_cache import plan_key
+from cinebot_mini.geometry_utils.closed_form_ik import chain_parameters
+from cinebot_mini.geometry_utils import se3
+from scipy.interpolate import CubicSpline
 from cinebot_mini.web_utils.blender_client import *
 import numpy as np
 import pickle
@@ -22,25 +28,110 @@ def load_planner(planner, fname):
         setattr(planner, key, val)
 
 
+def pose_errors(poses, other_poses):
+    """
+    Per frame distance of two pose trajectories, the larger of the position error
+    (meters) and the rotation angle between them (radians).
+    poses, other_poses: arrays of shape (N, 4, 4)
+    Return: array of shape (N,)
+    """
+    position_error = np.linalg.norm(poses[:, :3, 3] - other_poses[:, :3, 3], axis=1)
+    rotation_error = np.linalg.norm(se3.rotation_log(
+        np.matmul(np.swapaxes(poses[:, :3, :3], 1, 2), other_poses[:, :3, :3])), axis=1)
+    return np.maximum(position_error, rotation_error)
+
+
+def sync_live_path(live_path, points):
+    """
+    Update a StreamingArcInterpolator to the recorded points: points edited, removed
+    or added since the last call are refit from the first changed one on.
+    """
+    if live_path is None:
+        live_path = StreamingArcInterpolator()
+    num_common = min(live_path.num_points, len(points))
+    if num_common > 0:
+        changed = np.any(live_path.points[:num_common] != np.array(points[:num_common]), axis=1)
+        if np.any(changed):
+            num_common = np.argmax(changed)
+    live_path.truncate(num_common)
+    for point in points[num_common:]:
+        live_path.append(point)
+    return live_path
+
+
 class DirectPlanner:
     DATA_ATTRS = ["configuration_history"]
 
-    def __init__(self, robot: Robot):
+    def __init__(self, robot: Robot, disk_cache=None):
+        """
+        disk_cache: optional PlanCache, plans of unchanged recordings are then loaded from disk
+        """
         self.robot = robot
         self.configuration_history = []
+        self.live_path = None
+        self.disk_cache = disk_cache
+        self.interpolator = None
+        self.interpolator_key = None
         self.robot.disable_torque()
 
     def record(self):
         self.configuration_history.append(
             self.robot.get_joint_angles())
 
-    def plan(self, duration=5.0, fps=30.0):
+    def live_preview(self):
+        """
+        Joint space path through the recorded configurations, extended in constant
+        time per recorded point, for previews while recording. The preview is a
+        Catmull-Rom curve, plan() fits a B-spline through the same points: both pass
+        through the recorded points, in between they differ by a few percent of the
+        point spacing on smooth recordings and up to half of it at sharp turns.
+        """
+        self.live_path = sync_live_path(self.live_path, self.configuration_history)
+        return self.live_path
+
+    def _interpolator(self, tolerance=None):
+        """
+        Spline through the recorded configurations, refitted only when they change,
+        so planning again at another duration or fps only resamples it.
+        """
         input_config = np.array(self.configuration_history)
-        interpolator = ArcNDInterpolator(input_config, num_cache=20, input_smoothing=0.0)
+        key = plan_key(input_config, tolerance)
+        if self.interpolator is None or self.interpolator_key != key:
+            self.interpolator = ArcNDInterpolator(input_config, num_cache=20, input_smoothing=0.0, tolerance=tolerance)
+            self.interpolator_key = key
+        return self.interpolator
+
+    def plan(self, duration=5.0, fps=30.0, tolerance=None):
+        """
+        tolerance: if given, resample the recorded path adaptively to this maximum joint space error
+        """
+        input_config = np.array(self.configuration_history)
+        key = None
+        if self.disk_cache is not None:
+            key = plan_key("DirectPlanner.plan", input_config, duration, fps, tolerance)
+            cached = self.disk_cache.get(key)
+            if cached is not None:
+                return cached
+
+        interpolator = self._interpolator(tolerance)
         arc_lengths = np.linspace(0, interpolator.length(), int(fps*duration))
         output_config = interpolator.generate(arc_lengths)
+        if key is not None:
+            self.disk_cache.put(key, output_config)
         return output_config
 
+    def plan_retimed(self, fps=30.0, duration=None, eased=False, tolerance=None):
+        """
+        Plan the recorded path on the minimum time schedule allowed by the joint velocity
+        and acceleration limits of the robot, or eased in and out and stretched to duration.
+        Return: (config_trajectory, duration)
+        """
+        interpolator = self._interpolator(tolerance)
+        path = interpolator.generate(np.linspace(0, interpolator.length(), 1000))
+        joint_table = self.robot.get_joint_table()
+        return retime(path, joint_table.velocity_limits, joint_table.acceleration_limits,
+                      fps, duration=duration, eased=eased)
+
     def clear(self):
         self.configuration_history = []
 
@@ -49,9 +140,25 @@ class DirectPlanner:
 
 
 class GazePlanner:
-    DATA_ATTRS = ["configuration_history", "camera_points", "gaze_points", "plan_cache"]
+    DATA_ATTRS = ["configuration_history", "camera_points", "gaze_points", "plan_cache", "plan_grid"]
 
-    def __init__(self, robot: Robot, tf_tree: TransformationTree, duration=5.0, fps=30.0):
+    def __init__(self, robot: Robot, tf_tree: TransformationTree, duration=5.0, fps=30.0, processes=1,
+                 disk_cache=None, resample_tolerance=1e-4, replan_threshold=1e-2, reachability_map=None,
+                 replan_blend_frames=5):
+        """
+        processes: size of the process pool plan() solves IK in, None for one process per CPU.
+            The plan does not depend on it.
+        disk_cache: optional PlanCache, plans of unchanged shots are then loaded from disk
+        resample_tolerance: when only fps or duration changed, plan() resamples the solved joint
+            path and re-solves IK only for frames whose camera pose is off by more than this
+            (meters, radians)
+        replan_threshold: when recorded points changed, plan() solves IK along the frames whose
+            camera pose moved by more than this, and reuses the previous joint path elsewhere
+        reachability_map: optional ReachabilityMap of the robot chain and camera, plan() then
+            warns about unreachable frames before solving IK, see check_feasibility()
+        replan_blend_frames: number of frames on either side of the solved ones over which
+            plan() eases the new solution into the reused joint path
+        """
         self.robot = robot
         self.tf_tree = tf_tree
         self.chain_name = robot.get_chain().name
@@ -59,12 +166,30 @@ class GazePlanner:
         self.end_effector_name = self._robot_chain().links[-1].name
         self.duration = duration
         self.fps = fps
+        self.processes = processes
+        self.disk_cache = disk_cache
 
         self.configuration_history = []
         self.camera_points = []
         self.gaze_points = []
         self.plan_cache = []
+        self.plan_grid = None
         self.cache_dirty = True
+        self.live_camera_path = None
+        self.resample_tolerance = resample_tolerance
+        self.replan_threshold = replan_threshold
+        self.replan_blend_frames = replan_blend_frames
+        self.reachability_map = reachability_map
+
+        # fitted splines, kept across changes of fps and duration
+        self.camera_interpolator = None
+        self.camera_interpolator_key = None
+        self.joint_path = None
+        self.joint_path_key = None
+        self.joint_path_solver_key = None
+        self.joint_path_interpolator = None
+        self.joint_path_grid = None
+        self.joint_path_valid = None
 
         self.robot.disable_torque()
 
@@ -95,57 +220,270 @@ class GazePlanner:
         self.gaze_points.append(gaze_point)
         self.cache_dirty = True
 
-    def _interpolate_camera(self):
+    def live_preview(self):
+        """
+        Camera position path through the recorded camera points, extended in constant
+        time per recorded point, for previews while recording. Differs from the camera
+        path of plan() between the recorded points, see DirectPlanner.live_preview().
+        """
+        self.live_camera_path = sync_live_path(self.live_camera_path, self.camera_points)
+        return self.live_camera_path
+
+    def blender_preview_camera_path(self, num_samples=100, axis_size=0.05):
+        camera_name = "DEBUG_camera_point"
+        if not test_object_exist(camera_name):
+            create_object(camera_name, type="EMPTY")
+            set_property(camera_name, "empty_display_size", axis_size)
+
+        live_path = self.live_preview()
+        camera_positions = live_path.generate(np.linspace(0, live_path.length(), num_samples))
+        camera_poses = np.tile(np.eye(4), (num_samples, 1, 1))
+        camera_poses[:, :3, 3] = camera_positions
+        set_animation_matrix(camera_name, camera_poses)
+
+    def _camera_interpolator(self):
+        """
+        Camera and gaze splines of the recorded points, refitted only when the points change.
+        """
         gaze_points_input = self.gaze_points[0]
         if len(self.gaze_points) > 3:
             gaze_points_input = np.array(self.gaze_points)
-        interpolator = Gaze3DInterpolator(np.array(self.camera_points), gaze_points_input)
-        arc_lengths = np.linspace(
-            0, interpolator.length(), int(self.fps * self.duration))
-        output_camera_poses = interpolator.generate(arc_lengths)
-        return output_camera_poses
+        key = plan_key(np.array(self.camera_points), gaze_points_input)
+        if self.camera_interpolator is None or self.camera_interpolator_key != key:
+            self.camera_interpolator = Gaze3DInterpolator(np.array(self.camera_points), gaze_points_input)
+            self.camera_interpolator_key = key
+        return self.camera_interpolator
+
+    def _arc_lengths(self):
+        return np.linspace(0, self._camera_interpolator().length(), int(self.fps * self.duration))
+
+    def _interpolate_camera(self):
+        return self._camera_interpolator().generate(self._arc_lengths())
+
+    def _solver_key(self):
+        """
+        Hash of what IK depends on besides the camera path: the robot chain, the camera
+        offset from the chain and the IK seed.
+        """
+        params = chain_parameters(self._robot_chain())
+        chain_name, chain_root_to_root, chain_end_to_camera = self.tf_tree.chain_target(self.camera_name)
+        return plan_key(
+            chain_name, params.link_len, params.joint_bounds, params.fk.offsets, params.fk.axes,
+            chain_root_to_root, chain_end_to_camera,
+            np.array(self.configuration_history[0]))
+
+    def _path_key(self):
+        """
+        Hash of everything the joint path depends on: recorded points and the solver.
+        """
+        return plan_key(np.array(self.camera_points), np.array(self.gaze_points), self._solver_key())
+
+    def _fit_joint_path(self, arc_lengths, states, valid, path_key):
+        """
+        Joint space spline through the solved frames, parameterized by camera arc length.
+        """
+        self.joint_path = None
+        self.joint_path_key = None
+        self.joint_path_solver_key = None
+        self.joint_path_interpolator = None
+        self.joint_path_grid = None
+        self.joint_path_valid = None
+        if np.sum(valid) >= 2:
+            self.joint_path = CubicSpline(arc_lengths[valid], states[valid], axis=0)
+            self.joint_path_key = path_key
+            self.joint_path_solver_key = self._solver_key()
+            self.joint_path_interpolator = self._camera_interpolator()
+            self.joint_path_grid = np.array(arc_lengths)
+            self.joint_path_valid = np.array(valid)
+
+    def _bridged(self, arc_lengths):
+        """
+        Frames the joint path only bridges: next to a frame IK failed for when the path was
+        solved, or beyond the first or last solved frame.
+        """
+        grid, grid_valid = self.joint_path_grid, self.joint_path_valid
+        index = np.clip(np.searchsorted(grid, arc_lengths, side="right") - 1, 0, len(grid) - 1)
+        next_index = np.minimum(index + 1, len(grid) - 1)
+        on_knot = np.isclose(arc_lengths, grid[index], rtol=0, atol=1e-12)
+        bridged = ~grid_valid[index] | (~on_knot & ~grid_valid[next_index])
+        x = self.joint_path.x
+        return bridged | (arc_lengths < x[0] - 1e-12) | (arc_lengths > x[-1] + 1e-12)
+
+    def _resample_joint_path(self, arc_lengths, camera_poses):
+        """
+        Sample the joint path on a new grid. Forward kinematics verify every frame, IK is
+        only run for frames off the camera path by more than resample_tolerance, for frames
+        where the spline overshoots the joint bounds, and for frames it bridges over frames
+        IK failed for.
+        arc_lengths: arc lengths of the frames on the camera path the joint path was solved for
+        Return: (states, valid), like TransformationTree.solve_transforms
+        """
+        x = self.joint_path.x
+        states = self.joint_path(np.clip(arc_lengths, x[0], x[-1]))
+        poses = self.tf_tree.get_transforms_trajectory([self.camera_name], {self.chain_name: states})[:, 0]
+        bounds = chain_parameters(self._robot_chain()).bounds_array
+        out_of_bounds = np.any((states < bounds[:, 0]) | (states > bounds[:, 1]), axis=1)
+        deviating = (pose_errors(poses, camera_poses) > self.resample_tolerance) | out_of_bounds | \
+            self._bridged(np.asarray(arc_lengths, dtype=float))
+
+        valid = np.ones(len(states), dtype=bool)
+        if np.any(deviating):
+            states[deviating], valid[deviating] = self.tf_tree.solve_transforms(
+                self.camera_name, camera_poses[deviating], states[deviating])
+        return states, valid
+
+    def _replan_joint_path(self, arc_lengths, camera_poses):
+        """
+        Plan after recorded points changed. Before an edit the new camera path follows the
+        old one, after it the old one shifted by the change in length; the splines only
+        differ noticeably near the edit. The old joint path is reused where the camera moved
+        by less than replan_threshold, see _resample_joint_path. IK solves the frames from
+        the first to the last one that moved more and replan_blend_frames reused frames on
+        either side, seeded with the frame before them, like a full plan. Over those extra
+        frames the solution eases into the reused path. If a blended frame is off the camera
+        path by more than resample_tolerance, e.g. because the solution ended up on another
+        branch than the reused path, the solve continues to the end instead.
+        Return: (states, valid), like TransformationTree.solve_transforms
+        """
+        old_interpolator = self.joint_path_interpolator
+        old_length = old_interpolator.length()
+        shift = self._camera_interpolator().length() - old_length
+        before = np.clip(arc_lengths, 0, old_length)
+        after = np.clip(arc_lengths - shift, 0, old_length)
+        errors_before = pose_errors(old_interpolator.generate(before), camera_poses)
+        errors_after = pose_errors(old_interpolator.generate(after), camera_poses)
+        states, valid = self._resample_joint_path(
+            np.where(errors_after < errors_before, after, before), camera_poses)
+
+        moved = np.flatnonzero(np.minimum(errors_before, errors_after) > self.replan_threshold)
+        if len(moved) == 0:
+            return states, valid
+        blend = self.replan_blend_frames
+        start, stop = max(moved[0] - blend, 0), min(moved[-1] + 1 + blend, len(states))
+        seeds = np.flatnonzero(valid[:start])
+        seed = states[seeds[-1]] if len(seeds) > 0 else self.configuration_history[0]
+        solved, solved_valid = self.tf_tree.solve_transforms(
+            self.camera_name, camera_poses[start:stop], seed, processes=self.processes)
+
+        # weight of the solution, 1 on the moved frames and a smoothstep down to 0 over the blend frames
+        index = np.arange(start, stop)
+        ramp = np.clip(np.minimum(index - moved[0] + blend + 1, moved[-1] + blend + 1 - index) / (blend + 1), 0, 1)
+        weight = ramp**2 * (3 - 2 * ramp)
+        reused, reused_valid = states[start:stop], valid[start:stop]
+        both = solved_valid & reused_valid
+        blended = np.where(solved_valid[:, None], solved, reused)
+        blended[both] = reused[both] + weight[both, None] * (solved[both] - reused[both])
+        blended_valid = solved_valid | (reused_valid & (weight < 1))
+
+        check = both & (weight < 1)
+        if np.any(check):
+            poses = self.tf_tree.get_transforms_trajectory(
+                [self.camera_name], {self.chain_name: blended[check]})[:, 0]
+            if np.any(pose_errors(poses, camera_poses[start:stop][check]) > self.resample_tolerance):
+                states[start:], valid[start:] = self.tf_tree.solve_transforms(
+                    self.camera_name, camera_poses[start:], seed, processes=self.processes)
+                return states, valid
+        states[start:stop], valid[start:stop] = blended, blended_valid
+        return states, valid
+
+    def check_feasibility(self):
+        """
+        Look up every frame of the camera path in the reachability map instead of solving IK.
+        The map is quantized, frames close to the workspace boundary can be misjudged.
+        Return: boolean array of shape (N,), False for frames the robot cannot reach
+        """
+        if self.reachability_map is None:
+            raise RuntimeError("No reachability map.")
+        chain_name, chain_root_to_root, chain_end_to_camera = self.tf_tree.chain_target(self.camera_name)
+        if not np.allclose(chain_end_to_camera, self.reachability_map.camera_offset):
+            raise ValueError("Reachability map was built for another camera offset.")
+        camera_poses = se3.compose(se3.inverse(chain_root_to_root), self._interpolate_camera())
+        return self.reachability_map.lookup_poses(camera_poses) > 0
 
     def plan(self):
-        if self.cache_dirty is False:
+        """
+        Joint configurations for int(fps * duration) frames along the camera path, without the
+        frames IK failed for. When only fps or duration changed since the last plan, the
+        solved joint path is resampled instead of solving IK for every frame again, and when
+        recorded points changed, IK only solves the frames near the change. Only plans solved
+        from scratch go to the disk cache, resampled and replanned ones depend on the
+        planning history.
+        """
+        grid = (self.fps, self.duration)
+        if self.cache_dirty is False and self.plan_grid == grid:
             return self.plan_cache
 
-        # init to configuration history
-        output_camera_poses = self._interpolate_camera()
-        self.tf_tree.set_chain_state(self.chain_name, self.configuration_history[0])
+        path_key = self._path_key()
+        key = None
+        if self.disk_cache is not None:
+            key = plan_key("GazePlanner.plan", path_key, self.duration, self.fps)
+            cached = self.disk_cache.get(key)
+            if cached is not None:
+                self.plan_cache = list(cached)
+                self.plan_grid = grid
+                self.cache_dirty = False
+                return self.plan_cache
+
+        if self.reachability_map is not None:
+            unreachable = np.flatnonzero(~self.check_feasibility())
+            if len(unreachable) > 0:
+                print("Reachability map: {} of {} frames are not reachable, first at i={}".format(
+                    len(unreachable), int(self.fps * self.duration), unreachable[0]))
+
+        arc_lengths = self._arc_lengths()
+        output_camera_poses = self._camera_interpolator().generate(arc_lengths)
+        if self.joint_path is not None and self.joint_path_key == path_key:
+            states, valid = self._resample_joint_path(arc_lengths, output_camera_poses)
+            key = None
+        elif self.joint_path is not None and self.joint_path_solver_key == self._solver_key():
+            states, valid = self._replan_joint_path(arc_lengths, output_camera_poses)
+            self._fit_joint_path(arc_lengths, states, valid, path_key)
+            key = None
+        else:
+            # init to configuration history
+            states, valid = self.tf_tree.solve_transforms(
+                self.camera_name, output_camera_poses, self.configuration_history[0], processes=self.processes)
+            self._fit_joint_path(arc_lengths, states, valid, path_key)
         output_configs = []
         for i in range(len(output_camera_poses)):
-            camera_pose = output_camera_poses[i]
-            # self.tf_tree.set_chain_state(self.chain_name, [0,0,0,0,0,0])
-            try:
-                self.tf_tree.set_transform(self.camera_name, camera_pose)
-                config = self.tf_tree.chain_states[self.chain_name]
-                output_configs.append(config)
-            except RuntimeError as e:
-                config = self.tf_tree.chain_states[self.chain_name]
+            if valid[i]:
+                output_configs.append(states[i])
+            else:
+                config = output_configs[-1] if len(output_configs) > 0 else self.configuration_history[0]
                 print("IK Failed at i={}, previous configuration:". format(i), config)
-                print("Camera pose:", camera_pose)
+                print("Camera pose:", output_camera_poses[i])
 
         self.plan_cache = output_configs
+        self.plan_grid = grid
         self.cache_dirty = False
+        if key is not None:
+            self.disk_cache.put(key, np.array(output_configs).reshape(-1, len(self.configuration_history[0])))
         return output_configs
 
+    def plan_retimed(self, fps=None, duration=None, eased=False):
+        """
+        Retime the planned joint path to the minimum time schedule allowed by the joint
+        velocity and acceleration limits of the robot, or eased in and out and stretched
+        to duration, sampled at fps (defaults to the planner fps).
+        Return: (config_trajectory, duration)
+        """
+        joint_table = self.robot.get_joint_table()
+        return retime(np.array(self.plan()), joint_table.velocity_limits, joint_table.acceleration_limits,
+                      fps or self.fps, duration=duration, eased=eased)
+
     def blender_animate(self, axis_size=0.05):
-        frame_transforms = dict()
-        for frame_name in self.tf_tree.transforms.keys():
-            frame_transforms[frame_name] = []
+        frame_names = list(self.tf_tree.transforms.keys())
+        for frame_name in frame_names:
             if not test_object_exist(frame_name):
                 create_object(frame_name, type="EMPTY")
                 set_property(frame_name, "empty_display_size", axis_size)
 
         output_configs = self.plan()
-        for i in range(len(output_configs)):
-            self.tf_tree.set_chain_state(self.chain_name, output_configs[i])
-            for frame_name in self.tf_tree.transforms.keys():
-                frame_transforms[frame_name].append(
-                    self.tf_tree.get_transform(frame_name))
-
-        for frame_name in self.tf_tree.transforms.keys():
-            set_animation_matrix(frame_name, frame_transforms[frame_name])
+        frame_transforms = self.tf_tree.get_transforms_trajectory(
+            frame_names, {self.chain_name: np.array(output_configs)})
+
+        for k, frame_name in enumerate(frame_names):
+            set_animation_matrix(frame_name, frame_transforms[:, k])
 
     def blender_animate_input(self, axis_size=0.05):
         point_name = "DEBUG_gaze_point"
@@ -0,0 +1,87 @@
+from cinebot_mini.robot_abstraction.robot import Robot
+import numpy as np
+import time
+
+
+def sleep_until(deadline, spin_time=0.002):
+    """
+    Sleep until time.perf_counter() reaches deadline. time.sleep() is only
+    used up to spin_time before the deadline, the rest is busy-waited.
+    """
+    sleep_time = deadline - time.perf_counter() - spin_time
+    if sleep_time > 0:
+        time.sleep(sleep_time)
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TrajectoryPlayer:
+    """
+    Plays back a joint trajectory compiled ahead of time by the robot
+    (e.g. raw encoder packets for Cinebot). Frame i is sent at the absolute
+    deadline start + i / fps on a monotonic clock, so timing errors do not
+    accumulate and the whole trajectory lasts exactly len / fps seconds.
+    """
+    def __init__(self, robot: Robot, config_trajectory, fps, spin_time=0.002):
+        self.robot = robot
+        self.config_trajectory = config_trajectory
+        self.fps = fps
+        self.spin_time = spin_time
+        self.frames = None
+        self.stats = None
+
+    def compile(self):
+        self.frames = self.robot.compile_trajectory(self.config_trajectory)
+
+    def play(self, verbose=True):
+        """
+        Return a dictionary of timing statistics, all times in seconds.
+        """
+        if self.frames is None:
+            self.compile()
+
+        num_frames = len(self.frames)
+        period = 1.0 / self.fps
+        send_times = np.zeros(num_frames)
+        done_times = np.zeros(num_frames)
+
+        start_time = time.perf_counter()
+        deadlines = start_time + np.arange(num_frames) * period
+        for i in range(num_frames):
+            sleep_until(deadlines[i], self.spin_time)
+            send_times[i] = time.perf_counter()
+            self.robot.send_compiled_frame(self.frames[i])
+            done_times[i] = time.perf_counter()
+        sleep_until(start_time + num_frames * period, self.spin_time)
+        end_time = time.perf_counter()
+
+        self.stats = self.compute_stats(deadlines, send_times, done_times, start_time, end_time)
+        if verbose:
+            self.print_stats(self.stats)
+        return self.stats
+
+    def compute_stats(self, deadlines, send_times, done_times, start_time, end_time):
+        period = 1.0 / self.fps
+        lateness = send_times - deadlines
+        jitter = np.diff(send_times) - period
+        if len(jitter) == 0:
+            jitter = np.zeros(1)
+        return {
+            "num_frames": len(deadlines),
+            "total_time": end_time - start_time,
+            "expected_time": len(deadlines) * period,
+            "mean_lateness": float(np.mean(lateness)),
+            "max_lateness": float(np.max(lateness)),
+            "num_late_frames": int(np.sum(lateness > period)),
+            "jitter_std": float(np.std(jitter)),
+            "max_jitter": float(np.max(np.abs(jitter))),
+            "mean_send_time": float(np.mean(done_times - send_times)),
+            "max_send_time": float(np.max(done_times - send_times))
+        }
+
+    def print_stats(self, stats):
+        print("Total time: {:.4f} (expected {:.4f})".format(stats["total_time"], stats["expected_time"]))
+        print("Lateness: mean {:.6f}, max {:.6f}, {} of {} frames later than one period".format(
+            stats["mean_lateness"], stats["max_lateness"], stats["num_late_frames"], stats["num_frames"]))
+        print("Jitter: std {:.6f}, max {:.6f}".format(stats["jitter_std"], stats["max_jitter"]))
+        print("Send time: mean {:.6f}, max {:.6f}".format(stats["mean_send_time"], stats["max_send_time"]))
@@ -0,0 +1,210 @@
+from scipy.interpolate import CubicSpline
+import numpy as np
+
+""" Upper bound of the path acceleration when no joint constrains it """
+UNBOUNDED = 1e9
+
+
+def path_spline(path):
+    """
+    Cubic spline through a joint path, parameterized by joint space chord length.
+    path: array of shape (M, num_joints), configurations along the path
+    Return: scipy CubicSpline, or None if the path does not move
+    """
+    path = np.asarray(path, dtype=float)
+    chords = np.linalg.norm(np.diff(path, axis=0), axis=1)
+    # drop repeated configurations, the parameter has to be increasing
+    keep = np.concatenate([[True], chords > 1e-9])
+    if np.sum(keep) < 2:
+        return None
+    s = np.concatenate([[0.0], np.cumsum(chords)])[keep]
+    return CubicSpline(s, path[keep], axis=0, bc_type="natural")
+
+
+def _path_acceleration_bounds(dq, ddq, x, acceleration_limits):
+    """
+    Bounds of the path acceleration u = s'' from |dq u + ddq x| <= acceleration_limits.
+    dq, ddq: first and second derivative of the path by s at one sample
+    x: squared path velocity s'^2
+    """
+    moving = np.abs(dq) > 1e-9
+    if not np.any(moving):
+        return -UNBOUNDED, UNBOUNDED
+    dq = dq[moving]
+    low = (-acceleration_limits[moving] - ddq[moving] * x) / dq
+    high = (acceleration_limits[moving] - ddq[moving] * x) / dq
+    return np.max(np.minimum(low, high)), np.min(np.maximum(low, high))
+
+
+def _acceleration_limit_curve(dq, ddq, acceleration_limits, x_max, iterations=60):
+    """
+    Largest squared path velocity at every sample for which some path acceleration satisfies
+    all joint acceleration limits, found by bisection below x_max. The feasible squared
+    velocities at a sample form an interval starting at 0.
+    """
+    moving = np.abs(dq) > 1e-9
+    safe_dq = np.where(moving, dq, 1.0)
+
+    def feasible(x):
+        low = (-acceleration_limits - ddq * x[:, None]) / safe_dq
+        high = (acceleration_limits - ddq * x[:, None]) / safe_dq
+        u_min = np.max(np.where(moving, np.minimum(low, high), -np.inf), axis=1)
+        u_max = np.min(np.where(moving, np.maximum(low, high), np.inf), axis=1)
+        return u_min <= u_max
+
+    lower = np.zeros(len(dq))
+    upper = np.array(x_max, dtype=float)
+    done = feasible(upper)
+    lower[done] = upper[done]
+    for _ in range(iterations):
+        middle = (lower + upper) / 2
+        ok = feasible(middle)
+        lower = np.where(ok, middle, lower)
+        upper = np.where(ok, upper, middle)
+    return lower
+
+
+def time_optimal_parameterization(s, dq, ddq, velocity_limits, acceleration_limits):
+    """
+    Fastest traversal of a path under per-joint velocity and acceleration limits,
+    starting and ending at rest. Forward/backward integration of the squared path
+    velocity x = s'^2 (TOPP): the forward pass accelerates as hard as allowed, the
+    backward pass brakes in time for the velocity limit curve and the end.
+    s: uniform path parameter of shape (M,)
+    dq, ddq: first and second derivative of the path by s, shape (M, num_joints)
+    Return: (t, s_dot), times and path velocities at the samples, shape (M,).
+        The path acceleration is constant between samples.
+    """
+    velocity_limits = np.asarray(velocity_limits, dtype=float)
+    acceleration_limits = np.asarray(acceleration_limits, dtype=float)
+    num_samples = len(s)
+    ds = s[1] - s[0]
+
+    # velocity limit curve, and the acceleration limit where a joint only moves from curvature
+    abs_dq = np.abs(dq)
+    moving = abs_dq > 1e-9
+    x_max = np.min(np.where(moving, velocity_limits / np.maximum(abs_dq, 1e-9), np.sqrt(UNBOUNDED)), axis=1) ** 2
+    curved = ~moving & (np.abs(ddq) > 1e-9)
+    x_max = np.minimum(x_max, np.min(np.where(
+        curved, acceleration_limits / np.maximum(np.abs(ddq), 1e-9), UNBOUNDED), axis=1))
+    # above this curve the joint accelerations cannot all be met, whatever the path acceleration
+    x_max = _acceleration_limit_curve(dq, ddq, acceleration_limits, x_max)
+
+    x = np.zeros(num_samples)
+    for i in range(num_samples - 1):
+        u_min, u_max = _path_acceleration_bounds(dq[i], ddq[i], x[i], acceleration_limits)
+        x[i + 1] = min(x_max[i + 1], max(x[i] + 2 * ds * u_max, 0.0))
+    x[-1] = 0.0
+    for i in range(num_samples - 1, 0, -1):
+        u_min, u_max = _path_acceleration_bounds(dq[i], ddq[i], x[i], acceleration_limits)
+        x[i - 1] = min(x[i - 1], max(x[i] - 2 * ds * u_min, 0.0))
+
+    s_dot = np.sqrt(x)
+    dt = 2 * ds / np.maximum(s_dot[:-1] + s_dot[1:], 1e-6)
+    t = np.concatenate([[0.0], np.cumsum(dt)])
+    return t, s_dot
+
+
+def sample_parameterization(times, s, t, s_dot):
+    """
+    Path parameter at times, with constant path acceleration between samples.
+    """
+    i = np.clip(np.searchsorted(t, times, side="right") - 1, 0, len(t) - 2)
+    dt = t[i + 1] - t[i]
+    s_ddot = (s_dot[i + 1] - s_dot[i]) / np.maximum(dt, 1e-12)
+    tau = np.minimum(times - t[i], dt)
+    return np.minimum(s[i] + s_dot[i] * tau + 0.5 * s_ddot * tau**2, s[-1])
+
+
+def smoothstep5(tau):
+    """ Quintic ease in/out from 0 to 1 with zero velocity and acceleration at both ends """
+    return tau**3 * (10 - 15 * tau + 6 * tau**2)
+
+
+def eased_duration(spline, velocity_limits, acceleration_limits, num_samples=1000):
+    """
+    Shortest duration of the quintic eased traversal of a path within the limits.
+    Joint velocities scale with 1/duration and accelerations with 1/duration^2.
+    """
+    tau = np.linspace(0.0, 1.0, num_samples)
+    length = spline.x[-1]
+    # path velocity and acceleration for a duration of 1
+    s_dot = length * 30 * tau**2 * (1 - tau)**2
+    s_ddot = length * 60 * tau * (1 - tau) * (1 - 2 * tau)
+    s = length * smoothstep5(tau)
+    dq = spline(s, 1)
+    velocity = np.abs(dq * s_dot[:, None])
+    acceleration = np.abs(dq * s_ddot[:, None] + spline(s, 2) * s_dot[:, None]**2)
+    return max(np.max(velocity / velocity_limits), np.sqrt(np.max(acceleration / acceleration_limits)))
+
+
+def frame_utilization(config_trajectory, fps, velocity_limits, acceleration_limits):
+    """
+    Peak joint velocity and acceleration of a trajectory played at fps, from its frame
+    differences, as fractions of the limits.
+    Return: (velocity_utilization, acceleration_utilization)
+    """
+    velocity = np.abs(np.diff(config_trajectory, axis=0)) * fps / velocity_limits
+    acceleration = np.abs(np.diff(config_trajectory, n=2, axis=0)) * fps**2 / acceleration_limits
+    return (np.max(velocity) if len(velocity) > 0 else 0.0,
+            np.max(acceleration) if len(acceleration) > 0 else 0.0)
+
+
+def _sample_within_limits(spline, s_of_tau, total, fps, velocity_limits, acceleration_limits, max_iterations=50):
+    """
+    Sample a schedule stretched to a whole number of frames, and stretch it further until
+    the frame differences are within the limits. The continuous schedule can exceed them
+    between samples, e.g. where the time optimal schedule switches from accelerating to braking.
+    s_of_tau: path parameter as a function of the normalized time in [0, 1]
+    Return: (config_trajectory, duration)
+    """
+    num_frames = max(int(np.ceil(total * fps - 1e-6)), 1)
+    for _ in range(max_iterations):
+        config_trajectory = spline(s_of_tau(np.arange(num_frames + 1) / num_frames))
+        velocity, acceleration = frame_utilization(config_trajectory, fps, velocity_limits, acceleration_limits)
+        stretch = max(velocity, np.sqrt(acceleration))
+        if stretch <= 1:
+            break
+        # velocities scale with 1/stretch and accelerations with 1/stretch^2
+        num_frames = max(int(np.ceil(num_frames * stretch * (1 + 1e-3))), num_frames + 1)
+    else:
+        raise RuntimeError("Retimed trajectory does not converge to the joint limits.")
+    return config_trajectory, num_frames / fps
+
+
+def retime(path, velocity_limits, acceleration_limits, fps, duration=None, eased=False, num_samples=1000):
+    """
+    Retime a joint path for playback at fps.
+    path: array of shape (M, num_joints), configurations along the path, e.g. planner output
+    velocity_limits, acceleration_limits: per-joint limits, e.g. from robot.get_joint_table()
+    duration: optional duration in seconds, used if longer than the minimum
+    eased: False for the minimum time schedule, True for a quintic ease in/out of the
+        path, stretched to duration or to the shortest duration within the limits
+    num_samples: path samples of the time optimal parameterization
+    Return: (config_trajectory, duration), config_trajectory of shape (N, num_joints)
+        sampled at fps, including the end of the path as the last frame. The duration is
+        rounded up to whole frames, N = duration * fps + 1, and the frame differences are
+        within the limits.
+    """
+    velocity_limits = np.asarray(velocity_limits, dtype=float)
+    acceleration_limits = np.asarray(acceleration_limits, dtype=float)
+    spline = path_spline(path)
+    if spline is None:
+        return np.asarray(path, dtype=float)[:1].copy(), 0.0
+    length = spline.x[-1]
+
+    if eased:
+        min_duration = eased_duration(spline, velocity_limits, acceleration_limits, num_samples)
+        total = min_duration if duration is None else max(duration, min_duration)
+
+        def s_of_tau(tau):
+            return length * smoothstep5(tau)
+    else:
+        s = np.linspace(0.0, length, num_samples)
+        t, s_dot = time_optimal_parameterization(s, spline(s, 1), spline(s, 2), velocity_limits, acceleration_limits)
+        # slowing down uniformly keeps velocities and accelerations within limits
+        total = t[-1] if duration is None else max(duration, t[-1])
+
+        def s_of_tau(tau):
+            return sample_parameterization(tau * t[-1], s, t, s_dot)
+    return _sample_within_limits(spline, s_of_tau, total, fps, velocity_limits, acceleration_limits)
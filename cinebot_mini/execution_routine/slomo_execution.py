@@ -1,19 +1,36 @@
 from cinebot_mini.robot_abstraction.robot import Robot
+from cinebot_mini.execution_routine.playback import TrajectoryPlayer
+from cinebot_mini.execution_routine.trajectory_validation import check_trajectory
 import numpy as np
 import time
 
 
 class SlomoModeExecution:
-    def __init__(self, robot: Robot, config_trajectory, fps=60):
+    def __init__(self, robot: Robot, config_trajectory, fps=60, check_limits=True):
+        """
+        check_limits: validate the trajectory against the joint limits of the robot
+            before every execution, see trajectory_validation.check_trajectory()
+        """
         self.robot = robot
         self.config_trajectory = config_trajectory
         self.fps = fps
+        self.check_limits = check_limits
+        self.player = TrajectoryPlayer(robot, config_trajectory, fps)
+
+    def validate(self):
+        """
+        Raise RuntimeError if the robot cannot follow the trajectory at fps.
+        Return: the validation report, None if the robot has no joint table
+        """
+        return check_trajectory(self.robot, self.config_trajectory, self.fps)
 
     def init(self):
         self.robot.enable_torque()
         self.robot.set_joint_angles(self.config_trajectory[0])
 
     def execute(self):
+        if self.check_limits:
+            self.validate()
         start_time = time.time()
         last_time = time.time()
         for i in range(len(self.config_trajectory)):
@@ -28,3 +45,19 @@ class SlomoModeExecution:
             last_time = curr_time
         end_time = time.time()
         print("Total time: {}".format(end_time - start_time))
+
+    def compile(self):
+        """
+        Convert the trajectory to raw servo commands once, so that every
+        execute_compiled() call replays exactly the same frames.
+        """
+        self.player.compile()
+
+    def execute_compiled(self):
+        """
+        Play the compiled trajectory against absolute frame deadlines.
+        Returns the per-frame lateness and jitter statistics.
+        """
+        if self.check_limits:
+            self.validate()
+        return self.player.play()
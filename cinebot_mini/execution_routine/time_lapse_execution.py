@@ -1,4 +1,5 @@
 from cinebot_mini.robot_abstraction.robot import Robot
+from cinebot_mini.execution_routine.trajectory_validation import check_trajectory
 from cinebot_mini.web_utils.camera_client import *
 import numpy as np
 import time
@@ -17,10 +18,17 @@ class TimeLapseExecution:
     def __init__(self,
                  robot: Robot,
                  config_trajectory,
-                 duration):
+                 duration,
+                 check_limits=True):
+        """
+        check_limits: check the trajectory against the joint bounds of the robot before
+            every execution. The servos settle between frames, so the velocity and
+            acceleration limits are not checked, see trajectory_validation.check_trajectory()
+        """
         self.robot = robot
         self.config_trajectory = config_trajectory
         self.duration = duration
+        self.check_limits = check_limits
 
         self.param_dict = None
         self.photo_data = OrderedDict()
@@ -66,6 +74,8 @@ class TimeLapseExecution:
         frame_time = self.duration / len(self.config_trajectory)
         # if frame_time < self.MIN_FRAME_TIME:
         #     raise RuntimeError("Unarchiveable frame rate.")
+        if self.check_limits:
+            check_trajectory(self.robot, self.config_trajectory, 1.0 / frame_time, bounds_only=True)
 
         start_time = time.time()
         last_time = time.time()
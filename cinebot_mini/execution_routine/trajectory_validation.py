@@ -0,0 +1,90 @@
+import numpy as np
+
+
+def validate_trajectory(config_trajectory, fps, joint_table, tolerance=1e-9):
+    """
+    Check a whole trajectory against the joint bounds and the velocity and acceleration
+    limits of a JointTable in one vectorized pass.
+    config_trajectory: array of shape (N, num_joints) in radians
+    fps: execution rate in frames per second
+    joint_table: JointTable of the robot
+    tolerance: relative slack on the velocity and acceleration limits, only a numerical
+        epsilon by default, retiming.retime output is within the limits at the frames
+    Return: dictionary with
+        "valid": True if no frame violates any limit
+        "bound_frames", "velocity_frames", "acceleration_frames": indices of the violating
+            frames, a velocity is assigned to the frame it arrives at, an acceleration to
+            the frame in the middle of its three frames
+        "position_utilization": per joint, largest distance from the center of the joint range,
+            as a fraction of half the range
+        "velocity_utilization", "acceleration_utilization": per joint, peak over the limit
+    """
+    trajectory = np.asarray(config_trajectory, dtype=float)
+    if trajectory.ndim != 2 or trajectory.shape[1] != joint_table.num_joints():
+        raise ValueError("Trajectory of shape {} for {} joints".format(trajectory.shape, joint_table.num_joints()))
+
+    # frames with NaN or inf violate the bounds, derivatives across them are not checked
+    center = (joint_table.upper + joint_table.lower) / 2
+    half_range = (joint_table.upper - joint_table.lower) / 2
+    finite = np.isfinite(trajectory)
+    trajectory = np.where(finite, trajectory, center)
+
+    position_utilization = np.abs(trajectory - center) / half_range
+    bound_violations = ~finite | (position_utilization > 1 + 1e-9)
+    velocity_utilization = np.abs(np.diff(trajectory, axis=0)) * fps / joint_table.velocity_limits
+    velocity_utilization[~(finite[1:] & finite[:-1])] = 0
+    acceleration_utilization = np.abs(np.diff(trajectory, n=2, axis=0)) * fps**2 / joint_table.acceleration_limits
+    acceleration_utilization[~(finite[2:] & finite[1:-1] & finite[:-2])] = 0
+
+    def violating_frames(utilization, first_frame):
+        return np.flatnonzero(np.any(utilization > 1 + tolerance, axis=1)) + first_frame
+
+    def peak(utilization):
+        if len(utilization) == 0:
+            return np.zeros(joint_table.num_joints())
+        return np.max(utilization, axis=0)
+
+    report = {
+        "num_frames": len(trajectory),
+        "fps": fps,
+        "bound_frames": np.flatnonzero(np.any(bound_violations, axis=1)),
+        "velocity_frames": violating_frames(velocity_utilization, 1),
+        "acceleration_frames": violating_frames(acceleration_utilization, 1),
+        "position_utilization": peak(np.where(finite, position_utilization, np.inf)),
+        "velocity_utilization": peak(velocity_utilization),
+        "acceleration_utilization": peak(acceleration_utilization)
+    }
+    report["valid"] = len(report["bound_frames"]) + len(report["velocity_frames"]) \
+        + len(report["acceleration_frames"]) == 0
+    return report
+
+
+def print_validation(report):
+    print("Trajectory of {} frames at {} fps: {}".format(
+        report["num_frames"], report["fps"], "valid" if report["valid"] else "INVALID"))
+    for name in ["bound", "velocity", "acceleration"]:
+        frames = report[name + "_frames"]
+        if len(frames) > 0:
+            print("{} limit violated at {} frames, first at i={}".format(name.capitalize(), len(frames), frames[0]))
+    for name in ["position", "velocity", "acceleration"]:
+        print("{:12s} utilization per joint: {}".format(
+            name.capitalize(), " ".join("{:6.1%}".format(value) for value in report[name + "_utilization"])))
+
+
+def check_trajectory(robot, config_trajectory, fps, tolerance=1e-9, bounds_only=False):
+    """
+    Gate for the execution routines: raise RuntimeError if the robot cannot follow
+    config_trajectory at fps, see validate_trajectory().
+    bounds_only: only reject frames out of the joint bounds, for stop-motion routines
+        where the servos settle between frames
+    Return: the validation report, None if the robot has no joint table
+    """
+    joint_table = robot.get_joint_table()
+    if joint_table is None:
+        print("No joint table, trajectory not validated")
+        return None
+    report = validate_trajectory(config_trajectory, fps, joint_table, tolerance)
+    if len(report["bound_frames"]) > 0 or (not bounds_only and not report["valid"]):
+        print_validation(report)
+        raise RuntimeError("Trajectory exceeds the joint limits of the robot.")
+    return report
@@ -1,3 +1,6 @@
 from .arc_nd_interpolator import ArcNDInterpolator
 from .gaze_3d_interpolator import Gaze3DInterpolator
+from .streaming_interpolator import StreamingArcInterpolator
+from .piecewise_polynomial import PiecewisePolynomial
 from .transformation_tree import TransformationTree
+from .reachability_map import ReachabilityMap
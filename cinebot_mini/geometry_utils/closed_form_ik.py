@@ -1,7 +1,12 @@
 from ikpy.chain import Chain
+from cinebot_mini.geometry_utils.forward_kinematics import ChainFK
+from cinebot_mini.geometry_utils import se3
 import numpy as np
 from scipy.spatial.transform import Rotation as R
+from concurrent.futures import ProcessPoolExecutor
+import weakref
 import math
+import os
 
 def wrap_to_pi(degree):
 	if(degree > math.pi):
@@ -12,6 +17,36 @@ def wrap_to_pi(degree):
 		return degree
 
 
+class ClosedFormChain:
+	'''
+	Link lengths, joint bounds and forward kinematics kernel of a chain, read once
+	from the ikpy links instead of on every IK call. Only numpy data, so it can be pickled.
+	'''
+	def __init__(self, chain):
+		self.name = chain.name
+		self.link_len = [chain.links[i].length for i in range(1, len(chain.links))]
+		self.joint_bounds = [tuple(chain.links[i].bounds) for i in range(1, len(chain.links))]
+		self.bounds_array = np.array(self.joint_bounds, dtype=float)
+		self.fk = ChainFK.from_chain(chain)
+
+
+_chain_parameters = weakref.WeakKeyDictionary()
+
+
+def chain_parameters(chain):
+	'''
+	Chain: ikpy.chain.Chain or ClosedFormChain
+	Return: the ClosedFormChain of the chain, cached per chain object
+	'''
+	if(isinstance(chain, ClosedFormChain)):
+		return chain
+	params = _chain_parameters.get(chain)
+	if(params is None):
+		params = ClosedFormChain(chain)
+		_chain_parameters[chain] = params
+	return params
+
+
 def check_valid(state, bounds):
 	for i in range(6):
 		if((state[i] < bounds[i][0]) or (state[i] > bounds[i][1])):
@@ -21,7 +56,7 @@ def check_valid(state, bounds):
 
 def inverse_kinematics_closed_form(chain, end_effector_pose, initial_position=[0,0,0,0,0,0,0]):
 	'''
-	Chain: ikpy.chain.Chain
+	Chain: ikpy.chain.Chain or ClosedFormChain
 	End_effector_pose: 4x4 numpy array
 	Initial_position: list/1D numpy array of length 7
 	Return: list of length 7
@@ -33,8 +68,9 @@ def inverse_kinematics_closed_form(chain, end_effector_pose, initial_position=[0
 	if(len(initial_position) != 7):
 		raise RuntimeError("Invalid initial angle state.")
 
-	link_len = [chain.links[i].length for i in range(1, len(chain.links))]
-	joint_bounds = [chain.links[i].bounds for i in range(1, len(chain.links))]
+	params = chain_parameters(chain)
+	link_len = params.link_len
+	joint_bounds = params.joint_bounds
 
 	possible_states = []
 	theta = np.zeros(6)
@@ -96,9 +132,9 @@ def inverse_kinematics_closed_form(chain, end_effector_pose, initial_position=[0
 	for i in range(len(possible_states)):
 
 		theta_state = possible_states[i]
-		H_2_global = chain.forward_kinematics(np.insert(theta_state, 0, 0.0), full_kinematics=True)[3]
+		H_2_global = params.fk.forward_kinematics(np.insert(theta_state, 0, 0.0), full_kinematics=True)[3]
 		# end_effector_pose = H_2_global * H_end_2
-		H_end_2 = np.dot(np.array(np.mat(H_2_global).I), end_effector_pose)
+		H_end_2 = np.dot(se3.inverse(H_2_global), end_effector_pose)
 		end_pose_inf2 = H_end_2[:3,3]
 		
 		# two possibilities for theta3
@@ -106,18 +142,18 @@ def inverse_kinematics_closed_form(chain, end_effector_pose, initial_position=[0
 
 		for theta3 in theta3_possible:
 			theta_state[3] = theta3
-			H_3_global = chain.forward_kinematics(np.insert(theta_state, 0, 0.0), full_kinematics=True)[4]
+			H_3_global = params.fk.forward_kinematics(np.insert(theta_state, 0, 0.0), full_kinematics=True)[4]
 			# end_effector_pose = H_3_global * H_end_3
-			H_end_3 = np.dot(np.array(np.mat(H_3_global).I), end_effector_pose)
+			H_end_3 = np.dot(se3.inverse(H_3_global), end_effector_pose)
 			end_pose_inf3 = H_end_3[:3,3]
 			delta_z = end_pose_inf3[2] - link_len[4]
 			delta_y = end_pose_inf3[1]
 			theta_state[4] = -math.atan2(delta_y, delta_z)
 
-			H_4_global = chain.forward_kinematics(np.insert(theta_state, 0, 0.0), full_kinematics=True)[5]
+			H_4_global = params.fk.forward_kinematics(np.insert(theta_state, 0, 0.0), full_kinematics=True)[5]
 			# end_effector_pose = H_4_global * H_end_4
-			H_end_4 = np.dot(np.array(np.mat(H_4_global).I), end_effector_pose)
-			theta_state[5] = R.from_dcm(H_end_4[:3, :3]).as_rotvec()[2]
+			H_end_4 = np.dot(se3.inverse(H_4_global), end_effector_pose)
+			theta_state[5] = R.from_matrix(H_end_4[:3, :3]).as_rotvec()[2]
 
 			if(check_valid(theta_state, joint_bounds)):
 				valid_states.append(np.insert(theta_state, 0, 0.0).copy())
@@ -138,3 +174,280 @@ def inverse_kinematics_closed_form(chain, end_effector_pose, initial_position=[0
 				min_dis = dis
 				min_state = valid_states[i]
 		return min_state
+
+
+def wrap_to_pi_batch(angles):
+	return np.where(angles > math.pi, angles - math.pi*2, np.where(angles < -math.pi, angles + math.pi*2, angles))
+
+
+def _candidate_states(params, poses):
+	'''
+	All closed-form solutions of a batch of poses, in the order of the scalar solver:
+	(elbow, theta3) = (0, 0), (0, 1), (1, 0), (1, 1)
+	Return: (states, candidate_valid), states of shape (N, 4, 7), candidate_valid of shape (N, 4)
+	'''
+	n = poses.shape[0]
+	link_len = params.link_len
+	joint_bounds = params.bounds_array
+	fk = params.fk
+
+	end_pose = poses[:, :3, 3]
+	joint_pose_1 = np.array([0.0, 0.0, link_len[0]+link_len[1]])
+	joint_pose_4 = end_pose - link_len[5] * poses[:, :3, 2]
+
+	theta0 = wrap_to_pi_batch(np.arctan2(joint_pose_4[:, 1], joint_pose_4[:, 0]) - math.pi/2)
+
+	delta_l = np.linalg.norm(joint_pose_4 - joint_pose_1, axis=1)
+	safe_delta_l = np.where(delta_l > 0, delta_l, 1.0)
+	l_a = link_len[3] + link_len[4]
+	l_b = link_len[2]
+	cos_theta2 = (l_a*l_a + l_b*l_b - delta_l*delta_l) / (2*l_a*l_b)
+	sin_beta = (joint_pose_4[:, 2] - joint_pose_1[2]) / safe_delta_l
+	cos_phi = (delta_l*delta_l + l_b*l_b - l_a*l_a) / (2*l_b*safe_delta_l)
+	reachable = (np.abs(cos_theta2) <= 1) & (np.abs(sin_beta) <= 1) & (np.abs(cos_phi) <= 1) \
+		& (delta_l > 0) & (cos_theta2 != 1)
+
+	beta = np.arcsin(np.clip(sin_beta, -1, 1))
+	phi = np.arccos(np.clip(cos_phi, -1, 1))
+	acos_theta2 = np.arccos(np.clip(-cos_theta2, -1, 1))
+
+	theta = np.zeros((n, 2, 2, 6))
+	theta[:, :, :, 0] = theta0[:, None, None]
+	theta[:, 0, :, 1] = wrap_to_pi_batch(beta + phi - math.pi/2)[:, None]
+	theta[:, 0, :, 2] = -acos_theta2[:, None]
+	theta[:, 1, :, 1] = wrap_to_pi_batch(beta - phi - math.pi/2)[:, None]
+	theta[:, 1, :, 2] = acos_theta2[:, None]
+	candidate_valid = np.broadcast_to(reachable[:, None, None], (n, 2, 2)).copy()
+	# single elbow solution when the arm is fully stretched
+	candidate_valid[:, 1, :] &= (cos_theta2 != -1)[:, None]
+	theta[cos_theta2 == -1, 0, :, 1] = (beta - math.pi/2)[cos_theta2 == -1, None]
+
+	# frame after joint 2
+	H_2_global = np.broadcast_to(np.eye(4), (n, 2, 4, 4))
+	for i in range(3):
+		H_2_global = np.matmul(H_2_global, fk.link_transform(i, theta[:, :, 0, i]))
+	H_end_2 = se3.compose(se3.inverse(H_2_global), poses[:, None])
+	end_pose_inf2 = H_end_2[:, :, :3, 3]
+	theta[:, :, 0, 3] = wrap_to_pi_batch(np.arctan2(end_pose_inf2[..., 1], end_pose_inf2[..., 0]) - math.pi/2)
+	theta[:, :, 1, 3] = wrap_to_pi_batch(np.arctan2(-end_pose_inf2[..., 1], -end_pose_inf2[..., 0]) - math.pi/2)
+
+	H_3_global = np.matmul(H_2_global[:, :, None], fk.link_transform(3, theta[..., 3]))
+	H_end_3 = se3.compose(se3.inverse(H_3_global), poses[:, None, None])
+	end_pose_inf3 = H_end_3[..., :3, 3]
+	delta_z = end_pose_inf3[..., 2] - link_len[4]
+	delta_y = end_pose_inf3[..., 1]
+	theta[..., 4] = -np.arctan2(delta_y, delta_z)
+
+	H_4_global = np.matmul(H_3_global, fk.link_transform(4, theta[..., 4]))
+	H_end_4 = se3.compose(se3.inverse(H_4_global), poses[:, None, None])
+	theta[..., 5] = R.from_matrix(H_end_4[..., :3, :3].reshape(-1, 3, 3)).as_rotvec()[:, 2].reshape(n, 2, 2)
+
+	in_bounds = np.all((theta >= joint_bounds[:, 0]) & (theta <= joint_bounds[:, 1]), axis=-1)
+	candidate_valid &= in_bounds
+
+	states = np.concatenate([np.zeros((n, 4, 1)), theta.reshape(n, 4, 6)], axis=2)
+	return states, candidate_valid.reshape(n, 4)
+
+
+def inverse_kinematics_closed_form_batch(chain, end_effector_poses, initial_position=None):
+	'''
+	Batch version of inverse_kinematics_closed_form.
+	Chain: ikpy.chain.Chain or ClosedFormChain
+	End_effector_poses: numpy array of shape (N, 4, 4)
+	Initial_position: 1D numpy array of length 7, or array of shape (N, 7). Defaults to zeros.
+	Return: (configurations, valid), configurations is an array of shape (N, 7) with NaN rows
+	where no reachable state exists, valid is a boolean array of shape (N,).
+	'''
+
+	if(chain == None):
+		raise RuntimeError("Could not find chain.")
+
+	poses = np.asarray(end_effector_poses, dtype=float)
+	n = poses.shape[0]
+	if initial_position is None:
+		initial_position = np.zeros(7)
+	initial_position = np.broadcast_to(np.asarray(initial_position, dtype=float), (n, 7))
+
+	states, candidate_valid = _candidate_states(chain_parameters(chain), poses)
+
+	# select the valid state closest to initial_position
+	distances = np.linalg.norm(states - initial_position[:, None], axis=2)
+	distances = np.where(candidate_valid, distances, np.inf)
+	best = np.argmin(distances, axis=1)
+
+	valid = np.any(candidate_valid, axis=1)
+	configurations = states[np.arange(n), best]
+	configurations[~valid] = np.nan
+	return configurations, valid
+
+
+def _state_bounds(params):
+	lower = np.concatenate([[-np.inf], params.bounds_array[:, 0]])
+	upper = np.concatenate([[np.inf], params.bounds_array[:, 1]])
+	return lower, upper
+
+
+def _select_branches(states, candidate_valid, lower, upper, previous, branch, unwrap):
+	'''
+	Sequential candidate selection of inverse_kinematics_trajectory, for R runs with
+	different seeds at once.
+	States, candidate_valid: candidates of N frames, shapes (N, 4, 7) and (N, 4)
+	Previous: seeds of shape (R, 7)
+	Branch: current branches of shape (R,), -1 for none
+	Return: (configurations, branches), shapes (R, N, 7) and (R, N)
+	'''
+	r, n = len(previous), len(states)
+	runs = np.arange(r)
+	configurations = np.full((r, n, 7), np.nan)
+	branches = np.full((r, n), -1, dtype=int)
+	for i in np.flatnonzero(np.any(candidate_valid, axis=1)):
+		candidates = np.broadcast_to(states[i], (r, 4, 7))
+		if unwrap:
+			unwrapped = previous[:, None] + wrap_to_pi_batch(candidates - previous[:, None])
+			candidates = np.where((unwrapped >= lower) & (unwrapped <= upper), unwrapped, candidates)
+		distances = np.linalg.norm(candidates - previous[:, None], axis=2)
+		distances = np.where(candidate_valid[i], distances, np.inf)
+		best = np.argmin(distances, axis=1)
+		# on a tie keep the current branch
+		keep = (branch >= 0) & (distances[runs, branch] <= distances[runs, best])
+		branch = np.where(keep, branch, best)
+		branches[:, i] = branch
+		previous = candidates[runs, branch]
+		configurations[:, i] = previous
+	return configurations, branches
+
+
+def inverse_kinematics_trajectory(chain, end_effector_poses, initial_position=None, unwrap=True):
+	'''
+	Closed-form IK along a trajectory. Every frame is seeded with the solution of the
+	previous valid frame (the first one with initial_position), so the solver stays on
+	the same elbow/wrist branch instead of jumping to whichever branch is closest to a
+	fixed seed. With unwrap, joint angles are shifted by 2*pi towards the previous
+	solution when that stays within the joint bounds, so they do not jump at +-pi.
+	All candidates are computed in one batch, only the selection is sequential.
+	Chain: ikpy.chain.Chain or ClosedFormChain
+	End_effector_poses: numpy array of shape (N, 4, 4)
+	Initial_position: 1D numpy array of length 7, defaults to zeros
+	Return: (configurations, valid, branches), configurations of shape (N, 7) with NaN rows
+	where no reachable state exists, valid of shape (N,), branches of shape (N,) with the
+	index of the chosen candidate (elbow * 2 + theta3 solution), -1 for invalid frames.
+	'''
+
+	if(chain == None):
+		raise RuntimeError("Could not find chain.")
+
+	params = chain_parameters(chain)
+	poses = np.asarray(end_effector_poses, dtype=float)
+	n = poses.shape[0]
+	if initial_position is None:
+		initial_position = np.zeros(7)
+	previous = np.array(initial_position, dtype=float)
+	if(len(previous) != 7):
+		raise RuntimeError("Invalid initial angle state.")
+
+	states, candidate_valid = _candidate_states(params, poses)
+	lower, upper = _state_bounds(params)
+
+	configurations, branches = _select_branches(
+		states, candidate_valid, lower, upper, previous[None], np.array([-1]), unwrap)
+	return configurations[0], np.any(candidate_valid, axis=1), branches[0]
+
+
+def _solve_chunk(job):
+	'''
+	Worker of inverse_kinematics_trajectory_parallel. Without a seed the previous chunk
+	is not known yet, so the selection runs once per candidate of the first valid frame.
+	Return: (states, candidate_valid, configurations, branches), runs along the first
+	axis of configurations and branches
+	'''
+	params, poses, initial_position, unwrap = job
+	states, candidate_valid = _candidate_states(params, poses)
+	lower, upper = _state_bounds(params)
+	if initial_position is not None:
+		configurations, branches = _select_branches(
+			states, candidate_valid, lower, upper, initial_position[None], np.array([-1]), unwrap)
+		return states, candidate_valid, configurations, branches
+
+	n = len(poses)
+	configurations = np.full((4, n, 7), np.nan)
+	branches = np.full((4, n), -1, dtype=int)
+	valid_frames = np.flatnonzero(np.any(candidate_valid, axis=1))
+	if len(valid_frames) > 0:
+		first = valid_frames[0]
+		configurations[:, first] = states[first]
+		branches[:, first] = np.arange(4)
+		configurations[:, first + 1:], branches[:, first + 1:] = _select_branches(
+			states[first + 1:], candidate_valid[first + 1:], lower, upper,
+			states[first], np.arange(4), unwrap)
+	return states, candidate_valid, configurations, branches
+
+
+def inverse_kinematics_trajectory_parallel(chain, end_effector_poses, initial_position=None, unwrap=True,
+		processes=None, chunk_size=None):
+	'''
+	inverse_kinematics_trajectory with the trajectory split into chunks, solved in a process pool.
+	Each chunk after the first is solved once for every candidate of its first valid frame.
+	The chunks are stitched in order: the candidate the serial solver would pick at the seam
+	selects which of those runs continues the trajectory, so the output is identical to
+	inverse_kinematics_trajectory. A chunk whose seam pick is shifted by 2*pi by the unwrapping
+	is solved again from the seam, in this process.
+	Chain: ikpy.chain.Chain or ClosedFormChain
+	End_effector_poses: numpy array of shape (N, 4, 4)
+	Initial_position: 1D numpy array of length 7, defaults to zeros
+	Processes: size of the process pool, defaults to the number of CPUs
+	Chunk_size: frames per chunk, defaults to one chunk per process
+	Return: (configurations, valid, branches), see inverse_kinematics_trajectory
+	'''
+
+	if(chain == None):
+		raise RuntimeError("Could not find chain.")
+
+	params = chain_parameters(chain)
+	poses = np.asarray(end_effector_poses, dtype=float)
+	n = poses.shape[0]
+	if initial_position is None:
+		initial_position = np.zeros(7)
+	previous = np.array(initial_position, dtype=float)
+	if(len(previous) != 7):
+		raise RuntimeError("Invalid initial angle state.")
+	if processes is None:
+		processes = os.cpu_count() or 1
+	if chunk_size is None:
+		chunk_size = int(math.ceil(n / float(processes)))
+	chunk_size = max(chunk_size, 1)
+
+	starts = list(range(0, n, chunk_size))
+	jobs = [(params, poses[start:start + chunk_size], previous if start == 0 else None, unwrap)
+		for start in starts]
+	with ProcessPoolExecutor(max_workers=processes) as pool:
+		results = list(pool.map(_solve_chunk, jobs))
+
+	lower, upper = _state_bounds(params)
+	chunk_configurations = []
+	chunk_branches = []
+	branch = np.array([-1])
+	for start, (states, candidate_valid, configurations, branches) in zip(starts, results):
+		valid_frames = np.flatnonzero(np.any(candidate_valid, axis=1))
+		if len(valid_frames) == 0:
+			chunk_configurations.append(configurations[0])
+			chunk_branches.append(branches[0])
+			continue
+		if start > 0:
+			first = valid_frames[0]
+			seam_configuration, seam_branch = _select_branches(
+				states[first:first + 1], candidate_valid[first:first + 1], lower, upper,
+				previous[None], branch, unwrap)
+			run = seam_branch[0, 0]
+			if np.array_equal(seam_configuration[0, 0], states[first, run]):
+				configurations, branches = configurations[run:run + 1], branches[run:run + 1]
+			else:
+				configurations, branches = _select_branches(
+					states, candidate_valid, lower, upper, previous[None], branch, unwrap)
+		chunk_configurations.append(configurations[0])
+		chunk_branches.append(branches[0])
+		previous = configurations[0, valid_frames[-1]]
+		branch = branches[0, valid_frames[-1:]]
+
+	configurations = np.concatenate(chunk_configurations)
+	branches = np.concatenate(chunk_branches)
+	return configurations, branches >= 0, branches
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+class CompiledTree:
+    """
+    Array form of a TransformationTree. Node names are interned to integer ids in
+    depth-first order, so parents come before their children and every subtree,
+    as well as the links of every chain, occupies a contiguous range of ids.
+    Local transforms live in one (K, 4, 4) buffer, chain links are filled from the
+    chain state, and world transforms are cached per node with a dirty flag.
+    """
+    def __init__(self, tf_tree, root_name="ROOT"):
+        """
+        tf_tree: TransformationTree to compile
+        """
+        chain_links = set()
+        for chain in tf_tree.chains.values():
+            chain_links.update(link.name for link in chain.links[1:])
+
+        self.names = []
+        stack = [root_name]
+        while stack:
+            node = stack.pop()
+            self.names.append(node)
+            children = tf_tree.children.get(node, [])
+            # the next link of a chain is visited first, so chain links get consecutive ids
+            children = [child for child in children if child in chain_links] \
+                + [child for child in children if child not in chain_links]
+            stack.extend(reversed(children))
+
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        num_nodes = len(self.names)
+        self.parents = np.array([self.ids[tf_tree.parent[name]] if name in tf_tree.parent else -1
+                                 for name in self.names], dtype=int)
+
+        # subtree of node i is the id range [i, subtree_end[i])
+        self.subtree_end = np.arange(1, num_nodes + 1)
+        for i in range(num_nodes - 1, 0, -1):
+            self.subtree_end[self.parents[i]] = max(self.subtree_end[self.parents[i]], self.subtree_end[i])
+
+        depth = np.zeros(num_nodes, dtype=int)
+        for i in range(1, num_nodes):
+            depth[i] = depth[self.parents[i]] + 1
+        self.levels = [np.flatnonzero(depth == d) for d in range(1, depth.max() + 1)] if num_nodes > 1 else []
+
+        self.static = np.tile(np.eye(4), (num_nodes, 1, 1))
+        for i, name in enumerate(self.names):
+            if type(tf_tree.transforms[name]) is not str:
+                self.static[i] = tf_tree.transforms[name]
+
+        self.chain_fks = dict(tf_tree.chain_fks)
+        self.chain_ranges = dict()
+        for chain_name, chain in tf_tree.chains.items():
+            start = self.ids[chain.links[1].name]
+            stop = start + len(chain.links) - 1
+            assert [self.names[i] for i in range(start, stop)] == [link.name for link in chain.links[1:]]
+            self.chain_ranges[chain_name] = (start, stop)
+
+        self.local = self.static.copy()
+        self.world = np.zeros((num_nodes, 4, 4))
+        self.valid = np.zeros(num_nodes, dtype=bool)
+        for chain_name, state in tf_tree.chain_states.items():
+            self.set_chain_state(chain_name, state)
+
+    def num_nodes(self):
+        return len(self.names)
+
+    def invalidate(self, node_id):
+        self.valid[node_id: self.subtree_end[node_id]] = False
+
+    def set_chain_state(self, chain_name, state):
+        start, stop = self.chain_ranges[chain_name]
+        self.local[start: stop] = self.chain_fks[chain_name].link_transforms(state)
+        self.invalidate(start)
+
+    def set_static(self, node_id, matrix):
+        self.static[node_id] = matrix
+        self.local[node_id] = matrix
+        self.invalidate(node_id)
+
+    def world_transform(self, node_id):
+        """
+        Transform of a node to the root, recomputing only the invalidated part of its path.
+        Return: (4, 4) view into the cache, do not modify it.
+        """
+        path = []
+        node = node_id
+        while node >= 0 and not self.valid[node]:
+            path.append(node)
+            node = self.parents[node]
+        for node in reversed(path):
+            parent = self.parents[node]
+            if parent < 0:
+                self.world[node] = self.local[node]
+            else:
+                self.world[node] = self.world[parent] @ self.local[node]
+            self.valid[node] = True
+        return self.world[node_id]
+
+    def evaluate(self, num_frames, chain_trajectories=None, node_trajectories=None):
+        """
+        World transforms of all nodes over a trajectory, one batched product per tree level.
+        chain_trajectories: dictionary mapping chain name to an array of shape (N, num_joints)
+        node_trajectories: dictionary mapping node name to an array of shape (N, 4, 4), relative to its parent
+        Return: array of shape (N, K, 4, 4), indexed by node id
+        """
+        local = np.broadcast_to(self.local, (num_frames,) + self.local.shape).copy()
+        for chain_name, trajectory in (chain_trajectories or dict()).items():
+            start, stop = self.chain_ranges[chain_name]
+            local[:, start: stop] = self.chain_fks[chain_name].link_transforms(
+                np.asarray(trajectory, dtype=float)[:num_frames])
+        for node_name, trajectory in (node_trajectories or dict()).items():
+            local[:, self.ids[node_name]] = np.asarray(trajectory, dtype=float)[:num_frames]
+
+        world = np.empty(local.shape)
+        world[:, 0] = local[:, 0]
+        for level in self.levels:
+            world[:, level] = np.matmul(world[:, self.parents[level]], local[:, level])
+        return world
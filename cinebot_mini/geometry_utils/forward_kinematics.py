@@ -0,0 +1,175 @@
+from ikpy.chain import Chain
+import numpy as np
+import math
+
+
+def rpy_matrix(roll, pitch, yaw):
+    """
+    URDF rpy orientation, same convention as ikpy: Rz(yaw) * Ry(pitch) * Rx(roll)
+    """
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    rx = np.array([[1, 0, 0], [0, cr, -sr], [0, sr, cr]])
+    ry = np.array([[cp, 0, sp], [0, 1, 0], [-sp, 0, cp]])
+    rz = np.array([[cy, -sy, 0], [sy, cy, 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+
+class ChainFK:
+    """
+    Forward kinematics kernel of a serial chain of revolute joints, e.g. the
+    Cinebot URDF. The constant part of every link (URDF origin translation
+    and rpy orientation) is precomputed, only the joint rotations are
+    computed per call, vectorized over a batch of configurations.
+
+    Frame 0 is the chain base (the ikpy OriginLink), frame k is the frame
+    after joint k - 1, so forward_kinematics() returns the same frames as
+    ikpy's chain.forward_kinematics([0] + state, full_kinematics=True).
+    """
+    def __init__(self, offsets, axes, name=None):
+        """
+        offsets: array of shape (num_joints, 4, 4), constant transform of each link
+        axes: array of shape (num_joints, 3), rotation axis of each joint
+        """
+        self.offsets = np.array(offsets, dtype=float)
+        self.axes = np.array(axes, dtype=float)
+        self.axes_tuple = [tuple(axis) for axis in self.axes.tolist()]
+        self.name = name
+        self.num_joints = len(self.axes)
+
+        # links without origin rotation only need their translation applied
+        self.pure_translation = [np.allclose(offset[:3, :3], np.eye(3)) for offset in self.offsets]
+        # links rotating about a coordinate axis skip the general Rodrigues formula
+        self.principal_axis = [None] * self.num_joints
+        for i, axis in enumerate(self.axes):
+            for j in range(3):
+                if np.allclose(axis, np.eye(3)[j]):
+                    self.principal_axis[i] = j
+
+    @classmethod
+    def from_chain(cls, chain: Chain):
+        offsets = np.zeros((len(chain.links) - 1, 4, 4))
+        axes = np.zeros((len(chain.links) - 1, 3))
+        for i, link in enumerate(chain.links[1:]):
+            offsets[i] = np.eye(4)
+            offsets[i][:3, :3] = rpy_matrix(*link.orientation)
+            offsets[i][:3, 3] = link.translation_vector
+            axes[i] = link.rotation
+        return cls(offsets, axes, chain.name)
+
+    @classmethod
+    def from_urdf_file(cls, urdf_file, name=None):
+        chain = Chain.from_urdf_file(urdf_file)
+        chain.name = name
+        return cls.from_chain(chain)
+
+    def _rotation(self, i, theta):
+        c = np.cos(theta)
+        s = np.sin(theta)
+        rot = np.zeros(theta.shape + (4, 4))
+        rot[..., 3, 3] = 1.0
+        axis = self.principal_axis[i]
+        if axis is not None:
+            a, b = [j for j in range(3) if j != axis]
+            rot[..., axis, axis] = 1.0
+            rot[..., a, a] = c
+            rot[..., b, b] = c
+            # right-handed rotation: (x, y), (y, z), (z, x) planes
+            if axis == 1:
+                a, b = b, a
+            rot[..., a, b] = -s
+            rot[..., b, a] = s
+            return rot
+
+        x, y, z = self.axes[i]
+        rot[..., 0, 0] = x**2 + (1 - x**2) * c
+        rot[..., 0, 1] = x*y*(1 - c) - z*s
+        rot[..., 0, 2] = x*z*(1 - c) + y*s
+        rot[..., 1, 0] = x*y*(1 - c) + z*s
+        rot[..., 1, 1] = y**2 + (1 - y**2) * c
+        rot[..., 1, 2] = y*z*(1 - c) - x*s
+        rot[..., 2, 0] = x*z*(1 - c) - y*s
+        rot[..., 2, 1] = y*z*(1 - c) + x*s
+        rot[..., 2, 2] = z**2 + (1 - z**2) * c
+        return rot
+
+    def link_transform(self, i, theta):
+        """
+        Transform of link i (joint i) relative to the previous frame.
+        theta: array of joint angles of any shape S
+        Return: array of shape S + (4, 4)
+        """
+        theta = np.asarray(theta, dtype=float)
+        rot = self._rotation(i, theta)
+        if self.pure_translation[i]:
+            rot[..., :3, 3] = self.offsets[i][:3, 3]
+            return rot
+        return np.matmul(self.offsets[i], rot)
+
+    def _single_link_transform(self, i, theta):
+        # same as link_transform() for a scalar theta, without array broadcasting overhead
+        c = math.cos(theta)
+        s = math.sin(theta)
+        x, y, z = self.axes_tuple[i]
+        transform = np.array([
+            [x*x + (1 - x*x) * c, x*y*(1 - c) - z*s, x*z*(1 - c) + y*s, 0.0],
+            [x*y*(1 - c) + z*s, y*y + (1 - y*y) * c, y*z*(1 - c) - x*s, 0.0],
+            [x*z*(1 - c) - y*s, y*z*(1 - c) + x*s, z*z + (1 - z*z) * c, 0.0],
+            [0.0, 0.0, 0.0, 1.0]])
+        if self.pure_translation[i]:
+            transform[:3, 3] = self.offsets[i][:3, 3]
+            return transform
+        return self.offsets[i] @ transform
+
+    def link_transforms(self, joints):
+        """
+        joints: array of shape (..., num_joints)
+        Return: array of shape (..., num_joints, 4, 4) of per-link transforms
+        """
+        joints = np.asarray(joints, dtype=float)
+        return np.stack([self.link_transform(i, joints[..., i]) for i in range(self.num_joints)], axis=-3)
+
+    def forward_kinematics(self, joints, full_kinematics=True):
+        """
+        joints: array of shape (..., num_joints). An ikpy style state with a
+            leading entry for the origin link, shape (..., num_joints + 1), is accepted too.
+        Return: all frames, array of shape (..., num_joints + 1, 4, 4), or only the
+            end frame of shape (..., 4, 4) if full_kinematics is False.
+        """
+        joints = np.asarray(joints, dtype=float)
+        if joints.shape[-1] == self.num_joints + 1:
+            joints = joints[..., 1:]
+
+        if joints.ndim == 1:
+            frames = [np.eye(4)]
+            for i in range(self.num_joints):
+                frames.append(frames[-1] @ self._single_link_transform(i, float(joints[i])))
+            if full_kinematics:
+                return np.array(frames)
+            return frames[-1]
+
+        frames = np.zeros(joints.shape[:-1] + (self.num_joints + 1, 4, 4))
+        frames[..., 0, :, :] = np.eye(4)
+        for i in range(self.num_joints):
+            frames[..., i + 1, :, :] = np.matmul(frames[..., i, :, :], self.link_transform(i, joints[..., i]))
+
+        if full_kinematics:
+            return frames
+        return frames[..., -1, :, :]
+
+    def jacobian(self, joints, tool=None):
+        """
+        Geometric Jacobian of the end frame, linear velocity rows first.
+        joints: array of shape (..., num_joints), or an ikpy style state
+        tool: optional transform of shape (4, 4) of the point of interest relative to the end frame
+        Return: array of shape (..., 6, num_joints)
+        """
+        frames = self.forward_kinematics(joints, full_kinematics=True)
+        end = frames[..., -1, :, :]
+        if tool is not None:
+            end = np.matmul(end, tool)
+        # frame k + 1 rotates about joint k, its origin lies on the axis
+        axes = np.matmul(frames[..., 1:, :3, :3], self.axes[..., None])[..., 0]
+        lever = end[..., None, :3, 3] - frames[..., 1:, :3, 3]
+        return np.swapaxes(np.concatenate([np.cross(axes, lever), axes], axis=-1), -1, -2)
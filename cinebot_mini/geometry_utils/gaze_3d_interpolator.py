@@ -1,25 +1,28 @@
 from .arc_nd_interpolator import ArcNDInterpolator
+from . import se3
 import numpy as np
 
 
 class Gaze3DInterpolator:
-    def __init__(self, camera_pose, gaze_points, num_cache=21):
+    def __init__(self, camera_pose, gaze_points, num_cache=21, tolerance=None):
         """
         Camera_pos is (a iterable of numpy array with shape (3,)) or (2D numpy array of shape (N, 3)).
 
         Gaze_points can be either (a single numpy array with shape (3,)), or (a iterable of numpy
         array with shape (3,)) or (2D numpy array of shape (N, 3)). When the input is a single numpy
         array with shape (3,), the camera should always be looking at the same point.
+
+        Tolerance, if given, resamples both splines adaptively, see ArcNDInterpolator.
         """
         self.camera_pose = camera_pose
 
         # For testing
         n = len(camera_pose)
         self.gaze_points = gaze_points
-        self.camera_spline = ArcNDInterpolator(camera_pose, num_cache=num_cache)
+        self.camera_spline = ArcNDInterpolator(camera_pose, num_cache=num_cache, tolerance=tolerance)
         self.gaze_spline = None
         if len(self.gaze_points.shape) != 1:
-            self.gaze_spline = ArcNDInterpolator(gaze_points, num_cache=num_cache)
+            self.gaze_spline = ArcNDInterpolator(gaze_points, num_cache=num_cache, tolerance=tolerance)
 
     def length(self):
         """
@@ -34,32 +37,31 @@ class Gaze3DInterpolator:
         as camera position.
         """
         camera_pose = self.camera_spline.at(arc_length)
-        if len(self.gaze_points.shape) == 1:
+        if self.gaze_spline is None:
             gaze_point = self.gaze_points
         else:
-            gaze_spline_length = self.gaze_spline.length()
-            gaze_arc_length = arc_length / self.length() * gaze_spline_length
-            gaze_point = self.gaze_spline.at(gaze_arc_length)
+            gaze_point = self.gaze_spline.at(self._gaze_arc_lengths(arc_length))
         return self._get_transform_matrix(camera_pose, gaze_point)
 
     def generate(self, s_list):
         """
-        Batch version of self.at()
+        Batch version of self.at(), evaluates both splines for all arc lengths at once.
+        The frames are a path, their roll is kept continuous where the camera looks straight
+        down or passes over the gaze point, see se3.look_at_path().
+        Returns a numpy array with shape (N, 4, 4).
         """
-        return [self.at(s) for s in s_list]
-
-    def _get_transform_matrix(self, camera_pose, gaze_point):
-        gaze_point_local = gaze_point - camera_pose
-        z_local = gaze_point_local / np.linalg.norm(gaze_point_local)
-        z_global = np.array([0, 0, 1])
-        x_local = np.cross(z_local, z_global)
-        x_local /= np.linalg.norm(x_local)
+        arc_lengths = np.asarray(s_list, dtype=float)
+        camera_poses = self.camera_spline.generate(arc_lengths)
+        if self.gaze_spline is None:
+            gaze_points = self.gaze_points
+        else:
+            gaze_points = self.gaze_spline.generate(self._gaze_arc_lengths(arc_lengths))
+        if arc_lengths.ndim == 0:
+            return self._get_transform_matrix(camera_poses, gaze_points)
+        return se3.look_at_path(camera_poses, gaze_points)
 
-        y_local = np.cross(z_local, x_local)
+    def _gaze_arc_lengths(self, arc_lengths):
+        return arc_lengths / self.length() * self.gaze_spline.length()
 
-        trans = np.eye(4)
-        trans[:3, 0] = x_local
-        trans[:3, 1] = y_local
-        trans[:3, 2] = z_local
-        trans[:3, 3] = camera_pose
-        return trans
\ No newline at end of file
+    def _get_transform_matrix(self, camera_pose, gaze_point):
+        return se3.look_at(camera_pose, gaze_point)
@@ -0,0 +1,94 @@
+from scipy.interpolate import PPoly
+import numpy as np
+import bisect
+
+
+class PiecewisePolynomial:
+    def __init__(self, breakpoints, coefficients):
+        """ Piecewise polynomial curve, e.g. a compiled ArcNDInterpolator spline.
+            breakpoints: array of shape (m + 1,), increasing
+            coefficients: array of shape (m, degree + 1, dims), highest power first,
+                piece i is evaluated in the local coordinate x - breakpoints[i]"""
+        self.breakpoints = np.asarray(breakpoints, dtype=float)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.breakpoint_list = self.breakpoints.tolist()
+        self.derivative_coefficients = {0: self.coefficients}
+
+    @classmethod
+    def from_tck(cls, tck):
+        """ Convert a parametric B-spline as returned by scipy splprep """
+        t, c, k = tck
+        pieces = [PPoly.from_spline((t, np.asarray(c_dim), k)) for c_dim in c]
+        breakpoints = pieces[0].x
+        # B-spline end knots are repeated, drop the empty pieces
+        nonempty = np.diff(breakpoints) > 0
+        coefficients = np.stack([piece.c[:, nonempty] for piece in pieces], axis=-1)
+        return cls(np.concatenate([breakpoints[:-1][nonempty], breakpoints[-1:]]),
+                   np.transpose(coefficients, (1, 0, 2)))
+
+    def degree(self):
+        return self.coefficients.shape[1] - 1
+
+    def dims(self):
+        return self.coefficients.shape[2]
+
+    def _coefficients(self, der):
+        """ Coefficients of the der-th derivative, highest power first """
+        if der not in self.derivative_coefficients:
+            degree = self.degree()
+            powers = np.arange(degree, -1, -1)
+            factors = np.ones(degree + 1)
+            for n in range(der):
+                factors *= np.maximum(powers - n, 0)
+            coefficients = (self.coefficients * factors[None, :, None])[:, :degree + 1 - der]
+            if len(coefficients[0]) == 0:
+                coefficients = np.zeros((len(self.coefficients), 1, self.dims()))
+            self.derivative_coefficients[der] = coefficients
+        return self.derivative_coefficients[der]
+
+    def generate(self, x_list, der=0):
+        """ Vectorized Horner evaluation at an array of parameters, returns shape (N, dims) """
+        x = np.asarray(x_list, dtype=float)
+        coefficients = self._coefficients(der)
+        index = np.clip(np.searchsorted(self.breakpoints, x, side="right") - 1, 0, len(coefficients) - 1)
+        dx = (x - self.breakpoints[index])[..., None]
+        piece = coefficients[index]
+        y = piece[..., 0, :]
+        for j in range(1, piece.shape[-2]):
+            y = y * dx + piece[..., j, :]
+        return y
+
+    def at(self, x, der=0):
+        """ Evaluation at a single parameter, without the array overhead of generate() """
+        coefficients = self._coefficients(der)
+        index = min(max(bisect.bisect_right(self.breakpoint_list, x) - 1, 0), len(coefficients) - 1)
+        dx = x - self.breakpoint_list[index]
+        piece = coefficients[index]
+        y = piece[0]
+        for j in range(1, len(piece)):
+            y = y * dx + piece[j]
+        return y
+
+    def to_array(self):
+        """ Flat float array: [num_pieces, degree, dims, breakpoints..., coefficients...] """
+        header = [len(self.coefficients), self.degree(), self.dims()]
+        return np.concatenate([header, self.breakpoints, self.coefficients.ravel()])
+
+    @staticmethod
+    def _parse_array(array):
+        array = np.asarray(array, dtype=float)
+        num_pieces, degree, dims = [int(value) for value in array[:3]]
+        breakpoints = array[3: 4 + num_pieces]
+        coefficients = array[4 + num_pieces:].reshape(num_pieces, degree + 1, dims)
+        return breakpoints, coefficients
+
+    @classmethod
+    def from_array(cls, array):
+        return cls(*cls._parse_array(array))
+
+    def __getstate__(self):
+        # pickle only the flat array, derivative caches are rebuilt on demand
+        return {"array": self.to_array()}
+
+    def __setstate__(self, state):
+        self.__init__(*self._parse_array(state["array"]))
@@ -0,0 +1,138 @@
+from cinebot_mini.geometry_utils.closed_form_ik import chain_parameters, inverse_kinematics_closed_form_batch
+from cinebot_mini.geometry_utils import se3
+import numpy as np
+
+
+def sphere_directions(num_directions):
+    """
+    Nearly uniform unit vectors on the sphere (Fibonacci lattice).
+    Return: array of shape (num_directions, 3)
+    """
+    i = np.arange(num_directions) + 0.5
+    z = 1 - 2 * i / num_directions
+    radius = np.sqrt(1 - z**2)
+    phi = np.pi * (1 + 5**0.5) * i
+    return np.stack([radius * np.cos(phi), radius * np.sin(phi), z], axis=1)
+
+
+class ReachabilityMap:
+    def __init__(self, values, origin, voxel_size, directions, camera_offset, max_manipulability):
+        """
+        Camera reachability of a chain on a voxel grid of positions times a set of view directions,
+        in the frame of the chain root. A camera pose is the look-at frame of GazePlanner, so the
+        position and the view direction determine it.
+        values: uint8 array of shape (X, Y, Z, D), 0 where no IK solution exists, else the
+            manipulability of the solution scaled to 1..255
+        origin: center of voxel (0, 0, 0)
+        voxel_size: edge length of the voxels
+        directions: array of shape (D, 3), unit view directions
+        camera_offset: transform of the camera relative to the chain end the map was built for
+        max_manipulability: manipulability of value 255
+        """
+        self.values = values
+        self.origin = np.asarray(origin, dtype=float)
+        self.voxel_size = float(voxel_size)
+        self.directions = np.asarray(directions, dtype=float)
+        self.camera_offset = np.asarray(camera_offset, dtype=float)
+        self.max_manipulability = float(max_manipulability)
+        self.shape = np.array(values.shape[:3])
+
+    @classmethod
+    def build(cls, chain, camera_offset=None, voxel_size=0.025, num_directions=32, batch_size=100000):
+        """
+        Solve IK for the camera at every voxel center looking along every direction.
+        Takes tens of seconds for the Cinebot workspace at the default resolution.
+        chain: ikpy.chain.Chain or ClosedFormChain
+        camera_offset: transform of the camera relative to the chain end, defaults to identity
+        """
+        params = chain_parameters(chain)
+        camera_offset = np.eye(4) if camera_offset is None else np.asarray(camera_offset, dtype=float)
+        reach = sum(params.link_len) + np.linalg.norm(camera_offset[:3, 3])
+        num_voxels = int(np.ceil(2 * reach / voxel_size)) + 1
+        origin = np.full(3, -(num_voxels - 1) * voxel_size / 2)
+        directions = sphere_directions(num_directions)
+
+        grid = np.stack(np.meshgrid(*[np.arange(num_voxels)] * 3, indexing="ij"), axis=-1).reshape(-1, 3)
+        centers = origin + grid * voxel_size
+        # voxels beyond the reach of the chain are not solved
+        candidates = np.flatnonzero(np.linalg.norm(centers, axis=1) <= reach + voxel_size)
+        pairs = np.stack(np.meshgrid(candidates, np.arange(num_directions), indexing="ij"), axis=-1).reshape(-1, 2)
+
+        reachable = np.zeros((len(centers), num_directions), dtype=bool)
+        manipulability = np.zeros((len(centers), num_directions))
+        offset_inverse = se3.inverse(camera_offset)
+        for start in range(0, len(pairs), batch_size):
+            voxel, direction = pairs[start:start + batch_size].T
+            eye = centers[voxel]
+            camera_poses = se3.look_at(eye, eye + directions[direction])
+            configs, valid = inverse_kinematics_closed_form_batch(params, se3.compose(camera_poses, offset_inverse))
+            jacobians = params.fk.jacobian(configs[valid], tool=camera_offset)
+            reachable[voxel[valid], direction[valid]] = True
+            manipulability[voxel[valid], direction[valid]] = np.abs(np.linalg.det(jacobians))
+
+        max_manipulability = max(np.max(manipulability), 1e-12)
+        values = np.where(reachable, 1 + np.round(254 * manipulability / max_manipulability), 0)
+        values = values.astype(np.uint8).reshape(num_voxels, num_voxels, num_voxels, num_directions)
+        return cls(values, origin, voxel_size, directions, camera_offset, max_manipulability)
+
+    def save(self, path):
+        """
+        Writes path.npy with the values, which load() memory maps, and path.meta.npz with the grid.
+        """
+        np.save(path + ".npy", np.asarray(self.values))
+        np.savez(path + ".meta.npz", origin=self.origin, voxel_size=self.voxel_size, directions=self.directions,
+                 camera_offset=self.camera_offset, max_manipulability=self.max_manipulability)
+
+    @classmethod
+    def load(cls, path):
+        meta = np.load(path + ".meta.npz")
+        values = np.load(path + ".npy", mmap_mode="r")
+        return cls(values, meta["origin"], meta["voxel_size"], meta["directions"],
+                   meta["camera_offset"], meta["max_manipulability"])
+
+    def lookup(self, positions, directions):
+        """
+        positions: array of shape (..., 3) in the chain root frame
+        directions: array of shape (..., 3), view directions, need not be normalized
+        Return: uint8 array of shape (...), map value of the nearest voxel and direction,
+            0 if unreachable or outside the map
+        """
+        positions = np.asarray(positions, dtype=float)
+        directions = np.asarray(directions, dtype=float)
+        index = np.round((positions - self.origin) / self.voxel_size).astype(int)
+        inside = np.all((index >= 0) & (index < self.shape), axis=-1)
+        index = np.where(inside[..., None], index, 0)
+        direction = np.argmax(np.dot(directions, self.directions.T), axis=-1)
+        values = self.values[index[..., 0], index[..., 1], index[..., 2], direction]
+        return np.where(inside, values, 0).astype(np.uint8)
+
+    def reachable(self, positions, directions):
+        return self.lookup(positions, directions) > 0
+
+    def manipulability(self, positions, directions):
+        """
+        Return: array of shape (...), manipulability |det J| of the IK solution, 0 where unreachable
+        """
+        values = self.lookup(positions, directions).astype(float)
+        return np.maximum(values - 1, 0) / 254 * self.max_manipulability
+
+    def lookup_poses(self, camera_poses):
+        """
+        camera_poses: array of shape (..., 4, 4) in the chain root frame, the camera looks along z
+        Return: uint8 array of shape (...), see lookup()
+        """
+        camera_poses = np.asarray(camera_poses, dtype=float)
+        return self.lookup(camera_poses[..., :3, 3], camera_poses[..., :3, 2])
+
+
+if __name__ == "__main__":
+    # python -m cinebot_mini.geometry_utils.reachability_map <output path>
+    from cinebot_mini import TRANSFORMS
+    from ikpy.chain import Chain
+    import os
+    import sys
+    urdf_file = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "robot_abstraction", "Cinebot.URDF")
+    reachability_map = ReachabilityMap.build(
+        Chain.from_urdf_file(urdf_file), TRANSFORMS["robot_camera_to_robot"])
+    reachability_map.save(sys.argv[1])
+    print("Reachable voxel directions:", np.count_nonzero(reachability_map.values))
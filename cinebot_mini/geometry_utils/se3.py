@@ -0,0 +1,272 @@
+import numpy as np
+
+
+def compose(*transforms):
+    """
+    Product of homogeneous transforms, broadcast over leading dimensions.
+    transforms: arrays of shape (..., 4, 4)
+    Return: transforms[0] @ transforms[1] @ ...
+    """
+    H = np.asarray(transforms[0], dtype=float)
+    for transform in transforms[1:]:
+        H = np.matmul(H, np.asarray(transform, dtype=float))
+    return H
+
+
+def inverse(H):
+    """
+    Closed-form inverse of rigid transforms, (R, t)^-1 = (R^T, -R^T t).
+    H: array of shape (..., 4, 4), rotation part must be orthonormal
+    Return: array of shape (..., 4, 4)
+    """
+    H = np.asarray(H, dtype=float)
+    if H.ndim == 2:
+        # single transform, without the batched indexing overhead
+        rot_t = H[:3, :3].T
+        H_inv = np.eye(4)
+        H_inv[:3, :3] = rot_t
+        H_inv[:3, 3] = -rot_t.dot(H[:3, 3])
+        return H_inv
+    rot_t = np.swapaxes(H[..., :3, :3], -1, -2)
+    H_inv = np.zeros(H.shape)
+    H_inv[..., :3, :3] = rot_t
+    H_inv[..., :3, 3] = -np.matmul(rot_t, H[..., :3, 3:4])[..., 0]
+    H_inv[..., 3, 3] = 1.0
+    return H_inv
+
+
+def from_rotation_translation(rotation=None, translation=None):
+    """
+    rotation: array of shape (..., 3, 3), defaults to identity
+    translation: array of shape (..., 3), defaults to zeros
+    Return: array of shape (..., 4, 4)
+    """
+    shapes = []
+    if rotation is not None:
+        rotation = np.asarray(rotation, dtype=float)
+        shapes.append(rotation.shape[:-2])
+    if translation is not None:
+        translation = np.asarray(translation, dtype=float)
+        shapes.append(translation.shape[:-1])
+    shape = np.broadcast_shapes(*shapes) if len(shapes) > 0 else ()
+
+    H = np.zeros(shape + (4, 4))
+    H[..., :3, :3] = np.eye(3) if rotation is None else rotation
+    if translation is not None:
+        H[..., :3, 3] = translation
+    H[..., 3, 3] = 1.0
+    return H
+
+
+def transform_points(H, points):
+    """
+    H: array of shape (..., 4, 4)
+    points: array of shape (..., 3)
+    Return: array of shape (..., 3)
+    """
+    H = np.asarray(H, dtype=float)
+    points = np.asarray(points, dtype=float)
+    return np.matmul(H[..., :3, :3], points[..., None])[..., 0] + H[..., :3, 3]
+
+
+def look_at(eye, target, up=(0.0, 0.0, 1.0), fallback_up=(0.0, 1.0, 0.0)):
+    """
+    Camera frames at eye looking at target: z points to the target, x = z cross up,
+    y = z cross x, the convention of the Blender cameras used by the planners.
+    eye: array of shape (..., 3)
+    target: array of shape (..., 3)
+    up: array of shape (3,) or (..., 3)
+    fallback_up: used instead of up for frames looking along up, where z cross up vanishes
+    Return: array of shape (..., 4, 4)
+    """
+    eye = np.asarray(eye, dtype=float)
+    target = np.asarray(target, dtype=float)
+    z_axis = target - eye
+    z_axis = z_axis / np.linalg.norm(z_axis, axis=-1, keepdims=True)
+    x_axis = np.cross(z_axis, np.asarray(up, dtype=float))
+    x_norm = np.linalg.norm(x_axis, axis=-1, keepdims=True)
+    parallel = x_norm < 1e-6
+    if np.any(parallel):
+        x_axis = np.where(parallel, np.cross(z_axis, np.asarray(fallback_up, dtype=float)), x_axis)
+        x_norm = np.linalg.norm(x_axis, axis=-1, keepdims=True)
+    x_axis = x_axis / x_norm
+    y_axis = np.cross(z_axis, x_axis)
+
+    H = np.zeros(np.broadcast_shapes(eye.shape, z_axis.shape)[:-1] + (4, 4))
+    H[..., :3, 0] = x_axis
+    H[..., :3, 1] = y_axis
+    H[..., :3, 2] = z_axis
+    H[..., :3, 3] = eye
+    H[..., 3, 3] = 1.0
+    return H
+
+
+def look_at_path(eye, target, up=(0.0, 0.0, 1.0), fallback_up=(0.0, 1.0, 0.0)):
+    """
+    look_at() along a camera path, with the roll kept continuous between neighbouring frames.
+    Frames looking along up take the x axis of the frame before, projected onto their image
+    plane, instead of fallback_up. x and y keep the sign of the frame before, so a camera
+    passing over the zenith ends up upside down instead of rolling half a turn in one frame.
+    eye: array of shape (N, 3) or (3,)
+    target: array of shape (N, 3) or (3,)
+    Return: array of shape (N, 4, 4)
+    """
+    H = look_at(eye, target, up, fallback_up)
+    if H.ndim != 3:
+        raise ValueError("Expected a path of camera frames, got shape {}".format(H.shape[:-2]))
+    z_axis = H[:, :3, 2]
+    parallel = np.linalg.norm(np.cross(z_axis, np.asarray(up, dtype=float)), axis=-1) < 1e-6
+    for i in np.flatnonzero(parallel[1:]) + 1:
+        x_axis = H[i - 1, :3, 0] - np.dot(H[i - 1, :3, 0], z_axis[i]) * z_axis[i]
+        H[i, :3, 0] = x_axis / np.linalg.norm(x_axis)
+        H[i, :3, 1] = np.cross(z_axis[i], H[i, :3, 0])
+
+    flipped = np.sum(H[1:, :3, 0] * H[:-1, :3, 0], axis=-1) < 0
+    sign = np.where(np.cumsum(np.concatenate([[False], flipped])) % 2 == 1, -1.0, 1.0)
+    H[:, :3, :2] *= sign[:, None, None]
+    return H
+
+
+def hat(w):
+    """
+    w: array of shape (..., 3)
+    Return: skew symmetric matrices of shape (..., 3, 3), hat(w) @ v = w x v
+    """
+    w = np.asarray(w, dtype=float)
+    K = np.zeros(w.shape[:-1] + (3, 3))
+    K[..., 0, 1] = -w[..., 2]
+    K[..., 0, 2] = w[..., 1]
+    K[..., 1, 0] = w[..., 2]
+    K[..., 1, 2] = -w[..., 0]
+    K[..., 2, 0] = -w[..., 1]
+    K[..., 2, 1] = w[..., 0]
+    return K
+
+
+def _exp_coefficients(theta):
+    # A = sin(t)/t, B = (1-cos(t))/t^2, C = (t-sin(t))/t^3, with Taylor series near 0
+    small = theta < 1e-4
+    safe = np.where(small, 1.0, theta)
+    A = np.where(small, 1 - theta**2 / 6, np.sin(safe) / safe)
+    B = np.where(small, 0.5 - theta**2 / 24, (1 - np.cos(safe)) / safe**2)
+    C = np.where(small, 1.0 / 6 - theta**2 / 120, (safe - np.sin(safe)) / safe**3)
+    return A, B, C
+
+
+def exp(xi):
+    """
+    Exponential map of twists.
+    xi: array of shape (..., 6), translational part first, then the rotation vector
+    Return: array of shape (..., 4, 4)
+    """
+    xi = np.asarray(xi, dtype=float)
+    rho, w = xi[..., :3], xi[..., 3:]
+    theta = np.linalg.norm(w, axis=-1)
+    A, B, C = _exp_coefficients(theta)
+    K = hat(w)
+    K2 = np.matmul(K, K)
+    rotation = np.eye(3) + A[..., None, None] * K + B[..., None, None] * K2
+    V = np.eye(3) + B[..., None, None] * K + C[..., None, None] * K2
+    return from_rotation_translation(rotation, np.matmul(V, rho[..., None])[..., 0])
+
+
+def rotation_log(rotation):
+    """
+    Rotation vectors of rotation matrices, angle in [0, pi].
+    rotation: array of shape (..., 3, 3)
+    Return: array of shape (..., 3)
+    """
+    rotation = np.asarray(rotation, dtype=float)
+    cos_theta = np.clip((np.trace(rotation, axis1=-2, axis2=-1) - 1) / 2, -1.0, 1.0)
+    theta = np.arccos(cos_theta)
+    vee = np.stack([rotation[..., 2, 1] - rotation[..., 1, 2],
+                    rotation[..., 0, 2] - rotation[..., 2, 0],
+                    rotation[..., 1, 0] - rotation[..., 0, 1]], axis=-1)
+
+    small = theta < 1e-4
+    sin_theta = np.sin(theta)
+    safe_sin = np.where(small, 1.0, sin_theta)
+    scale = np.where(small, 0.5 + theta**2 / 12, theta / (2 * safe_sin))
+    w = scale[..., None] * vee
+
+    # near pi the antisymmetric part vanishes, take the axis from the symmetric part
+    near_pi = theta > np.pi - 1e-3
+    if np.any(near_pi):
+        R_pi = rotation[near_pi]
+        B = (R_pi + np.swapaxes(R_pi, -1, -2)) / 2 - cos_theta[near_pi][:, None, None] * np.eye(3)
+        column = np.argmax(np.diagonal(B, axis1=-2, axis2=-1), axis=-1)
+        axis = B[np.arange(len(B)), :, column]
+        axis = axis / np.linalg.norm(axis, axis=-1, keepdims=True)
+        # pick the sign consistent with the antisymmetric part
+        sign = np.where(np.sum(axis * vee[near_pi], axis=-1) < 0, -1.0, 1.0)
+        w[near_pi] = (sign * theta[near_pi])[:, None] * axis
+    return w
+
+
+def log(H):
+    """
+    Logarithm map of rigid transforms, inverse of exp.
+    H: array of shape (..., 4, 4)
+    Return: twists of shape (..., 6), translational part first, then the rotation vector
+    """
+    H = np.asarray(H, dtype=float)
+    w = rotation_log(H[..., :3, :3])
+    theta = np.linalg.norm(w, axis=-1)
+    A, B, C = _exp_coefficients(theta)
+    small = theta < 1e-4
+    safe = np.where(small, 1.0, theta)
+    D = np.where(small, 1.0 / 12 + theta**2 / 720, (1 - A / (2 * np.where(small, 1.0, B))) / safe**2)
+    K = hat(w)
+    V_inv = np.eye(3) - 0.5 * K + D[..., None, None] * np.matmul(K, K)
+    rho = np.matmul(V_inv, H[..., :3, 3:4])[..., 0]
+    return np.concatenate([rho, w], axis=-1)
+
+
+def matrix_to_quaternion(rotation):
+    """
+    rotation: array of shape (..., 3, 3), or (..., 4, 4) transforms
+    Return: unit quaternions of shape (..., 4) in (x, y, z, w) order, like scipy
+    """
+    rotation = np.asarray(rotation, dtype=float)[..., :3, :3]
+    shape = rotation.shape[:-2]
+    m = rotation.reshape(-1, 3, 3)
+    diagonal = np.diagonal(m, axis1=-2, axis2=-1)
+    trace = np.sum(diagonal, axis=-1)
+    choice = np.argmax(np.concatenate([diagonal, trace[:, None]], axis=-1), axis=-1)
+
+    q = np.empty((len(m), 4))
+    for i in range(3):
+        rows = choice == i
+        j, k = (i + 1) % 3, (i + 2) % 3
+        q[rows, i] = 1 - trace[rows] + 2 * m[rows, i, i]
+        q[rows, j] = m[rows, j, i] + m[rows, i, j]
+        q[rows, k] = m[rows, k, i] + m[rows, i, k]
+        q[rows, 3] = m[rows, k, j] - m[rows, j, k]
+    rows = choice == 3
+    q[rows, 0] = m[rows, 2, 1] - m[rows, 1, 2]
+    q[rows, 1] = m[rows, 0, 2] - m[rows, 2, 0]
+    q[rows, 2] = m[rows, 1, 0] - m[rows, 0, 1]
+    q[rows, 3] = 1 + trace[rows]
+    q /= np.linalg.norm(q, axis=-1, keepdims=True)
+    return q.reshape(shape + (4,))
+
+
+def quaternion_to_matrix(q):
+    """
+    q: array of shape (..., 4) in (x, y, z, w) order, normalized here
+    Return: rotation matrices of shape (..., 3, 3)
+    """
+    q = np.asarray(q, dtype=float)
+    q = q / np.linalg.norm(q, axis=-1, keepdims=True)
+    x, y, z, w = q[..., 0], q[..., 1], q[..., 2], q[..., 3]
+    rotation = np.empty(q.shape[:-1] + (3, 3))
+    rotation[..., 0, 0] = 1 - 2 * (y*y + z*z)
+    rotation[..., 0, 1] = 2 * (x*y - z*w)
+    rotation[..., 0, 2] = 2 * (x*z + y*w)
+    rotation[..., 1, 0] = 2 * (x*y + z*w)
+    rotation[..., 1, 1] = 1 - 2 * (x*x + z*z)
+    rotation[..., 1, 2] = 2 * (y*z - x*w)
+    rotation[..., 2, 0] = 2 * (x*z - y*w)
+    rotation[..., 2, 1] = 2 * (y*z + x*w)
+    rotation[..., 2, 2] = 1 - 2 * (x*x + y*y)
+    return rotation
@@ -0,0 +1,152 @@
+import numpy as np
+
+
+class StreamingArcInterpolator:
+    def __init__(self, input_path=None, table_density=8, gauss_order=5, newton_steps=5, capacity=64):
+        """ Arc length parameterized Catmull-Rom spline that can be extended point by point.
+            Each segment is a cubic Hermite curve with its own arc length table, so append()
+            only refits the last segment (its end tangent changes) and adds the new one,
+            everything before stays untouched. Cost per appended point is constant.
+            input_path: optional iterable of 1D numpy arrays to start with
+            table_density: arc length table entries per segment
+            gauss_order: Gauss-Legendre nodes per table entry
+            newton_steps: maximum Newton steps when inverting a segment table"""
+        self.table_density = table_density
+        self.newton_steps = newton_steps
+        self.gauss_nodes, self.gauss_weights = np.polynomial.legendre.leggauss(gauss_order)
+        self.table_u = np.linspace(0.0, 1.0, table_density + 1)
+
+        self.num_points = 0
+        self.points = None
+        self.tangents = None
+        # cumulative arc length inside each segment, and arc length at the start of each segment
+        self.segment_tables = np.zeros((capacity, table_density + 1))
+        self.segment_starts = np.zeros(capacity + 1)
+        self.capacity = capacity
+
+        if input_path is not None:
+            for point in input_path:
+                self.append(point)
+
+    def _grow(self):
+        self.capacity *= 2
+        for name in ["points", "tangents", "segment_tables"]:
+            old = getattr(self, name)
+            new = np.zeros((self.capacity,) + old.shape[1:])
+            new[:len(old)] = old
+            setattr(self, name, new)
+        segment_starts = np.zeros(self.capacity + 1)
+        segment_starts[:len(self.segment_starts)] = self.segment_starts
+        self.segment_starts = segment_starts
+
+    def append(self, point):
+        point = np.asarray(point, dtype=float)
+        if self.points is None:
+            self.points = np.zeros((self.capacity, len(point)))
+            self.tangents = np.zeros((self.capacity, len(point)))
+        if self.num_points == self.capacity:
+            self._grow()
+
+        n = self.num_points
+        self.points[n] = point
+        self.num_points += 1
+        if n == 0:
+            return
+
+        # Catmull-Rom tangent of the previous point, one sided tangent at the new end point
+        if n >= 2:
+            self.tangents[n - 1] = (point - self.points[n - 2]) / 2
+        else:
+            self.tangents[0] = point - self.points[0]
+        self.tangents[n] = point - self.points[n - 1]
+
+        for segment in range(max(n - 2, 0), n):
+            self._build_segment_table(segment)
+
+    def truncate(self, num_points):
+        """ Drop the points from index num_points on, e.g. to append edited points again.
+            Only the new last segment is refit, its end tangent becomes one sided. """
+        if num_points >= self.num_points:
+            return
+        self.num_points = num_points
+        if num_points >= 2:
+            self.tangents[num_points - 1] = self.points[num_points - 1] - self.points[num_points - 2]
+            self._build_segment_table(num_points - 2)
+
+    def _build_segment_table(self, segment):
+        u0, u1 = self.table_u[:-1], self.table_u[1:]
+        lengths = self._gauss_legendre(np.full(len(u0), segment), u0, u1)
+        self.segment_tables[segment] = np.concatenate([[0.0], np.cumsum(lengths)])
+        self.segment_starts[segment + 1] = self.segment_starts[segment] + self.segment_tables[segment][-1]
+
+    def _hermite(self, segment, u, der=0):
+        p0, p1 = self.points[segment], self.points[segment + 1]
+        m0, m1 = self.tangents[segment], self.tangents[segment + 1]
+        u = u[:, None]
+        if der == 0:
+            h00 = 2*u**3 - 3*u**2 + 1
+            h10 = u**3 - 2*u**2 + u
+            h01 = -2*u**3 + 3*u**2
+            h11 = u**3 - u**2
+        else:
+            h00 = 6*u**2 - 6*u
+            h10 = 3*u**2 - 4*u + 1
+            h01 = -6*u**2 + 6*u
+            h11 = 3*u**2 - 2*u
+        return h00 * p0 + h10 * m0 + h01 * p1 + h11 * m1
+
+    def _speed(self, segment, u):
+        return np.linalg.norm(self._hermite(segment, u, der=1), axis=1)
+
+    def _gauss_legendre(self, segment, u0, u1):
+        """ Arc length between u0 and u1 on the given segments, vectorized """
+        half = (u1 - u0) / 2
+        u_nodes = ((u0 + u1) / 2)[:, None] + half[:, None] * self.gauss_nodes
+        num_nodes = len(self.gauss_nodes)
+        speed = self._speed(np.repeat(segment, num_nodes), u_nodes.ravel()).reshape(u_nodes.shape)
+        return half * np.dot(speed, self.gauss_weights)
+
+    def num_segments(self):
+        return max(self.num_points - 1, 0)
+
+    def length(self):
+        return self.segment_starts[self.num_segments()]
+
+    def _find_u_at_arc_lengths(self, arc_lengths):
+        num_segments = self.num_segments()
+        arc_lengths = np.clip(arc_lengths, 0.0, self.length())
+        segment = np.searchsorted(self.segment_starts[:num_segments + 1], arc_lengths, side="right") - 1
+        segment = np.clip(segment, 0, num_segments - 1)
+        local = arc_lengths - self.segment_starts[segment]
+
+        tables = self.segment_tables[segment]
+        index = np.sum(tables[:, 1:] <= local[:, None], axis=1)
+        index = np.clip(index, 0, self.table_density - 1)
+        rows = np.arange(len(segment))
+        u0, u1 = self.table_u[index], self.table_u[index + 1]
+        s0, s1 = tables[rows, index], tables[rows, index + 1]
+
+        ds = s1 - s0
+        ratio = np.where(ds > 0, (local - s0) / np.where(ds > 0, ds, 1.0), 0.0)
+        u = u0 + (u1 - u0) * np.clip(ratio, 0.0, 1.0)
+        for _ in range(self.newton_steps):
+            error = s0 + self._gauss_legendre(segment, u0, u) - local
+            if np.all(np.abs(error) < 1e-12):
+                break
+            speed = self._speed(segment, u)
+            moving = speed > 1e-12
+            step = np.where(moving, error / np.where(moving, speed, 1.0), 0.0)
+            u = np.clip(u - step, u0, u1)
+        return segment, u
+
+    def generate(self, arc_length_list):
+        arc_lengths = np.atleast_1d(np.asarray(arc_length_list, dtype=float))
+        if self.num_points == 0:
+            raise ValueError("Empty path.")
+        if self.num_points < 2:
+            return np.repeat(self.points[:self.num_points], len(arc_lengths), axis=0)
+        segment, u = self._find_u_at_arc_lengths(arc_lengths)
+        return self._hermite(segment, u)
+
+    def at(self, arc_length):
+        return self.generate([arc_length])[0]
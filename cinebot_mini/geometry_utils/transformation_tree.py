@@ -2,7 +2,14 @@ import ikpy
 import numpy as np
 from ete3 import Tree
 from cinebot_mini.web_utils.blender_client import *
-from cinebot_mini.geometry_utils.closed_form_ik import inverse_kinematics_closed_form
+from cinebot_mini.geometry_utils.closed_form_ik import (
+    inverse_kinematics_closed_form,
+    inverse_kinematics_closed_form_batch,
+    inverse_kinematics_trajectory,
+    inverse_kinematics_trajectory_parallel)
+from cinebot_mini.geometry_utils.forward_kinematics import ChainFK
+from cinebot_mini.geometry_utils.compiled_tree import CompiledTree
+from cinebot_mini.geometry_utils import se3
 
 
 class TransformationTree:
@@ -16,8 +23,12 @@ class TransformationTree:
         self.transforms = {}
         """A dictionary mapping chain name to ikpy Chain object."""
         self.chains = {}
+        """A dictionary mapping chain name to its ChainFK kernel."""
+        self.chain_fks = {}
         """A dictionary stores joint angles of a ikpy Chain"""
         self.chain_states = {}
+        """Array form of the tree, rebuilt when nodes are added. Holds the cached transformations to ROOT."""
+        self.compiled = None
 
         self.tree = Tree()
 
@@ -37,6 +48,35 @@ class TransformationTree:
         if parent_name not in self.children:
             self.children[parent_name] = []
         self.children[parent_name].append(child_name)
+        self.compiled = None
+
+    def compile(self):
+        """
+        Return the CompiledTree of this tree, compiling it if nodes were added since.
+        """
+        if self.compiled is None:
+            self.compiled = CompiledTree(self)
+        return self.compiled
+
+    def set_node_transform(self, node_name, matrix):
+        """
+        node_name: string, a node added with add_node
+        matrix: 4x4 homogeneous matrix, relative to parent
+        """
+        if type(self.transforms[node_name]) is str:
+            raise ValueError("{} is a link of chain {}, set the chain state instead.".format(
+                node_name, self.transforms[node_name]))
+        self.transforms[node_name] = matrix
+        if self.compiled is not None:
+            self.compiled.set_static(self.compiled.ids[node_name], matrix)
+
+    def world_transform(self, node_name):
+        """
+        Return the cached 4x4 homogeneous matrix from node_name to ROOT, computing
+        the invalidated part of the path to ROOT if needed. Do not modify the result.
+        """
+        compiled = self.compile()
+        return compiled.world_transform(compiled.ids[node_name])
 
     def add_chain(self, parent_name, chain: ikpy.chain.Chain):
         """
@@ -48,6 +88,7 @@ class TransformationTree:
         if chain_name in self.chains:
             raise NameError
         self.chains[chain_name] = chain
+        self.chain_fks[chain_name] = ChainFK.from_chain(chain)
 
         self.add_node(parent_name, chain.links[0].name, np.eye(4))
 
@@ -62,113 +103,61 @@ class TransformationTree:
         Chain_name: string
         State: (a Iterable of floats) or (a 1D numpy array)
         The length of the state should match the corresponding chain. If not, raise an exception.
+        The state is not copied, call set_chain_state again after modifying it in place.
         """
         if len(self.chains[chain_name].links) != (len(state) + 1):
             raise ValueError
         self.chain_states[chain_name] = state
-
-    def get_ancestor(self, node):
-        # ancestor = [node]
-        ancestor = []
-        while node in self.parent:
-            node = self.parent[node]
-            ancestor.append(node)
-        return ancestor
-
-    def get_transform_same(self, to_name, from_name, ancestor):
-        """
-        Return the 4x4 homogeneous matrix from two nodes on the same branch
-        """
-        trace = ancestor[: ancestor.index(to_name)]
-        trace.insert(0, from_name)
-
-        H = np.eye(4)
-        chain_name = ''
-        link_count = 0
-
-        for i in range(len(trace)):
-            node = trace[i]
-            if type(self.transforms[node]) == str:
-                if self.transforms[node] != chain_name:
-                    chain_name = self.transforms[node]
-                    link_count = 0
-                link_count += 1
-
-            else:
-                # either a node or a chain base
-                if link_count > 0:
-                    chain = self.chains[chain_name]
-                    state = self.chain_states[chain_name]
-                    link_transform = chain.forward_kinematics([0] + list(state), full_kinematics=True)[link_count]
-                    H = np.dot(link_transform, H)
-                    link_count = 0
-
-                H = np.dot(self.transforms[node], H)
-
-        if link_count > 0:
-            # to_name is a link in a chain
-            chain = self.chains[chain_name]
-            state = self.chain_states[chain_name]
-            if type(self.transforms[to_name]) != str:
-                # to_name is the chain base
-                link_transform = chain.forward_kinematics([0] + list(state), full_kinematics=True)[link_count]
-                H = np.dot(link_transform, H)
-            else:
-                # find the position of from_name link
-                for j in range(len(chain.links)):
-                    if chain.links[j].name == from_name:
-                        break
-                # to_name -> links[j]
-                # end link -> links[j + link_count]
-                forward_transforms = chain.forward_kinematics(state, full_kinematics=True)
-                end_base = forward_transforms[j + link_count]
-                from_base = forward_transforms[j]
-                # end_base = from_base * end_from
-                end_from = np.dot(np.array(np.mat(from_base).I), end_base)
-                H = np.dot(end_from, H)
-
-        return H
+        if self.compiled is not None:
+            self.compiled.set_chain_state(chain_name, state)
 
     def get_transform(self, from_name, to_name="ROOT"):
         """
         from_name: string
         to_name: string
         Should return 4x4 homogeneous matrix from “from_name” node to “to_name” node.
-        Note: the two frames queried might not be on the same branch of the transformation tree! Some non-trivial tree traversal algorithm is needed.
+        Note: the two frames queried might not be on the same branch of the transformation tree!
+        Both frames are resolved through their cached transform to ROOT, so a repeated query only
+        recomputes the part of the tree invalidated by set_chain_state or set_node_transform.
         """
         if to_name == from_name:
-            return np.mat(np.eye(4))
-
-        from_name_ancestor = self.get_ancestor(from_name)
-        # print(to_name_ancestor)
-        if to_name in from_name_ancestor:
-            # to_name and from_name are on the same branch
-            return self.get_transform_same(to_name, from_name, from_name_ancestor)
-
-        to_name_ancestor = self.get_ancestor(to_name)
-        # print(from_name_ancestor)
-        if from_name in to_name_ancestor:
-            # from_name is descendant of to_name
-            return np.array(np.mat(self.get_transform_same(from_name, to_name, to_name_ancestor)).I)
-
-        common_ancestor = None
-        # to_name and from_name are on different branches
-        for i in range(len(from_name_ancestor)):
-            if from_name_ancestor[i] in to_name_ancestor:
-                common_ancestor = from_name_ancestor[i]
-                break
-        from_common = self.get_transform_same(common_ancestor, from_name, from_name_ancestor)
-        to_common = self.get_transform_same(common_ancestor, to_name, to_name_ancestor)
-        # from_common = to_common * from_to
-        from_to = np.dot(np.array(np.mat(to_common).I), from_common)
-        return from_to
+            return np.eye(4)
 
-    def set_transform(self, frame_name, transform_mat):
+        # from_root = to_root * from_to
+        from_root = self.world_transform(from_name)
+        if to_name == "ROOT":
+            return from_root.copy()
+        return se3.compose(se3.inverse(self.world_transform(to_name)), from_root)
+
+    def get_transforms_trajectory(self, frame_names, chain_trajectories=None, node_trajectories=None):
         """
-        Sets state of nearest parent chain, raises exception if cannot be done.
-        :param frame_name:
-        :param transform_mat:
-        :return:
+        Transforms of many frames to ROOT over a whole trajectory, in one vectorized pass.
+        The tree itself is not modified.
+        frame_names: list of F node names
+        chain_trajectories: dictionary mapping chain name to an array of shape (N, num_joints).
+            Chains not listed keep their current state.
+        node_trajectories: dictionary mapping node name to an array of shape (N, 4, 4),
+            relative to its parent. Nodes not listed keep their current transform.
+        Return: array of shape (N, F, 4, 4)
+        """
+        chain_trajectories = chain_trajectories or dict()
+        node_trajectories = node_trajectories or dict()
+        lengths = [len(trajectory) for trajectory in chain_trajectories.values()] \
+            + [len(trajectory) for trajectory in node_trajectories.values()]
+        if len(lengths) == 0:
+            raise ValueError("No trajectory given.")
+        for chain_name, trajectory in chain_trajectories.items():
+            if np.shape(trajectory)[1] + 1 != len(self.chains[chain_name].links):
+                raise ValueError
+
+        compiled = self.compile()
+        world = compiled.evaluate(min(lengths), chain_trajectories, node_trajectories)
+        return world[:, [compiled.ids[frame_name] for frame_name in frame_names]]
+
+    def chain_target(self, frame_name):
+        """
+        Find the nearest parent chain of a frame.
+        Return: (chain_name, chain_root_to_root, top_to_end_effector), raises exception if there is no chain.
         """
         chain_name = None
         top_to_end_effector = np.eye(4)
@@ -191,27 +180,72 @@ class TransformationTree:
 
         if chain_name is None:
             raise RuntimeError("Could not find chain between this frame and ROOT.")
+        return chain_name, chain_root_to_root, top_to_end_effector
+
+    def set_transform(self, frame_name, transform_mat):
+        """
+        Sets state of nearest parent chain, raises exception if cannot be done.
+        The current chain state seeds the IK, so the closest solution is picked.
+        :param frame_name:
+        :param transform_mat:
+        :return:
+        """
+        chain_name, chain_root_to_root, top_to_end_effector = self.chain_target(frame_name)
 
-        end_effector_to_chain_root = np.linalg.inv(chain_root_to_root)\
-                                     @ transform_mat\
-                                     @ np.linalg.inv(top_to_end_effector)
+        end_effector_to_chain_root = se3.compose(
+            se3.inverse(chain_root_to_root), transform_mat, se3.inverse(top_to_end_effector))
         initial_config = self.chain_states[chain_name]
-        # new_config = self.chains[chain_name].inverse_kinematics(
-        #     end_effector_to_chain_root, [0] + list(initial_config))
 
         try:
-            # new_config = inverse_kinematics_closed_form(
-            #     self.chains[chain_name],
-            #     end_effector_to_chain_root,
-            #     [0] + list(initial_config))
             new_config = inverse_kinematics_closed_form(
                 self.chains[chain_name],
-                end_effector_to_chain_root)
+                end_effector_to_chain_root,
+                [0] + list(initial_config))
             self.set_chain_state(chain_name, new_config[1:])
         except ValueError as e:
             print("Value error, transform:")
             print(transform_mat)
 
+    def solve_transforms(self, frame_name, transform_mats, initial_state=None, processes=1):
+        """
+        Solve the nearest parent chain for a trajectory of frame poses. Each frame is
+        seeded with the solution of the previous one, so the chain stays on one branch.
+        The chain state is not modified.
+        :param frame_name:
+        :param transform_mats: array of shape (N, 4, 4)
+        :param initial_state: seed of the first frame, defaults to the current chain state.
+            An array of shape (N, num_joints) seeds every frame on its own instead.
+        :param processes: solve chunks of the trajectory in a process pool of this size,
+            None for one process per CPU. The result is the same as with 1.
+        :return: (states, valid), states of shape (N, num_joints) with NaN rows where
+            no reachable state exists, valid of shape (N,)
+        """
+        chain_name, chain_root_to_root, top_to_end_effector = self.chain_target(frame_name)
+
+        end_effector_to_chain_root = se3.compose(
+            se3.inverse(chain_root_to_root), transform_mats, se3.inverse(top_to_end_effector))
+        if initial_state is None:
+            initial_state = self.chain_states[chain_name]
+
+        if np.ndim(initial_state) == 2:
+            initial_state = np.asarray(initial_state, dtype=float)
+            configs, valid = inverse_kinematics_closed_form_batch(
+                self.chains[chain_name],
+                end_effector_to_chain_root,
+                np.concatenate([np.zeros((len(initial_state), 1)), initial_state], axis=1))
+        elif processes == 1:
+            configs, valid, branches = inverse_kinematics_trajectory(
+                self.chains[chain_name],
+                end_effector_to_chain_root,
+                [0] + list(initial_state))
+        else:
+            configs, valid, branches = inverse_kinematics_trajectory_parallel(
+                self.chains[chain_name],
+                end_effector_to_chain_root,
+                [0] + list(initial_state),
+                processes=processes)
+        return configs[:, 1:], valid
+
     def get_subtree(self, t, node_name):
         if node_name in self.children:
             tree_node = t.search_nodes(name=node_name)[0]
@@ -261,5 +295,5 @@ class TransformationTree:
         """
         parent_ref = self.get_transform(parent_name, reference_name)
         # child_ref = parent_ref * child_parent
-        child_parent = np.dot(np.array(np.mat(parent_ref).I), child_ref)
+        child_parent = np.dot(se3.inverse(parent_ref), child_ref)
         self.add_node(parent_name, child_name, child_parent)
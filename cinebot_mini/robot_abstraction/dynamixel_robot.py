@@ -0,0 +1,225 @@
+from cinebot_mini import TRANSFORMS
+from cinebot_mini.robot_abstraction.robot import Robot
+from cinebot_mini.robot_abstraction.dynamixel_sync import (
+    SyncBus,
+    speed_to_velocity,
+    load_to_fraction)
+from cinebot_mini.robot_abstraction.joint_table import JointTable, D2R, R2D
+from ikpy.chain import Chain
+from abc import ABC, abstractmethod
+import numpy as np
+import copy
+import time
+import os
+
+# servos of the Cinebot, joint i is DEVICES[i], "type" is the servo model name
+DEVICES = [
+    {
+        "id": 0,
+        "type": "MX28",
+        "bounds": (-3.14, 3.14),
+        "params": {
+            "p_gain": 32,
+            "i_gain": 0,
+            "d_gain": 0
+        }
+    },
+    {
+        "id": 1,
+        "type": "MX28",
+        "bounds": (-2.18, 2.18),
+        "params": {
+            "p_gain": 64,
+            "i_gain": 0,
+            "d_gain": 0
+        }
+    },
+    {
+        "id": 2,
+        "type": "MX28",
+        "bounds": (-2.09, 1.85),
+        "params": {
+            "p_gain": 64,
+            "i_gain": 0,
+            "d_gain": 0
+        }
+    },
+    {
+        "id": 3,
+        "type": "AX12",
+        "bounds": (-2.61, 2.61),
+        "params": {
+            "clockwise_compliance_margin": 1,
+            "counter_clockwise_compliance_margin": 1,
+            "punch": 32
+        }
+    },
+    {
+        "id": 4,
+        "type": "AX12",
+        "bounds": (-1.86, 1.81),
+        "params": {
+            "clockwise_compliance_margin": 1,
+            "counter_clockwise_compliance_margin": 1,
+            "punch": 32
+        }
+    },
+    {
+        "id": 5,
+        "type": "XL320",
+        "bounds": (-2.61, 2.61),
+        "params": {
+            "p_gain": 32,
+            "i_gain": 0,
+            "d_gain": 0
+        }
+    }
+]
+
+
+class DynamixelRobot(Robot, ABC):
+    """
+    Dynamixel servo chain behind a SyncBus: joint limits and encoder conversion,
+    compiled trajectories, bulk reads and kinematics. Subclasses only provide the
+    transport, with write_field() and read_field() for single servo access and
+    optionally run_bus() around the sync bus transactions.
+    """
+    DEVICES = DEVICES
+
+    def __init__(self, transport, urdf_file=None, sync_write=False, sync_read=False):
+        """
+        transport: object the SyncBus sends packets with
+        sync_write: if True, set_joint_angles sends all goal positions with one
+            SYNC_WRITE transaction per protocol group instead of one write per servo
+        sync_read: if True, get_joint_angles reads all servos with one bulk read
+            (see get_joint_states) instead of one round trip per servo
+        """
+        if urdf_file is None:
+            dir_name = os.path.dirname(os.path.realpath(__file__))
+            urdf_file = os.path.join(dir_name, "Cinebot.URDF")
+
+        self.chain = Chain.from_urdf_file(urdf_file)
+        self.chain.name = TRANSFORMS["chain_name"]
+        self.num_joints = len(self.DEVICES)
+        self.joint_table = JointTable.from_devices(self.DEVICES, self.chain)
+
+        self.sync_write = sync_write
+        self.sync_read = sync_read
+        self.sync_bus = SyncBus(transport, self.DEVICES)
+
+    @abstractmethod
+    def write_field(self, id, field, value):
+        """
+        Write a control table field of one servo, e.g. "goal_position" or "torque_enable".
+        """
+
+    @abstractmethod
+    def read_field(self, id, field):
+        """
+        Return: the raw value of a control table field of one servo
+        """
+
+    def run_bus(self, func, args):
+        """
+        Run a sync bus transaction, subclasses may retry it.
+        """
+        return func(*args)
+
+    def initialize(self):
+        self.enable_torque()
+
+    def set_joint_angle(self, id, joint_angle):
+        self.write_field(id, "goal_position", self.angle_to_encode(id, self.clamp(id, joint_angle)))
+
+    def set_joint_angles(self, joint_angles):
+        if self.sync_write:
+            encodes = self.joint_table.trajectory_to_encodes(joint_angles)
+            self.run_bus(self.sync_bus.write_goal_positions, (encodes,))
+            return
+
+        for i, joint_angle in enumerate(joint_angles):
+            self.set_joint_angle(i, joint_angle)
+
+    def compile_trajectory(self, config_trajectory):
+        """
+        Clamp and convert a whole (N, 6) trajectory to encoder ticks ahead of
+        time. With sync_write, every frame is the list of raw SYNC_WRITE packets,
+        otherwise the array of encoder ticks of the frame.
+        """
+        encodes = self.joint_table.trajectory_to_encodes(config_trajectory)
+        if self.sync_write:
+            return [self.sync_bus.goal_position_packets(frame_encodes) for frame_encodes in encodes]
+        return [frame_encodes.tolist() for frame_encodes in encodes]
+
+    def send_compiled_frame(self, frame):
+        if self.sync_write:
+            self.run_bus(self.sync_bus.send_packets, (frame,))
+            return
+
+        for id, encode in enumerate(frame):
+            self.write_field(id, "goal_position", encode)
+
+    def get_joint_angle(self, id):
+        return self.encode_to_angle(id, self.read_field(id, "present_position"))
+
+    def get_joint_angles(self):
+        if self.sync_read:
+            timestamp, states = self.get_joint_states()
+            return states[0].tolist()
+        return [self.get_joint_angle(id) for id in range(self.num_joints)]
+
+    def get_joint_states(self, velocity=False, load=False):
+        """
+        Read the state of all servos in one transaction per protocol group.
+        Return (timestamp, states), where states is a numpy array of shape
+        (k, num_joints): row 0 is joint angles in rad, followed by joint
+        velocities in rad/s if velocity is True and signed load fractions
+        if load is True. The timestamp is the middle of the bus transaction.
+        """
+        fields = ["present_position"]
+        if velocity:
+            fields.append("present_speed")
+        if load:
+            fields.append("present_load")
+
+        start_time = time.time()
+        raw = self.run_bus(self.sync_bus.read, (fields,))
+        end_time = time.time()
+        if raw is None:
+            raise RuntimeError("Bulk read of joint states failed.")
+
+        states = [self.joint_table.encode_to_angle(raw[0])]
+        row = 1
+        if velocity:
+            states.append(speed_to_velocity(raw[row], self.sync_bus.models))
+            row += 1
+        if load:
+            states.append(load_to_fraction(raw[row]))
+        return (start_time + end_time) / 2, np.array(states)
+
+    def get_end_pose(self):
+        angles = self.get_joint_angles()
+        return self.chain.forward_kinematics([0] + list(angles))
+
+    def enable_torque(self):
+        for id in range(self.num_joints):
+            self.write_field(id, "torque_enable", 1)
+
+    def disable_torque(self):
+        for id in range(self.num_joints):
+            self.write_field(id, "torque_enable", 0)
+
+    def get_chain(self):
+        return copy.deepcopy(self.chain)
+
+    def get_joint_table(self):
+        return self.joint_table
+
+    def clamp(self, id, joint_angle):
+        return min(max(joint_angle, self.joint_table.lower[id]), self.joint_table.upper[id])
+
+    def angle_to_encode(self, id, joint_angle):
+        return int((R2D * joint_angle + self.joint_table.offset_degrees[id]) / self.joint_table.degrees_per_tick[id])
+
+    def encode_to_angle(self, id, encode):
+        return (encode * self.joint_table.degrees_per_tick[id] - self.joint_table.offset_degrees[id]) * D2R
@@ -0,0 +1,360 @@
+import numpy as np
+
+""" Dynamixel instruction codes """
+BROADCAST_ID = 0xFE
+USB2AX_ID = 0xFD
+INST_READ = 0x02
+INST_WRITE = 0x03
+INST_SYNC_READ = 0x82
+INST_SYNC_WRITE = 0x83
+INST_SYNC_READ_USB2AX = 0x84
+INST_STATUS = 0x55
+
+""" Protocol version and control table entries (address, size) for each servo model """
+PROTOCOL_VERSIONS = {
+    "MX28": 1,
+    "AX12": 1,
+    "XL320": 2
+}
+
+CONTROL_TABLES = {
+    "MX28": {
+        "torque_enable": (24, 1),
+        "goal_position": (30, 2),
+        "present_position": (36, 2),
+        "present_speed": (38, 2),
+        "present_load": (40, 2)
+    },
+    "AX12": {
+        "torque_enable": (24, 1),
+        "goal_position": (30, 2),
+        "present_position": (36, 2),
+        "present_speed": (38, 2),
+        "present_load": (40, 2)
+    },
+    "XL320": {
+        "torque_enable": (24, 1),
+        "goal_position": (30, 2),
+        "present_position": (37, 2),
+        "present_speed": (39, 2),
+        "present_load": (41, 2)
+    }
+}
+
+""" Present speed unit of each servo model, in rpm """
+SPEED_UNITS = {
+    "MX28": 0.114,
+    "AX12": 0.111,
+    "XL320": 0.111
+}
+
+
+class CommunicationError(Exception):
+    pass
+
+
+def model_name(device_type):
+    """
+    Device types in Cinebot.DEVICES are Pynamixel classes, but plain
+    model name strings are accepted as well.
+    """
+    if isinstance(device_type, str):
+        return device_type
+    return device_type.__name__
+
+
+def compute_checksum(payload):
+    return ~(sum(payload)) & 0xFF
+
+
+def compute_crc16(data):
+    """
+    CRC-16 (polynomial 0x8005) used by Dynamixel protocol 2.0.
+    """
+    crc = 0
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x8005) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+    return crc
+
+
+def to_bytes(value, size):
+    return [(int(value) >> (8 * i)) & 0xFF for i in range(size)]
+
+
+def from_bytes(data):
+    return sum(byte << (8 * i) for i, byte in enumerate(data))
+
+
+def packet_v1(ident, instruction, parameters):
+    payload = [ident, len(parameters) + 2, instruction] + list(parameters)
+    return [0xFF, 0xFF] + payload + [compute_checksum(payload)]
+
+
+def packet_v2(ident, instruction, parameters):
+    # byte stuffing: 0xFD is inserted after every 0xFF 0xFF 0xFD in the parameters
+    stuffed = []
+    for byte in parameters:
+        stuffed.append(byte)
+        if len(stuffed) >= 3 and stuffed[-3:] == [0xFF, 0xFF, 0xFD]:
+            stuffed.append(0xFD)
+    length = len(stuffed) + 3
+    packet = [0xFF, 0xFF, 0xFD, 0x00, ident] + to_bytes(length, 2) + [instruction] + stuffed
+    return packet + to_bytes(compute_crc16(packet), 2)
+
+
+def write_packet(model, ident, field, value):
+    address, size = CONTROL_TABLES[model][field]
+    if PROTOCOL_VERSIONS[model] == 1:
+        return packet_v1(ident, INST_WRITE, [address] + to_bytes(value, size))
+    return packet_v2(ident, INST_WRITE, to_bytes(address, 2) + to_bytes(value, size))
+
+
+def read_packet(model, ident, field):
+    address, size = CONTROL_TABLES[model][field]
+    if PROTOCOL_VERSIONS[model] == 1:
+        return packet_v1(ident, INST_READ, [address, size])
+    return packet_v2(ident, INST_READ, to_bytes(address, 2) + to_bytes(size, 2))
+
+
+def sync_write_packet_v1(address, size, values):
+    """
+    values: dictionary mapping servo id to the integer value to write
+    """
+    parameters = [address, size]
+    for ident in sorted(values):
+        parameters += [ident] + to_bytes(values[ident], size)
+    return packet_v1(BROADCAST_ID, INST_SYNC_WRITE, parameters)
+
+
+def sync_write_packet_v2(address, size, values):
+    """
+    values: dictionary mapping servo id to the integer value to write
+    """
+    parameters = to_bytes(address, 2) + to_bytes(size, 2)
+    for ident in sorted(values):
+        parameters += [ident] + to_bytes(values[ident], size)
+    return packet_v2(BROADCAST_ID, INST_SYNC_WRITE, parameters)
+
+
+def sync_read_packet_usb2ax(address, size, ids):
+    """
+    Protocol 1.0 servos have no sync read, the USB2AX implements one itself:
+    it polls every id and answers with a single status packet holding the
+    data of all servos, in the order of ids.
+    """
+    return packet_v1(USB2AX_ID, INST_SYNC_READ_USB2AX, [address, size] + list(ids))
+
+
+def sync_read_packet_v2(address, size, ids):
+    parameters = to_bytes(address, 2) + to_bytes(size, 2) + list(ids)
+    return packet_v2(BROADCAST_ID, INST_SYNC_READ, parameters)
+
+
+def status_packet_v1(ident, error, parameters):
+    return packet_v1(ident, error, parameters)
+
+
+def status_packet_v2(ident, error, parameters):
+    return packet_v2(ident, INST_STATUS, [error] + list(parameters))
+
+
+def _receive(transport, count):
+    data = transport.receive(count)
+    if len(data) != count:
+        raise CommunicationError("Expected {} bytes, received {}".format(count, len(data)))
+    return data
+
+
+def receive_status_v1(transport):
+    """
+    Return (id, parameters) of a protocol 1.0 status packet.
+    """
+    header = _receive(transport, 4)
+    if header[:2] != [0xFF, 0xFF]:
+        raise CommunicationError("Invalid header {}".format(header))
+    ident, length = header[2:]
+    payload = _receive(transport, length)
+    if compute_checksum([ident, length] + payload[:-1]) != payload[-1]:
+        raise CommunicationError("Invalid checksum from id {}".format(ident))
+    if payload[0] != 0:
+        raise CommunicationError("Id {} reported error {:#04x}".format(ident, payload[0]))
+    return ident, payload[1:-1]
+
+
+def receive_status_v2(transport):
+    """
+    Return (id, parameters) of a protocol 2.0 status packet. Byte stuffing is
+    not undone, present position/speed/load never contain 0xFF 0xFF 0xFD.
+    """
+    header = _receive(transport, 7)
+    if header[:4] != [0xFF, 0xFF, 0xFD, 0x00]:
+        raise CommunicationError("Invalid header {}".format(header))
+    ident = header[4]
+    payload = _receive(transport, from_bytes(header[5:7]))
+    if compute_crc16(header + payload[:-2]) != from_bytes(payload[-2:]):
+        raise CommunicationError("Invalid CRC from id {}".format(ident))
+    if payload[0] != INST_STATUS:
+        raise CommunicationError("Id {} sent instruction {:#04x}".format(ident, payload[0]))
+    if payload[1] & 0x7F:
+        raise CommunicationError("Id {} reported error {:#04x}".format(ident, payload[1]))
+    return ident, payload[2:-2]
+
+
+def receive_status(transport, model):
+    if PROTOCOL_VERSIONS[model] == 1:
+        return receive_status_v1(transport)
+    return receive_status_v2(transport)
+
+
+def speed_to_velocity(raw, models):
+    """
+    raw: integer array (..., num_joints) of present speed values
+    Return joint velocities in rad/s. Bit 10 of the raw value is the direction.
+    """
+    raw = np.asarray(raw, dtype=np.int64)
+    units = np.array([SPEED_UNITS[model] for model in models]) * 2 * np.pi / 60.0
+    sign = np.where(raw & 0x400, -1.0, 1.0)
+    return sign * (raw & 0x3FF) * units
+
+
+def load_to_fraction(raw):
+    """
+    raw: integer array of present load values
+    Return the load as a signed fraction of the maximum torque.
+    """
+    raw = np.asarray(raw, dtype=np.int64)
+    sign = np.where(raw & 0x400, -1.0, 1.0)
+    return sign * (raw & 0x3FF) / 1023.0
+
+
+class LoopbackTransport:
+    """
+    Fake serial port with the same interface as a Pynamixel hardware object.
+    Every packet passed to send() is one bus transaction; bytes and
+    transactions are counted so the cost of a write path can be measured
+    without servos attached.
+    """
+    def __init__(self, responder=None):
+        """
+        responder: optional function taking a sent packet and returning the
+            bytes the bus answers with
+        """
+        self.responder = responder
+        self.packets = []
+        self.bytes_sent = 0
+        self.transactions = 0
+        self.responses = []
+
+    def send(self, data):
+        assert isinstance(data, list) and all(isinstance(b, int) and 0 <= b <= 0xFF for b in data), data
+        self.packets.append(list(data))
+        self.bytes_sent += len(data)
+        self.transactions += 1
+        if self.responder is not None:
+            self.responses += self.responder(list(data))
+
+    def receive(self, count):
+        data = self.responses[:count]
+        self.responses = self.responses[count:]
+        return data
+
+    def flush(self):
+        self.responses = []
+
+    def reset(self):
+        self.packets = []
+        self.bytes_sent = 0
+        self.transactions = 0
+
+
+class SyncBus:
+    """
+    Writes one control table entry of every servo with a single broadcast
+    SYNC_WRITE per protocol group, so that all servos of a group receive
+    their goal in the same bus transaction. The MX28/AX12 servos share one
+    protocol 1.0 packet, the XL320 gets its own protocol 2.0 packet.
+    Reads go the same way through the USB2AX sync read and protocol 2.0
+    SYNC_READ, one transaction per group.
+    """
+    def __init__(self, transport, devices):
+        """
+        transport: object with send(list of bytes), receive(count) and flush(),
+            e.g. a Pynamixel hardware or a LoopbackTransport
+        devices: list of device configs like Cinebot.DEVICES, joint i is devices[i]
+        """
+        self.transport = transport
+        self.ids = [device["id"] for device in devices]
+        self.models = [model_name(device["type"]) for device in devices]
+
+        # group joint indices by (protocol, goal position address, size)
+        self.groups = dict()
+        for joint, model in enumerate(self.models):
+            address, size = CONTROL_TABLES[model]["goal_position"]
+            key = (PROTOCOL_VERSIONS[model], address, size)
+            self.groups.setdefault(key, []).append(joint)
+
+        # present values start at different addresses for MX28/AX12 and XL320
+        self.read_groups = dict()
+        for joint, model in enumerate(self.models):
+            key = (PROTOCOL_VERSIONS[model], CONTROL_TABLES[model]["present_position"][0])
+            self.read_groups.setdefault(key, []).append(joint)
+
+    def goal_position_packets(self, encodes):
+        """
+        encodes: iterable of integer encoder values, one per joint
+        Return a list of packets (lists of bytes), one per protocol group.
+        """
+        packets = []
+        for (protocol, address, size), joints in self.groups.items():
+            values = {self.ids[joint]: encodes[joint] for joint in joints}
+            if protocol == 1:
+                packets.append(sync_write_packet_v1(address, size, values))
+            else:
+                packets.append(sync_write_packet_v2(address, size, values))
+        return packets
+
+    def send_packets(self, packets):
+        for packet in packets:
+            self.transport.send(packet)
+
+    def write_goal_positions(self, encodes):
+        self.send_packets(self.goal_position_packets(encodes))
+
+    def read(self, fields=("present_position",)):
+        """
+        fields: names of contiguous control table entries, e.g.
+            ("present_position", "present_speed", "present_load")
+        Return an integer numpy array of shape (len(fields), num_joints).
+        """
+        result = np.zeros((len(fields), len(self.ids)), dtype=np.int64)
+        for (protocol, _), joints in self.read_groups.items():
+            table = CONTROL_TABLES[self.models[joints[0]]]
+            start = min(table[field][0] for field in fields)
+            end = max(table[field][0] + table[field][1] for field in fields)
+            ids = [self.ids[joint] for joint in joints]
+
+            if protocol == 1:
+                self.transport.send(sync_read_packet_usb2ax(start, end - start, ids))
+                _, data = receive_status_v1(self.transport)
+                if len(data) != (end - start) * len(ids):
+                    raise CommunicationError("USB2AX sync read returned {} bytes".format(len(data)))
+                blocks = [data[i * (end - start): (i + 1) * (end - start)] for i in range(len(ids))]
+            else:
+                self.transport.send(sync_read_packet_v2(start, end - start, ids))
+                blocks = []
+                for ident in ids:
+                    status_id, data = receive_status_v2(self.transport)
+                    if status_id != ident or len(data) != end - start:
+                        raise CommunicationError("Unexpected sync read status from id {}".format(status_id))
+                    blocks.append(data)
+
+            for joint, block in zip(joints, blocks):
+                for row, field in enumerate(fields):
+                    address, size = table[field]
+                    result[row, joint] = from_bytes(block[address - start: address - start + size])
+        return result
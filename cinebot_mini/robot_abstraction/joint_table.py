@@ -0,0 +1,93 @@
+from cinebot_mini.robot_abstraction.dynamixel_sync import model_name
+import numpy as np
+
+""" Radians to/from  Degrees conversions """
+D2R = 3.141592 / 180.0
+R2D = 180.0 / 3.141592
+
+""" Encoder of each servo model: (degrees per tick, angle of tick 0 in degrees, max tick) """
+ENCODER_RESOLUTIONS = {
+    "MX28": (0.088, 180.0, 4095),
+    "AX12": (0.29, 150.0, 1023),
+    "XL320": (0.29, 150.0, 1023)
+}
+
+""" Motion limits of each servo model: (max velocity in rad/s, max acceleration in rad/s^2).
+Velocities are the no-load speeds of the datasheets (MX28 55 rpm at 12V, AX12 59 rpm at 12V,
+XL320 114 rpm at 7.4V), accelerations are conservative values for the camera payload. """
+MOTION_LIMITS = {
+    "MX28": (5.76, 20.0),
+    "AX12": (6.18, 20.0),
+    "XL320": (11.9, 30.0)
+}
+
+
+class JointTable:
+    """
+    Per-joint angle limits and encoder resolution as numpy arrays, so that
+    single configurations of shape (num_joints,) and whole trajectories of
+    shape (N, num_joints) are clamped and converted in one call.
+    """
+    def __init__(self, models, lower, upper, velocity_limits=None, acceleration_limits=None):
+        """
+        velocity_limits, acceleration_limits: optional per-joint limits, default to MOTION_LIMITS of the model
+        """
+        self.models = list(models)
+        self.lower = np.array(lower, dtype=float)
+        self.upper = np.array(upper, dtype=float)
+        resolutions = np.array([ENCODER_RESOLUTIONS[model] for model in self.models])
+        self.degrees_per_tick = resolutions[:, 0]
+        self.offset_degrees = resolutions[:, 1]
+        self.max_encode = resolutions[:, 2].astype(int)
+        limits = np.array([MOTION_LIMITS[model] for model in self.models])
+        self.velocity_limits = limits[:, 0] if velocity_limits is None else np.array(velocity_limits, dtype=float)
+        self.acceleration_limits = limits[:, 1] if acceleration_limits is None \
+            else np.array(acceleration_limits, dtype=float)
+
+    @classmethod
+    def from_devices(cls, devices, chain=None):
+        """
+        devices: list of device configs like Cinebot.DEVICES, joint i is devices[i].
+            Joint limits are taken from the "bounds" entry of a device config,
+            or from the bounds of the corresponding link in chain (the URDF).
+            Optional "max_velocity" and "max_acceleration" entries override MOTION_LIMITS.
+        chain: optional ikpy.chain.Chain
+        """
+        models = []
+        lower = []
+        upper = []
+        velocity_limits = []
+        acceleration_limits = []
+        for i, device in enumerate(devices):
+            models.append(model_name(device["type"]))
+            velocity_limits.append(device.get("max_velocity", MOTION_LIMITS[models[-1]][0]))
+            acceleration_limits.append(device.get("max_acceleration", MOTION_LIMITS[models[-1]][1]))
+            if "bounds" in device:
+                bounds = device["bounds"]
+            elif chain is not None:
+                bounds = chain.links[i + 1].bounds
+            else:
+                raise ValueError("No bounds for joint {}".format(i))
+            lower.append(bounds[0])
+            upper.append(bounds[1])
+        return cls(models, lower, upper, velocity_limits, acceleration_limits)
+
+    def num_joints(self):
+        return len(self.models)
+
+    def clamp(self, joint_angles):
+        return np.clip(joint_angles, self.lower, self.upper)
+
+    def angle_to_encode(self, joint_angles):
+        encodes = (R2D * np.asarray(joint_angles) + self.offset_degrees) / self.degrees_per_tick
+        return np.trunc(encodes).astype(int)
+
+    def encode_to_angle(self, encodes):
+        return (np.asarray(encodes) * self.degrees_per_tick - self.offset_degrees) * D2R
+
+    def trajectory_to_encodes(self, config_trajectory):
+        """
+        config_trajectory: array of shape (N, num_joints) in radians
+        Return the clamped encoder ticks, an int array of shape (N, num_joints).
+        """
+        return self.angle_to_encode(self.clamp(np.asarray(config_trajectory, dtype=float)))
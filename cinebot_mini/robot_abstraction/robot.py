@@ -1,6 +1,9 @@
 
 
 
+import time
+
+
 class Robot:
     def set_joint_angle(self, id, joint_angle):
         pass
@@ -8,12 +11,42 @@ class Robot:
     def set_joint_angles(self, joint_angles):
         pass
 
+    def compile_trajectory(self, config_trajectory):
+        """
+        Convert a trajectory to a list of frames that send_compiled_frame()
+        can send without further conversion. By default a frame is the
+        joint configuration itself.
+        """
+        return [config for config in config_trajectory]
+
+    def send_compiled_frame(self, frame):
+        self.set_joint_angles(frame)
+
     def get_joint_angle(self, id):
         pass
 
     def get_joint_angles(self):
         pass
 
+    def get_joint_states(self, velocity=False, load=False):
+        pass
+
+    def iter_joint_states(self, rate_hz, velocity=False, load=False):
+        """
+        Generator yielding get_joint_states() at a fixed rate. Samples are
+        scheduled against absolute deadlines, missed deadlines are skipped.
+        """
+        period = 1.0 / rate_hz
+        next_time = time.perf_counter()
+        while True:
+            yield self.get_joint_states(velocity, load)
+            next_time += period
+            sleep_time = next_time - time.perf_counter()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            else:
+                next_time = time.perf_counter()
+
     def get_end_pose(self):
         pass
 
@@ -26,5 +59,8 @@ class Robot:
     def get_chain(self):
         pass
 
+    def get_joint_table(self):
+        pass
+
     def set_end_pose(self, pose_matrix):
         pass
\ No newline at end of file
@@ -0,0 +1,200 @@
+from cinebot_mini.robot_abstraction.dynamixel_robot import DynamixelRobot
+from cinebot_mini.robot_abstraction.joint_table import JointTable
+from cinebot_mini.robot_abstraction.dynamixel_sync import (
+    CONTROL_TABLES,
+    SPEED_UNITS,
+    USB2AX_ID,
+    INST_READ,
+    INST_WRITE,
+    INST_SYNC_READ,
+    INST_SYNC_WRITE,
+    INST_SYNC_READ_USB2AX,
+    LoopbackTransport,
+    from_bytes,
+    to_bytes,
+    write_packet,
+    read_packet,
+    receive_status,
+    status_packet_v1,
+    status_packet_v2)
+import numpy as np
+import time
+
+
+class SimulatedTransport(LoopbackTransport):
+    """
+    LoopbackTransport that takes as long as the real bus: every transaction
+    costs a fixed latency (USB frame and servo return delay) plus the wire
+    time of the bytes sent and received.
+    """
+    def __init__(self, responder, latency=0.001, baudrate=1000000):
+        super().__init__(responder)
+        self.latency = latency
+        self.byte_time = 10.0 / baudrate  # 8 data bits, 1 start bit, 1 stop bit
+        self.bus_time = 0.0
+
+    def send(self, data):
+        num_responses = len(self.responses)
+        super().send(data)
+        num_bytes = len(data) + len(self.responses) - num_responses
+        duration = self.latency + num_bytes * self.byte_time
+        self.bus_time += duration
+        if duration > 0:
+            time.sleep(duration)
+
+    def reset(self):
+        super().reset()
+        self.bus_time = 0.0
+
+
+class SimulatedServos:
+    """
+    Control tables and dynamics of the servos on the bus. Every servo with
+    torque enabled follows its goal position with a first-order response
+    of the given time constant. Goal and present positions are quantized
+    by the encoder resolution of the servo model.
+    """
+    def __init__(self, devices, joint_table: JointTable, time_constant=0.05, initial_angles=None):
+        self.ids = [device["id"] for device in devices]
+        self.index = {ident: joint for joint, ident in enumerate(self.ids)}
+        self.models = joint_table.models
+        self.joint_table = joint_table
+        self.time_constant = time_constant
+
+        if initial_angles is None:
+            initial_angles = np.zeros(len(self.ids))
+        self.position = np.array(initial_angles, dtype=float)
+        self.goal_encode = joint_table.angle_to_encode(self.position)
+        self.goal = joint_table.encode_to_angle(self.goal_encode)
+        self.torque = np.zeros(len(self.ids), dtype=bool)
+        self.time = time.perf_counter()
+
+    def update(self):
+        now = time.perf_counter()
+        alpha = np.exp(-(now - self.time) / self.time_constant)
+        self.position = np.where(self.torque, self.goal + (self.position - self.goal) * alpha, self.position)
+        self.time = now
+
+    def velocity(self):
+        return np.where(self.torque, (self.goal - self.position) / self.time_constant, 0.0)
+
+    def field_values(self, joint):
+        model = self.models[joint]
+        encode = self.joint_table.angle_to_encode(self.position)[joint]
+        speed = self.velocity()[joint] / (SPEED_UNITS[model] * 2 * np.pi / 60.0)
+        raw_speed = min(int(round(abs(speed))), 0x3FF) | (0x400 if speed < 0 else 0)
+        return {
+            "torque_enable": int(self.torque[joint]),
+            "goal_position": int(self.goal_encode[joint]),
+            "present_position": int(np.clip(encode, 0, self.joint_table.max_encode[joint])),
+            "present_speed": raw_speed,
+            "present_load": 0
+        }
+
+    def read(self, ident, address, size):
+        joint = self.index[ident]
+        memory = dict()
+        for field, value in self.field_values(joint).items():
+            field_address, field_size = CONTROL_TABLES[self.models[joint]][field]
+            for i, byte in enumerate(to_bytes(value, field_size)):
+                memory[field_address + i] = byte
+        return [memory.get(address + i, 0) for i in range(size)]
+
+    def write(self, ident, address, data):
+        joint = self.index[ident]
+        for field, (field_address, field_size) in CONTROL_TABLES[self.models[joint]].items():
+            offset = field_address - address
+            if offset < 0 or offset + field_size > len(data):
+                continue
+            value = from_bytes(data[offset: offset + field_size])
+            if field == "torque_enable":
+                self.torque[joint] = bool(value)
+            elif field == "goal_position":
+                self.goal_encode[joint] = value
+                self.goal[joint] = self.joint_table.encode_to_angle(self.goal_encode)[joint]
+
+    def respond(self, packet):
+        """
+        Answer an instruction packet like the servos and the USB2AX would.
+        """
+        self.update()
+        if packet[:4] == [0xFF, 0xFF, 0xFD, 0x00]:
+            ident, instruction, parameters = packet[4], packet[7], packet[8:-2]
+            if instruction == INST_SYNC_WRITE:
+                address, size = from_bytes(parameters[0:2]), from_bytes(parameters[2:4])
+                for i in range(4, len(parameters), size + 1):
+                    self.write(parameters[i], address, parameters[i + 1: i + 1 + size])
+                return []
+            if instruction == INST_SYNC_READ:
+                address, size = from_bytes(parameters[0:2]), from_bytes(parameters[2:4])
+                response = []
+                for ident in parameters[4:]:
+                    response += status_packet_v2(ident, 0, self.read(ident, address, size))
+                return response
+            if instruction == INST_WRITE:
+                self.write(ident, from_bytes(parameters[0:2]), parameters[2:])
+                return status_packet_v2(ident, 0, [])
+            if instruction == INST_READ:
+                address, size = from_bytes(parameters[0:2]), from_bytes(parameters[2:4])
+                return status_packet_v2(ident, 0, self.read(ident, address, size))
+        else:
+            ident, instruction, parameters = packet[2], packet[4], packet[5:-1]
+            if instruction == INST_SYNC_WRITE:
+                address, size = parameters[0:2]
+                for i in range(2, len(parameters), size + 1):
+                    self.write(parameters[i], address, parameters[i + 1: i + 1 + size])
+                return []
+            if instruction == INST_SYNC_READ_USB2AX and ident == USB2AX_ID:
+                address, size = parameters[0:2]
+                data = []
+                for ident in parameters[2:]:
+                    data += self.read(ident, address, size)
+                return status_packet_v1(USB2AX_ID, 0, data)
+            if instruction == INST_WRITE:
+                self.write(ident, parameters[0], parameters[1:])
+                return status_packet_v1(ident, 0, [])
+            if instruction == INST_READ:
+                return status_packet_v1(ident, 0, self.read(ident, parameters[0], parameters[1]))
+        return []
+
+
+class SimulatedCinebot(DynamixelRobot):
+    """
+    Cinebot without hardware. Commands are encoded into the same Dynamixel
+    packets as on the real bus and answered by SimulatedServos through a
+    SimulatedTransport, so execution routines and planners can be timed,
+    and the sync-write and per-joint write paths compared, without servos.
+    Everything above the transport is shared with Cinebot, see DynamixelRobot.
+    """
+    def __init__(self, urdf_file=None, latency=0.001, baudrate=1000000, time_constant=0.05,
+                 initial_angles=None, sync_write=False, sync_read=False):
+        """
+        latency: fixed cost of one bus transaction in seconds
+        baudrate: bus baudrate, used for the wire time of each byte
+        time_constant: time constant of the first-order servo response in seconds
+        initial_angles: joint angles at startup, defaults to zeros
+        """
+        # the servos need the joint table, which is built by DynamixelRobot after the transport
+        self.transport = SimulatedTransport(lambda packet: self.servos.respond(packet), latency, baudrate)
+        super().__init__(self.transport, urdf_file, sync_write, sync_read)
+        self.servos = SimulatedServos(self.DEVICES, self.joint_table, time_constant, initial_angles)
+
+    def _transaction(self, id, packet):
+        self.transport.send(packet)
+        return receive_status(self.transport, self.joint_table.models[id])[1]
+
+    def bus_stats(self):
+        return {
+            "transactions": self.transport.transactions,
+            "bytes_sent": self.transport.bytes_sent,
+            "bus_time": self.transport.bus_time
+        }
+
+    def reset_bus_stats(self):
+        self.transport.reset()
+
+    def write_field(self, id, field, value):
+        self._transaction(id, write_packet(self.joint_table.models[id], id, field, value))
+
+    def read_field(self, id, field):
+        return from_bytes(self._transaction(id, read_packet(self.joint_table.models[id], id, field)))
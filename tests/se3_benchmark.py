@@ -0,0 +1,46 @@
+from cinebot_mini.geometry_utils import se3
+import numpy as np
+import timeit
+
+num = 1000
+rng = np.random.RandomState(0)
+rotvecs = rng.normal(size=(num, 3))
+transforms = se3.exp(np.concatenate([rng.uniform(-1, 1, (num, 3)), rotvecs], axis=1))
+eyes = rng.uniform(-1, 1, (num, 3)) + [0, 0, 2]
+target = np.zeros(3)
+
+
+def look_at_loop():
+    # per frame look-at, as Gaze3DInterpolator._get_transform_matrix used to do
+    result = []
+    for eye in eyes:
+        z_local = (target - eye) / np.linalg.norm(target - eye)
+        x_local = np.cross(z_local, np.array([0, 0, 1]))
+        x_local /= np.linalg.norm(x_local)
+        trans = np.eye(4)
+        trans[:3, 0] = x_local
+        trans[:3, 1] = np.cross(z_local, x_local)
+        trans[:3, 2] = z_local
+        trans[:3, 3] = eye
+        result.append(trans)
+    return result
+
+
+cases = [
+    ("inverse, np.mat(H).I loop", lambda: [np.array(np.mat(H).I) for H in transforms]),
+    ("inverse, np.linalg.inv loop", lambda: [np.linalg.inv(H) for H in transforms]),
+    ("inverse, np.linalg.inv batched", lambda: np.linalg.inv(transforms)),
+    ("inverse, se3.inverse loop", lambda: [se3.inverse(H) for H in transforms]),
+    ("inverse, se3.inverse batched", lambda: se3.inverse(transforms)),
+    ("compose, np.dot loop", lambda: [np.dot(H, H) for H in transforms]),
+    ("compose, se3.compose batched", lambda: se3.compose(transforms, transforms)),
+    ("look-at loop", look_at_loop),
+    ("look-at, se3.look_at batched", lambda: se3.look_at(eyes, target)),
+    ("log, se3.log batched", lambda: se3.log(transforms)),
+    ("quaternion, se3.matrix_to_quaternion batched", lambda: se3.matrix_to_quaternion(transforms)),
+]
+
+print("{} transforms".format(num))
+for name, func in cases:
+    duration = min(timeit.repeat(func, number=10, repeat=3)) / 10
+    print("{:48s} {:10.3f} ms".format(name, duration * 1000))
@@ -3,6 +3,7 @@ from cinebot_mini.execution_routine.planner import (
     GazePlanner,
     save_planner,
     load_planner)
+from cinebot_mini.execution_routine.plan_cache import PlanCache
 from cinebot_mini.execution_routine.slomo_execution import SlomoModeExecution
 from cinebot_mini.robot_abstraction.cinebot import Cinebot
 from cinebot_mini.geometry_utils.transformation_tree import TransformationTree
@@ -24,7 +25,7 @@ camera_mat = TRANSFORMS["robot_camera_to_robot"]
 
 tf.add_node("joint5", camera_name, camera_mat)
 
-planner = GazePlanner(robot, tf)
+planner = GazePlanner(robot, tf, disk_cache=PlanCache())
 
 robot.retry = 10
 planner.add_gaze_point()
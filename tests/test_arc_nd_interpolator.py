@@ -0,0 +1,62 @@
+from cinebot_mini.geometry_utils.arc_nd_interpolator import ArcNDInterpolator
+import numpy as np
+
+
+def random_path(num_points=40, dims=6, seed=0):
+    return np.cumsum(np.random.RandomState(seed).normal(size=(num_points, dims)) * 0.1, axis=0)
+
+
+def test_table_matches_quad():
+    # recorded joint paths of DirectPlanner and short camera paths of GazePlanner
+    for num_points, dims in [(40, 6), (6, 6), (5, 3)]:
+        for seed in range(3):
+            path = random_path(num_points, dims, seed)
+            quad = ArcNDInterpolator(path, num_cache=20, engine="quad")
+            table = ArcNDInterpolator(path, num_cache=20, engine="table")
+
+            assert abs(quad.length() - table.length()) < 1e-6
+            arc_lengths = np.linspace(0, quad.length(), 300)
+            # the quad engine bisects to bisection_error in arc length
+            assert np.max(np.abs(quad.generate(arc_lengths) - table.generate(arc_lengths))) < 2 * quad.bisection_error
+
+
+def test_table_inverse():
+    path = random_path(seed=1)
+    table = ArcNDInterpolator(path, num_cache=21)
+    t = np.array(table.intermediate_t)
+    # arc length from the start to each intermediate parameter, integrated with quad
+    arc_lengths = [table._integrate_arc_length_interval(0, t_i) for t_i in t]
+    assert np.allclose(arc_lengths, table.intermediate_arc_lengths, atol=1e-7)
+
+
+def test_adaptive_tolerance():
+    short = ArcNDInterpolator(random_path(num_points=4, seed=2), tolerance=1e-3)
+    long = ArcNDInterpolator(random_path(num_points=60, seed=2), tolerance=1e-3)
+    for interpolator in [short, long]:
+        assert interpolator.max_error <= 1e-3
+        assert interpolator.fit_error() == interpolator.max_error
+        assert len(interpolator.intermediate_path) == interpolator.num_knots()
+    # knots follow the complexity of the path instead of a fixed num_cache
+    assert short.num_knots() < 21 < long.num_knots()
+    assert ArcNDInterpolator(random_path(num_points=60, seed=2)).fit_error() > 1e-3
+
+
+def test_compile():
+    from scipy.interpolate import splev
+    import pickle
+
+    interpolator = ArcNDInterpolator(random_path(seed=3), num_cache=21)
+    compiled = interpolator.compile()
+    arc_lengths = np.linspace(0, interpolator.length(), 1000)
+
+    assert np.allclose(compiled.generate(arc_lengths), interpolator.generate(arc_lengths), atol=1e-12)
+    assert np.allclose(compiled.at(arc_lengths[123]), interpolator.at(arc_lengths[123]), atol=1e-12)
+    for der in [1, 2, 3]:
+        expected = np.array(splev(arc_lengths, interpolator.intermediate_spline_params, der=der)).T
+        assert np.allclose(compiled.generate(arc_lengths, der=der), expected, atol=1e-8)
+    assert np.allclose(compiled.generate(arc_lengths, der=4), 0.0)
+
+    restored = pickle.loads(pickle.dumps(compiled))
+    assert np.array_equal(restored.generate(arc_lengths), compiled.generate(arc_lengths))
+    num_pieces = len(compiled.coefficients)
+    assert len(compiled.to_array()) == 3 + num_pieces + 1 + num_pieces * 4 * 6
@@ -0,0 +1,89 @@
+from cinebot_mini.geometry_utils.closed_form_ik import (
+    chain_parameters,
+    inverse_kinematics_closed_form,
+    inverse_kinematics_closed_form_batch,
+    inverse_kinematics_trajectory,
+    inverse_kinematics_trajectory_parallel)
+from ikpy.chain import Chain
+import numpy as np
+import os
+
+URDF_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "cinebot_mini", "robot_abstraction", "Cinebot.URDF")
+
+
+def random_poses(chain, num_poses, seed=0):
+    bounds = np.array([link.bounds for link in chain.links[1:]])
+    configs = np.random.RandomState(seed).uniform(bounds[:, 0], bounds[:, 1], (num_poses, 6))
+    poses = np.array([chain.forward_kinematics([0] + list(config)) for config in configs])
+    # some unreachable poses
+    poses[::20, :3, 3] *= 5
+    return poses
+
+
+def test_batch_parity():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    poses = random_poses(chain, 500)
+
+    configs, valid = inverse_kinematics_closed_form_batch(chain, poses)
+    assert configs.shape == (500, 7)
+    for pose, config, config_valid in zip(poses, configs, valid):
+        try:
+            expected = inverse_kinematics_closed_form(chain, pose)
+        except (RuntimeError, ValueError):
+            assert not config_valid
+            continue
+        assert config_valid
+        assert np.max(np.abs(config - expected)) < 1e-9
+
+
+def test_batch_parity_initial_position():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    poses = random_poses(chain, 200, seed=1)
+    initial_position = [0, 1.0, -1.0, 1.0, -1.0, 1.0, -1.0]
+
+    configs, valid = inverse_kinematics_closed_form_batch(chain, poses, initial_position)
+    for pose, config in zip(poses[valid], configs[valid]):
+        expected = inverse_kinematics_closed_form(chain, pose, initial_position)
+        assert np.max(np.abs(config - expected)) < 1e-9
+
+
+def test_trajectory_continuity():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    params = chain_parameters(chain)
+    assert chain_parameters(chain) is params
+
+    # smooth joint space path with the wrist far from the zero seed
+    t = np.linspace(0, 1, 300)[:, None]
+    configs = np.array([0.0, -0.6, -1.2, 2.0, 1.0, 0.5]) + 0.4 * np.sin(2 * np.pi * t) * np.ones(6)
+    poses = params.fk.forward_kinematics(configs, full_kinematics=False)
+
+    solved, valid, branches = inverse_kinematics_trajectory(chain, poses, [0] + list(configs[0]))
+    assert np.all(valid)
+    assert np.all(branches == branches[0])
+    assert np.max(np.abs(np.diff(solved, axis=0))) < 0.05
+    assert np.allclose(solved[:, 1:], configs, atol=1e-9)
+    assert np.allclose(params.fk.forward_kinematics(solved, full_kinematics=False), poses, atol=1e-9)
+
+    # seeding every frame with zeros flips the wrist along the way
+    seeded, seeded_valid = inverse_kinematics_closed_form_batch(chain, poses)
+    assert np.max(np.abs(np.diff(seeded, axis=0))) > 3.0
+
+
+def test_parallel_trajectory_matches_serial():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    params = chain_parameters(chain)
+    t = np.linspace(0, 1, 300)[:, None]
+    configs = np.array([0.0, -0.6, -1.2, 2.0, 1.0, 0.5]) + 0.4 * np.sin(2 * np.pi * t) * np.ones(6)
+    smooth_poses = params.fk.forward_kinematics(configs, full_kinematics=False)
+    # random poses switch branches and wrap angles at the seams, with a chunk of unreachable poses
+    random = random_poses(chain, 200, seed=1)
+    random[40:60, :3, 3] *= 5
+
+    for poses, initial_position in [(smooth_poses, [0] + list(configs[0])), (random, None)]:
+        expected = inverse_kinematics_trajectory(chain, poses, initial_position)
+        for chunk_size in [1, 20, 37]:
+            result = inverse_kinematics_trajectory_parallel(
+                chain, poses, initial_position, processes=2, chunk_size=chunk_size)
+            for expected_array, array in zip(expected, result):
+                assert np.array_equal(expected_array, array, equal_nan=True)
@@ -0,0 +1,56 @@
+from cinebot_mini.geometry_utils.forward_kinematics import ChainFK
+from ikpy.chain import Chain
+import numpy as np
+import os
+
+URDF_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "cinebot_mini", "robot_abstraction", "Cinebot.URDF")
+
+
+def test_forward_kinematics_matches_ikpy():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    fk = ChainFK.from_urdf_file(URDF_FILE)
+    configs = np.random.RandomState(0).uniform(-np.pi, np.pi, (100, 6))
+
+    frames = fk.forward_kinematics(configs)
+    assert frames.shape == (100, 7, 4, 4)
+    for config, config_frames in zip(configs, frames):
+        expected = chain.forward_kinematics([0] + list(config), full_kinematics=True)
+        assert np.allclose(config_frames, expected, atol=1e-12)
+
+    end_frames = fk.forward_kinematics(configs, full_kinematics=False)
+    assert np.allclose(end_frames, frames[:, -1])
+
+
+def test_general_axis():
+    # a joint about a non principal axis goes through the Rodrigues formula
+    axis = np.array([1.0, 2.0, 2.0]) / 3.0
+    fk = ChainFK(np.eye(4)[None], axis[None])
+    theta = 0.7
+    frame = fk.forward_kinematics([theta], full_kinematics=False)
+
+    k = np.array([[0, -axis[2], axis[1]], [axis[2], 0, -axis[0]], [-axis[1], axis[0], 0]])
+    expected = np.eye(3) + np.sin(theta) * k + (1 - np.cos(theta)) * k @ k
+    assert np.allclose(frame[:3, :3], expected)
+
+
+def test_jacobian_matches_finite_differences():
+    fk = ChainFK.from_urdf_file(URDF_FILE)
+    configs = np.random.RandomState(1).uniform(-1, 1, (10, 6))
+    tool = np.eye(4)
+    tool[:3, 3] = [0.0, 0.02, 0.03]
+
+    jacobians = fk.jacobian(configs, tool)
+    assert jacobians.shape == (10, 6, 6)
+    end = np.matmul(fk.forward_kinematics(configs, full_kinematics=False), tool)
+    eps = 1e-6
+    for i in range(6):
+        shifted = configs.copy()
+        shifted[:, i] += eps
+        shifted_end = np.matmul(fk.forward_kinematics(shifted, full_kinematics=False), tool)
+        velocity = (shifted_end[:, :3, 3] - end[:, :3, 3]) / eps
+        # angular velocity from the skew symmetric part of dR R^T
+        rotation_rate = np.matmul(shifted_end[:, :3, :3] - end[:, :3, :3], np.swapaxes(end[:, :3, :3], 1, 2)) / eps
+        angular_velocity = np.stack([rotation_rate[:, 2, 1], rotation_rate[:, 0, 2], rotation_rate[:, 1, 0]], axis=1)
+        assert np.allclose(jacobians[:, :3, i], velocity, atol=1e-5)
+        assert np.allclose(jacobians[:, 3:, i], angular_velocity, atol=1e-5)
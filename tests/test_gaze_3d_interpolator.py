@@ -0,0 +1,48 @@
+from cinebot_mini.geometry_utils import Gaze3DInterpolator
+from cinebot_mini.geometry_utils import se3
+import numpy as np
+
+
+def test_generate_matches_at():
+    t = np.linspace(0, 1, 8)
+    camera_points = np.stack([np.cos(3 * t), np.sin(3 * t), 0.5 + t], axis=1)
+    gaze_points = np.stack([0.1 * t, 0.2 * t ** 2, 0.1 * np.ones_like(t)], axis=1)
+    for gaze_input in [gaze_points, gaze_points[0]]:
+        interpolator = Gaze3DInterpolator(camera_points, gaze_input)
+        arc_lengths = np.linspace(0, interpolator.length(), 50)
+        poses = interpolator.generate(arc_lengths)
+        assert poses.shape == (50, 4, 4)
+        assert np.allclose(poses, [interpolator.at(s) for s in arc_lengths])
+
+
+def test_overhead_gaze():
+    # the camera passes right above the gaze point, view direction parallel to world z
+    camera_points = np.array([[-1.0, 0.0, 1.0], [-0.5, 0.0, 1.0], [0.0, 0.0, 1.0], [0.5, 0.0, 1.0], [1.0, 0.0, 1.0]])
+    interpolator = Gaze3DInterpolator(camera_points, np.zeros(3))
+    poses = interpolator.generate(np.linspace(0, interpolator.length(), 5))
+    assert np.all(np.isfinite(poses))
+    assert np.allclose(poses[2, :3, 2], [0, 0, -1])
+    rotations = poses[:, :3, :3]
+    assert np.allclose(np.matmul(np.swapaxes(rotations, 1, 2), rotations), np.eye(3))
+
+
+def test_roll_continuous_through_zenith():
+    # the camera passes right over the gaze point, one frame looks straight down
+    camera_points = np.array([[-1.0, 0.0, 1.0], [-0.5, 0.2, 1.0], [0.0, 0.0, 1.0], [0.5, -0.2, 1.0], [1.0, 0.0, 1.0]])
+    interpolator = Gaze3DInterpolator(camera_points, np.zeros(3))
+    arc_lengths = np.linspace(0, interpolator.length(), 201)
+    arc_lengths[100] = interpolator.length() / 2
+    poses = interpolator.generate(arc_lengths)
+    rotations = poses[:, :3, :3]
+    assert np.allclose(np.matmul(np.swapaxes(rotations, 1, 2), rotations), np.eye(3))
+    assert np.allclose(poses[:, :3, 2], [interpolator.at(s)[:3, 2] for s in arc_lengths])
+
+    # neighbouring frames turn about as much as the view direction does, without a jump in roll
+    steps = np.linalg.norm(se3.rotation_log(np.matmul(np.swapaxes(rotations[:-1], 1, 2), rotations[1:])), axis=1)
+    view_steps = np.arccos(np.clip(np.sum(poses[1:, :3, 2] * poses[:-1, :3, 2], axis=1), -1, 1))
+    assert np.max(steps - view_steps) < 0.01
+
+    # frame by frame, x = z cross up snaps to the fallback above the gaze point and flips after it
+    upright = se3.look_at(poses[:, :3, 3], np.zeros(3))[:, :3, :3]
+    upright_steps = se3.rotation_log(np.matmul(np.swapaxes(upright[:-1], 1, 2), upright[1:]))
+    assert np.max(np.linalg.norm(upright_steps, axis=1)) > 1.5
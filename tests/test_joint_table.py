@@ -0,0 +1,38 @@
+from cinebot_mini.robot_abstraction.joint_table import JointTable, D2R, R2D
+from cinebot_mini.robot_abstraction.dynamixel_robot import DEVICES
+import numpy as np
+
+
+def reference_angle_to_encode(id, joint_angle):
+    if id < 3:
+        return int((R2D * joint_angle + 180) / 0.088)
+    return int((R2D * joint_angle + 150) / 0.29)
+
+
+def reference_encode_to_angle(id, encode):
+    if id < 3:
+        return (encode * 0.088 - 180) * D2R
+    return (encode * 0.29 - 150) * D2R
+
+
+def test_trajectory_to_encodes():
+    table = JointTable.from_devices(DEVICES)
+    trajectory = np.random.RandomState(0).uniform(-3.5, 3.5, (1000, 6))
+
+    encodes = table.trajectory_to_encodes(trajectory)
+    assert encodes.shape == (1000, 6)
+    for config, config_encodes in zip(trajectory, encodes):
+        for id in range(6):
+            lower, upper = DEVICES[id]["bounds"]
+            angle = min(max(config[id], lower), upper)
+            assert config_encodes[id] == reference_angle_to_encode(id, angle)
+
+
+def test_encode_to_angle():
+    table = JointTable.from_devices(DEVICES)
+    encodes = np.random.RandomState(0).randint(0, 1024, (100, 6))
+
+    angles = table.encode_to_angle(encodes)
+    for config_encodes, config in zip(encodes, angles):
+        for id in range(6):
+            assert abs(config[id] - reference_encode_to_angle(id, config_encodes[id])) < 1e-12
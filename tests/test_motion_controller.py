@@ -0,0 +1,95 @@
+from cinebot_mini.execution_routine.motion_controller import MotionController
+from cinebot_mini.robot_abstraction.simulated_cinebot import SimulatedCinebot
+import numpy as np
+import threading
+import time
+
+
+class RecordingCinebot(SimulatedCinebot):
+    """ SimulatedCinebot that also records every frame it sends """
+    def __init__(self, **kwargs):
+        super().__init__(latency=0.0, sync_write=True, **kwargs)
+        self.sent = []
+
+    def send_compiled_frame(self, frame):
+        self.sent.append(frame)
+        super().send_compiled_frame(frame)
+
+    def set_joint_angles(self, joint_angles):
+        self.sent.append(list(joint_angles))
+        super().set_joint_angles(joint_angles)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    return condition()
+
+
+def test_frames_in_order():
+    robot = RecordingCinebot()
+    controller = MotionController(robot)
+    config_trajectory = np.linspace(0, 0.5, 50)[:, None] * np.ones(6)
+    controller.start()
+    assert controller.push_trajectory(config_trajectory, fps=500)
+    assert wait_for(lambda: controller.sent_frames == 50)
+    controller.stop()
+
+    assert robot.sent == robot.compile_trajectory(config_trajectory)
+    assert np.array_equal(robot.servos.goal_encode, robot.joint_table.angle_to_encode(config_trajectory[-1]))
+    # the stream ended with its last frame
+    assert controller.underruns == 0
+
+
+def test_overruns():
+    controller = MotionController(RecordingCinebot(), capacity=10)
+    # a trajectory that does not fit is rejected as a whole
+    assert not controller.push_trajectory(np.zeros((11, 6)), fps=100)
+    assert controller.pending() == 0 and controller.overruns == 11
+    assert controller.push_trajectory(np.zeros((8, 6)), fps=100)
+    assert controller.push(np.zeros(6)) and controller.push(np.zeros(6))
+    assert not controller.push(np.zeros(6))
+    assert controller.pending() == 10 and controller.overruns == 12
+
+
+def test_concurrent_producers_respect_capacity():
+    controller = MotionController(RecordingCinebot(), capacity=100)
+
+    def produce():
+        for _ in range(1000):
+            controller.push(np.zeros(6))
+
+    producers = [threading.Thread(target=produce) for _ in range(4)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    assert controller.pending() == 100
+    assert controller.overruns == 4000 - 100
+
+
+def test_underruns():
+    robot = RecordingCinebot()
+    controller = MotionController(robot, rate_hz=1000.0)
+    controller.start()
+    controller.push(np.zeros(6))
+    assert wait_for(lambda: controller.underruns == 1)
+    controller.push(np.zeros(6), end_of_stream=True)
+    assert wait_for(lambda: controller.sent_frames == 2)
+    time.sleep(0.01)
+    controller.stop()
+    assert controller.underruns == 1
+
+
+def test_stop_while_waiting():
+    robot = RecordingCinebot()
+    controller = MotionController(robot)
+    controller.push(np.zeros(6), timestamp=time.perf_counter() + 60.0)
+    controller.start()
+    time.sleep(0.01)
+    start_time = time.perf_counter()
+    controller.stop(timeout=5.0)
+    assert not controller.is_alive()
+    assert time.perf_counter() - start_time < 0.1
+    assert controller.sent_frames == 0 and len(robot.sent) == 0
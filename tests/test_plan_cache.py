@@ -0,0 +1,125 @@
+from cinebot_mini.execution_routine.plan_cache import PlanCache, plan_key
+from cinebot_mini.execution_routine.planner import DirectPlanner, GazePlanner
+from cinebot_mini.geometry_utils.transformation_tree import TransformationTree
+from cinebot_mini import TRANSFORMS
+from ikpy.chain import Chain
+import numpy as np
+import os
+import time
+
+URDF_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "cinebot_mini", "robot_abstraction", "Cinebot.URDF")
+
+
+class RecordedRobot:
+    """ Stands in for the robot, replaying recorded joint angles """
+    def __init__(self, chain, joint_angles):
+        self.chain = chain
+        self.joint_angles = list(joint_angles)
+
+    def get_chain(self):
+        return self.chain
+
+    def get_joint_angles(self):
+        return self.joint_angles.pop(0)
+
+    def disable_torque(self):
+        pass
+
+
+def test_plan_key():
+    key = plan_key("plan", np.arange(6.0), 5.0, 30.0, None)
+    assert key == plan_key("plan", np.arange(6), 5, 30.0, None)
+    assert key != plan_key("plan", np.arange(6.0), 5.0, 60.0, None)
+    assert key != plan_key("plan", np.arange(6.0).reshape(2, 3), 5.0, 30.0, None)
+    assert key != plan_key("plan", np.arange(6.0), 5.0, 30.0, 0.01)
+
+    # lists of names are hashed item by item
+    assert plan_key(["camera", "robot"]) == plan_key(("camera", "robot"))
+    assert plan_key(["camera", "robot"]) != plan_key(["camera", "robo"])
+    assert plan_key(["camera", 1.0]) != plan_key(["camera", 2.0])
+
+
+def test_lru_eviction(tmpdir):
+    trajectory = np.zeros((100, 6))
+    entry_size = trajectory.nbytes + 128
+    cache = PlanCache(str(tmpdir), max_bytes=3 * entry_size)
+    for i in range(3):
+        cache.put(str(i), trajectory + i)
+        time.sleep(0.01)
+    assert np.array_equal(cache.get("0"), trajectory)
+    time.sleep(0.01)
+
+    # "1" is now the least recently used
+    cache.put("3", trajectory + 3)
+    assert cache.get("1") is None
+    for i in [0, 2, 3]:
+        assert np.array_equal(cache.get(str(i)), trajectory + i)
+    assert cache.size() <= cache.max_bytes
+
+
+def test_direct_planner_cache(tmpdir):
+    cache = PlanCache(str(tmpdir))
+    t = np.linspace(0, 1, 6)[:, None]
+    joint_angles = np.array([0.0, -0.6, -1.2, 2.0, 1.0, 0.5]) + np.hstack([np.sin(3 * t), t, t, -t, t, t])
+
+    def make_direct_planner():
+        planner = DirectPlanner(RecordedRobot(None, joint_angles), disk_cache=cache)
+        for _ in joint_angles:
+            planner.record()
+        return planner
+
+    planned = make_direct_planner().plan(duration=2.0, fps=30.0)
+    assert len(cache.entries()) == 1
+
+    # a fresh planner with the same recording loads the plan instead of fitting the spline
+    replanner = make_direct_planner()
+    replanner._interpolator = None
+    assert np.array_equal(replanner.plan(duration=2.0, fps=30.0), planned)
+
+    assert len(make_direct_planner().plan(duration=2.0, fps=60.0)) == 120
+    assert len(cache.entries()) == 2
+
+
+def make_tree(chain):
+    tf_tree = TransformationTree()
+    tf_tree.add_chain("ROOT", chain)
+    tf_tree.add_node(chain.links[-1].name, TRANSFORMS["robot_camera_name"], TRANSFORMS["robot_camera_to_robot"])
+    return tf_tree
+
+
+def make_planner(chain, tf_tree, **kwargs):
+    t = np.linspace(0, 1, 5)[:, None]
+    joint_angles = np.array([0.0, -0.6, -1.2, 2.0, 1.0, 0.5]) + 0.3 * t
+    planner = GazePlanner(RecordedRobot(chain, joint_angles), tf_tree, duration=1.0, fps=30.0, **kwargs)
+    for _ in joint_angles:
+        planner.record_camera_pose()
+    planner.add_gaze_point(np.array([0.0, 0.35, 0.06]))
+    return planner
+
+
+def test_gaze_planner_cache(tmpdir):
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    cache = PlanCache(str(tmpdir))
+
+    planned = make_planner(chain, tf_tree, disk_cache=cache).plan()
+    assert len(cache.entries()) == 1
+
+    # a fresh planner with the same shot loads the plan instead of solving it again
+    replanner = make_planner(chain, tf_tree, disk_cache=cache)
+    replanner._interpolate_camera = None
+    assert np.array_equal(np.array(replanner.plan()), np.array(planned))
+
+    changed = make_planner(chain, tf_tree, disk_cache=cache)
+    changed.fps = 60.0
+    assert len(changed.plan()) == 60
+    assert len(cache.entries()) == 2
+
+    # resampled and replanned plans depend on what was planned before, they are not stored
+    changed.fps = 90.0
+    assert len(changed.plan()) == 90
+    changed.camera_points[-1] = changed.camera_points[-1] + np.array([0.0, 0.01, 0.0])
+    changed.cache_dirty = True
+    changed.plan()
+    assert len(cache.entries()) == 2
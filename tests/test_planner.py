@@ -0,0 +1,205 @@
+from cinebot_mini.execution_routine.planner import GazePlanner
+from cinebot_mini.geometry_utils.transformation_tree import TransformationTree
+from cinebot_mini import TRANSFORMS
+from cinebot_mini.geometry_utils.closed_form_ik import chain_parameters
+from ikpy.chain import Chain
+from scipy.interpolate import CubicSpline
+import numpy as np
+import os
+
+URDF_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "cinebot_mini", "robot_abstraction", "Cinebot.URDF")
+
+
+class RecordedRobot:
+    """ Stands in for the robot, replaying recorded joint angles """
+    def __init__(self, chain, joint_angles):
+        self.chain = chain
+        self.joint_angles = list(joint_angles)
+
+    def get_chain(self):
+        return self.chain
+
+    def get_joint_angles(self):
+        return self.joint_angles.pop(0)
+
+    def disable_torque(self):
+        pass
+
+
+def make_tree(chain):
+    tf_tree = TransformationTree()
+    tf_tree.add_chain("ROOT", chain)
+    tf_tree.add_node(chain.links[-1].name, TRANSFORMS["robot_camera_name"], TRANSFORMS["robot_camera_to_robot"])
+    return tf_tree
+
+
+def make_planner(chain, tf_tree, **kwargs):
+    t = np.linspace(0, 1, 5)[:, None]
+    joint_angles = np.array([0.0, -0.6, -1.2, 2.0, 1.0, 0.5]) + 0.3 * t
+    planner = GazePlanner(RecordedRobot(chain, joint_angles), tf_tree, duration=1.0, fps=30.0, **kwargs)
+    for _ in joint_angles:
+        planner.record_camera_pose()
+    planner.add_gaze_point(np.array([0.0, 0.35, 0.06]))
+    return planner
+
+
+def test_gaze_planner_resample():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    planner = make_planner(chain, tf_tree)
+    planner.plan()
+    camera_interpolator = planner.camera_interpolator
+
+    solved_frames = []
+    solve_transforms = tf_tree.solve_transforms
+
+    def counting_solve_transforms(frame_name, transform_mats, *args, **kwargs):
+        solved_frames.append(len(transform_mats))
+        return solve_transforms(frame_name, transform_mats, *args, **kwargs)
+    tf_tree.solve_transforms = counting_solve_transforms
+
+    planner.fps = 120.0
+    resampled = np.array(planner.plan())
+    assert planner.camera_interpolator is camera_interpolator
+    assert len(resampled) == 120
+    assert sum(solved_frames) < 10
+
+    # same frames as solving from scratch, up to the tolerance
+    fresh = make_planner(chain, tf_tree)
+    fresh.fps = 120.0
+    expected = np.array(fresh.plan())
+    camera_poses = tf_tree.get_transforms_trajectory([planner.camera_name], {planner.chain_name: resampled})[:, 0]
+    expected_poses = tf_tree.get_transforms_trajectory([planner.camera_name], {planner.chain_name: expected})[:, 0]
+    assert np.max(np.abs(camera_poses - expected_poses)) < 2 * planner.resample_tolerance
+    assert np.max(np.abs(resampled - expected)) < 1e-3
+
+
+def test_gaze_planner_resample_checks_bridged_and_bounds():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    planner = make_planner(chain, tf_tree)
+    solve_transforms = tf_tree.solve_transforms
+    solved_frames = []
+
+    def solve_transforms_failing_once(frame_name, transform_mats, initial_state=None, processes=1):
+        states, valid = solve_transforms(frame_name, transform_mats, initial_state, processes)
+        if len(solved_frames) == 0:
+            valid[10:15] = False
+        solved_frames.append(len(transform_mats))
+        return states, valid
+    tf_tree.solve_transforms = solve_transforms_failing_once
+    assert len(planner.plan()) == 25
+
+    # the joint path spline bridges the failed frames, resampled frames there are solved again
+    grid = planner.joint_path_grid
+    planner.fps = 120.0
+    arc_lengths = planner._arc_lengths()
+    bridged = np.sum((arc_lengths > grid[9]) & (arc_lengths < grid[15]))
+    assert len(planner.plan()) == 120
+    assert sum(solved_frames[1:]) >= bridged > 0
+
+    # a joint path a full turn off has the same camera poses, but is out of the joint bounds
+    x = planner.joint_path.x
+    planner.joint_path = CubicSpline(x, planner.joint_path(x) + np.array([2 * np.pi, 0, 0, 0, 0, 0]), axis=0)
+    states, valid = planner._resample_joint_path(arc_lengths, planner._camera_interpolator().generate(arc_lengths))
+    bounds = chain_parameters(chain).bounds_array
+    assert np.all(valid)
+    assert np.all((states >= bounds[:, 0]) & (states <= bounds[:, 1]))
+
+
+def test_gaze_planner_replan():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    planner = make_planner(chain, tf_tree)
+    planner.fps = 120.0
+    planner.duration = 2.0
+    planner.plan()
+
+    sequential_frames = []
+    solve_transforms = tf_tree.solve_transforms
+
+    def counting_solve_transforms(frame_name, transform_mats, initial_state=None, processes=1):
+        if np.ndim(initial_state) != 2:
+            sequential_frames.append(len(transform_mats))
+        return solve_transforms(frame_name, transform_mats, initial_state, processes)
+    tf_tree.solve_transforms = counting_solve_transforms
+
+    # nudge the last waypoint
+    planner.camera_points[-1] = planner.camera_points[-1] + np.array([0.0, 0.01, 0.0])
+    planner.cache_dirty = True
+    replanned = np.array(planner.plan())
+    assert len(replanned) == 240
+    assert 0 < sum(sequential_frames) < 120
+
+    fresh = make_planner(chain, tf_tree)
+    fresh.camera_points = planner.camera_points
+    fresh.fps = 120.0
+    fresh.duration = 2.0
+    camera_poses = fresh._interpolate_camera()
+    poses = tf_tree.get_transforms_trajectory([planner.camera_name], {planner.chain_name: replanned})[:, 0]
+    assert np.max(np.abs(poses - camera_poses)) < 2 * planner.resample_tolerance
+    assert np.max(np.abs(np.diff(replanned, axis=0))) < 0.05
+    assert np.max(np.abs(replanned - np.array(fresh.plan()))) < 1e-3
+
+
+def test_gaze_planner_replan_blends_into_reused_path():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    planner = make_planner(chain, tf_tree)
+    planner.fps = 120.0
+    planner.duration = 2.0
+    planner.plan()
+
+    sequential_frames = []
+    solve_transforms = tf_tree.solve_transforms
+
+    def counting_solve_transforms(frame_name, transform_mats, initial_state=None, processes=1):
+        if np.ndim(initial_state) != 2:
+            sequential_frames.append(len(transform_mats))
+        return solve_transforms(frame_name, transform_mats, initial_state, processes)
+    tf_tree.solve_transforms = counting_solve_transforms
+
+    # nudge a waypoint in the middle, one local solve is blended in on both sides
+    planner.camera_points[2] = planner.camera_points[2] + np.array([0.0, 0.005, 0.0])
+    planner.cache_dirty = True
+    replanned = np.array(planner.plan())
+    assert len(sequential_frames) == 1 and sequential_frames[0] < 120
+
+    camera_poses = planner._interpolate_camera()
+    poses = tf_tree.get_transforms_trajectory([planner.camera_name], {planner.chain_name: replanned})[:, 0]
+    assert np.max(np.abs(poses - camera_poses)) < 2 * planner.resample_tolerance
+    assert np.max(np.abs(np.diff(replanned, n=2, axis=0))) < 1e-3
+
+
+def test_gaze_planner_replan_falls_back_on_branch_change():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    planner = make_planner(chain, tf_tree)
+    planner.fps = 120.0
+    planner.duration = 2.0
+    planner.plan()
+
+    sequential_frames = []
+    solve_transforms = tf_tree.solve_transforms
+
+    def solve_transforms_on_other_branch(frame_name, transform_mats, initial_state=None, processes=1):
+        states, valid = solve_transforms(frame_name, transform_mats, initial_state, processes)
+        if np.ndim(initial_state) != 2:
+            # the first local solve lands a full turn off on the first joint, blending with it moves the camera
+            if len(sequential_frames) == 0:
+                states = states + np.array([2 * np.pi, 0, 0, 0, 0, 0])
+            sequential_frames.append(len(transform_mats))
+        return states, valid
+    tf_tree.solve_transforms = solve_transforms_on_other_branch
+
+    planner.camera_points[2] = planner.camera_points[2] + np.array([0.0, 0.005, 0.0])
+    planner.cache_dirty = True
+    replanned = np.array(planner.plan())
+
+    # the solve is repeated from the same frame to the end of the shot
+    assert len(sequential_frames) == 2 and sequential_frames[1] > sequential_frames[0]
+    camera_poses = planner._interpolate_camera()
+    poses = tf_tree.get_transforms_trajectory([planner.camera_name], {planner.chain_name: replanned})[:, 0]
+    assert np.max(np.abs(poses - camera_poses)) < 2 * planner.resample_tolerance
+    assert np.max(np.abs(np.diff(replanned, axis=0))) < 0.05
@@ -0,0 +1,92 @@
+from cinebot_mini.execution_routine import playback
+from cinebot_mini.execution_routine.playback import TrajectoryPlayer
+from cinebot_mini.execution_routine.slomo_execution import SlomoModeExecution
+from cinebot_mini.robot_abstraction.simulated_cinebot import SimulatedCinebot
+import numpy as np
+import pytest
+
+FPS = 100.0
+PERIOD = 1.0 / FPS
+
+
+class FakeClock:
+    """ Stands in for the time module of playback, every reading advances it by a microsecond """
+    def __init__(self):
+        self.now = 1000.0
+
+    def perf_counter(self):
+        self.now += 1e-6
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ClockedRobot(SimulatedCinebot):
+    """ SimulatedCinebot whose frames take send_times[i] periods of the fake clock """
+    def __init__(self, clock, send_times):
+        super().__init__(latency=0.0, sync_write=True)
+        self.clock = clock
+        self.send_times = list(send_times)
+        self.sent = []
+
+    def send_compiled_frame(self, frame):
+        self.sent.append(frame)
+        self.clock.now += self.send_times[len(self.sent) - 1] * PERIOD
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(playback, "time", clock)
+    return clock
+
+
+def play(clock, send_times):
+    robot = ClockedRobot(clock, send_times)
+    player = TrajectoryPlayer(robot, np.zeros((len(send_times), 6)), FPS)
+    stats = player.play(verbose=False)
+    return robot, player, stats
+
+
+def test_absolute_deadlines(clock):
+    robot, player, stats = play(clock, [0.3] * 20)
+    assert robot.sent == player.frames
+    assert stats["num_frames"] == 20
+    assert stats["total_time"] == pytest.approx(stats["expected_time"], abs=1e-4)
+    assert stats["max_lateness"] < 1e-4 and stats["num_late_frames"] == 0
+    assert stats["max_jitter"] < 1e-4
+    assert stats["mean_send_time"] == pytest.approx(0.3 * PERIOD, abs=1e-5)
+
+
+def test_late_frames_are_sent_not_skipped(clock):
+    # frame 3 takes 2.5 periods: frames 4 to 6 go out late, one after the other
+    send_times = [0.3] * 20
+    send_times[3] = 2.5
+    robot, player, stats = play(clock, send_times)
+    assert robot.sent == player.frames
+
+    # frame 4 is due at 4 periods and sent at 5.5, frame 5 at 5.8, frame 6 at 6.1
+    assert stats["max_lateness"] == pytest.approx(1.5 * PERIOD, abs=1e-4)
+    assert stats["mean_lateness"] == pytest.approx((1.5 + 0.8 + 0.1) * PERIOD / 20, abs=1e-4)
+    assert stats["num_late_frames"] == 1
+    assert stats["max_jitter"] == pytest.approx(1.5 * PERIOD, abs=1e-4)
+    assert stats["max_send_time"] == pytest.approx(2.5 * PERIOD, abs=1e-5)
+    # later frames are back on the original deadlines, the delay does not accumulate
+    assert stats["total_time"] == pytest.approx(stats["expected_time"], abs=1e-4)
+
+
+def test_stats_of_single_frame(clock):
+    robot, player, stats = play(clock, [0.3])
+    assert stats["num_frames"] == 1 and stats["max_jitter"] == 0.0
+    assert stats["total_time"] == pytest.approx(PERIOD, abs=1e-4)
+
+
+def test_execute_compiled(clock):
+    robot = ClockedRobot(clock, [0.3] * 10)
+    execution = SlomoModeExecution(robot, np.zeros((10, 6)), fps=FPS)
+    execution.compile()
+    stats = execution.execute_compiled()
+    assert robot.sent == execution.player.frames
+    assert stats is execution.player.stats and stats["num_frames"] == 10
+    assert stats["total_time"] == pytest.approx(10 * PERIOD, abs=1e-4)
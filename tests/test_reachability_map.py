@@ -0,0 +1,91 @@
+from cinebot_mini.geometry_utils.reachability_map import ReachabilityMap
+from cinebot_mini.geometry_utils.closed_form_ik import inverse_kinematics_closed_form_batch
+from cinebot_mini.geometry_utils.transformation_tree import TransformationTree
+from cinebot_mini.geometry_utils import se3
+from cinebot_mini.execution_routine.planner import GazePlanner
+from cinebot_mini import TRANSFORMS
+from ikpy.chain import Chain
+import numpy as np
+import os
+
+URDF_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "cinebot_mini", "robot_abstraction", "Cinebot.URDF")
+
+
+class RecordedRobot:
+    """ Stands in for the robot, replaying recorded joint angles """
+    def __init__(self, chain, joint_angles):
+        self.chain = chain
+        self.joint_angles = list(joint_angles)
+
+    def get_chain(self):
+        return self.chain
+
+    def get_joint_angles(self):
+        return self.joint_angles.pop(0)
+
+    def disable_torque(self):
+        pass
+
+
+def make_tree(chain):
+    tf_tree = TransformationTree()
+    tf_tree.add_chain("ROOT", chain)
+    tf_tree.add_node(chain.links[-1].name, TRANSFORMS["robot_camera_name"], TRANSFORMS["robot_camera_to_robot"])
+    return tf_tree
+
+
+def make_planner(chain, tf_tree, **kwargs):
+    t = np.linspace(0, 1, 5)[:, None]
+    joint_angles = np.array([0.0, -0.6, -1.2, 2.0, 1.0, 0.5]) + 0.3 * t
+    planner = GazePlanner(RecordedRobot(chain, joint_angles), tf_tree, duration=1.0, fps=30.0, **kwargs)
+    for _ in joint_angles:
+        planner.record_camera_pose()
+    planner.add_gaze_point(np.array([0.0, 0.35, 0.06]))
+    return planner
+
+
+def test_reachability_map(tmpdir):
+    chain = Chain.from_urdf_file(URDF_FILE)
+    camera_offset = TRANSFORMS["robot_camera_to_robot"]
+    reachability_map = ReachabilityMap.build(chain, camera_offset, voxel_size=0.05, num_directions=16)
+    assert 0 < np.count_nonzero(reachability_map.values) < reachability_map.values.size
+
+    # the map agrees with IK at voxel centers
+    rng = np.random.RandomState(0)
+    index = rng.randint(0, reachability_map.shape, (500, 3))
+    positions = reachability_map.origin + index * reachability_map.voxel_size
+    directions = reachability_map.directions[rng.randint(0, 16, 500)]
+    camera_poses = se3.look_at(positions, positions + directions)
+    configs, valid = inverse_kinematics_closed_form_batch(chain, se3.compose(camera_poses, se3.inverse(camera_offset)))
+    assert np.array_equal(reachability_map.reachable(positions, directions), valid)
+    assert np.array_equal(reachability_map.lookup_poses(camera_poses) > 0, valid)
+    assert np.all(reachability_map.manipulability(positions, directions)[~valid] == 0)
+    assert not reachability_map.reachable([5.0, 0.0, 0.0], [1.0, 0.0, 0.0])
+
+    path = str(tmpdir.join("cinebot"))
+    reachability_map.save(path)
+    loaded = ReachabilityMap.load(path)
+    assert isinstance(loaded.values, np.memmap)
+    assert np.array_equal(loaded.lookup(positions, directions), reachability_map.lookup(positions, directions))
+
+
+def test_gaze_planner_feasibility(capsys):
+    chain = Chain.from_urdf_file(URDF_FILE)
+    tf_tree = make_tree(chain)
+    reachability_map = ReachabilityMap.build(chain, TRANSFORMS["robot_camera_to_robot"], voxel_size=0.05, num_directions=16)
+    planner = make_planner(chain, tf_tree, reachability_map=reachability_map)
+    assert np.all(planner.check_feasibility())
+
+    # pull a waypoint out of the workspace
+    planner.camera_points[2] = planner.camera_points[2] + np.array([0.3, 0.0, 0.2])
+    planner.cache_dirty = True
+    feasible = planner.check_feasibility()
+    states, valid = tf_tree.solve_transforms(
+        planner.camera_name, planner._interpolate_camera(), planner.configuration_history[0])
+    assert 0 < np.sum(feasible) < len(feasible)
+    assert np.mean(feasible == valid) > 0.9
+
+    capsys.readouterr()
+    planner.plan()
+    assert "frames are not reachable" in capsys.readouterr().out
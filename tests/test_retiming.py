@@ -0,0 +1,71 @@
+from cinebot_mini.execution_routine.retiming import retime
+from cinebot_mini.robot_abstraction.joint_table import JointTable
+from cinebot_mini.robot_abstraction.dynamixel_robot import DEVICES
+import numpy as np
+
+
+def sample_path(num_points=50):
+    t = np.linspace(0, 1, num_points)[:, None]
+    return np.hstack([1.5 * np.sin(3 * t), 2 * t, np.cos(2 * t), t, -t, 3 * t])
+
+
+def utilization(config_trajectory, fps, table):
+    velocity = np.diff(config_trajectory, axis=0) * fps
+    acceleration = np.diff(config_trajectory, 2, axis=0) * fps**2
+    return np.max(np.abs(velocity) / table.velocity_limits), np.max(np.abs(acceleration) / table.acceleration_limits)
+
+
+def test_time_optimal():
+    table = JointTable.from_devices(DEVICES)
+    path = sample_path()
+    fps = 120
+    trajectory, duration = retime(path, table.velocity_limits, table.acceleration_limits, fps)
+
+    # whole frames, so the last frame is on the fps grid
+    assert len(trajectory) == round(duration * fps) + 1
+    assert np.isclose(duration * fps, round(duration * fps))
+    assert np.allclose(trajectory[0], path[0]) and np.allclose(trajectory[-1], path[-1])
+    velocity, acceleration = utilization(trajectory, fps, table)
+    # within the limits at the frames, and saturating at least one of them
+    assert velocity <= 1 and acceleration <= 1
+    assert max(velocity, acceleration) > 0.95
+
+    # a longer duration slows the schedule down uniformly
+    slow, slow_duration = retime(path, table.velocity_limits, table.acceleration_limits, fps, duration=2 * duration)
+    assert slow_duration == 2 * duration
+    assert np.allclose(slow[-1], path[-1])
+
+
+def test_eased():
+    table = JointTable.from_devices(DEVICES)
+    path = sample_path()
+    fps = 120
+    optimal, optimal_duration = retime(path, table.velocity_limits, table.acceleration_limits, fps)
+    eased, duration = retime(path, table.velocity_limits, table.acceleration_limits, fps, eased=True)
+
+    assert duration > optimal_duration
+    velocity, acceleration = utilization(eased, fps, table)
+    assert velocity <= 1 and acceleration <= 1
+    # starts and ends at rest
+    assert np.max(np.abs(eased[1] - eased[0])) < 1e-4
+    assert np.max(np.abs(eased[-1] - eased[-2])) < 1e-4
+
+    stretched, stretched_duration = retime(
+        path, table.velocity_limits, table.acceleration_limits, fps, duration=10.0, eased=True)
+    assert stretched_duration == 10.0 and len(stretched) == 1201
+
+
+def test_random_paths():
+    # waypoints joined by sharp turns, where the joint accelerations bound the path velocity
+    table = JointTable.from_devices(DEVICES)
+    random = np.random.RandomState(0)
+    fps = 120
+    for _ in range(10):
+        path = random.uniform(0.8 * table.lower, 0.8 * table.upper, (8, len(DEVICES)))
+        for eased in [False, True]:
+            trajectory, duration = retime(path, table.velocity_limits, table.acceleration_limits, fps, eased=eased)
+            assert len(trajectory) == round(duration * fps) + 1
+            assert np.allclose(trajectory[-1], path[-1])
+            velocity, acceleration = utilization(trajectory, fps, table)
+            assert velocity <= 1 and acceleration <= 1
+            assert max(velocity, acceleration) > 0.9
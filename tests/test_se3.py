@@ -0,0 +1,80 @@
+from cinebot_mini.geometry_utils import se3
+import numpy as np
+
+
+def random_transforms(num, seed=0, max_angle=np.pi):
+    rng = np.random.RandomState(seed)
+    axes = rng.normal(size=(num, 3))
+    axes /= np.linalg.norm(axes, axis=1, keepdims=True)
+    angles = rng.uniform(0, max_angle, num)
+    xi = np.concatenate([rng.uniform(-1, 1, (num, 3)), axes * angles[:, None]], axis=1)
+    return se3.exp(xi), xi
+
+
+def test_inverse_compose():
+    H, xi = random_transforms(100)
+    assert np.allclose(se3.inverse(H), np.linalg.inv(H))
+    assert np.allclose(se3.compose(H, se3.inverse(H)), np.eye(4))
+    points = np.random.RandomState(1).normal(size=(100, 3))
+    assert np.allclose(se3.transform_points(se3.inverse(H), se3.transform_points(H, points)), points)
+
+
+def test_exp_log():
+    H, xi = random_transforms(200)
+    assert np.allclose(se3.log(H), xi)
+    rotation = H[:, :3, :3]
+    assert np.allclose(np.matmul(rotation, np.swapaxes(rotation, 1, 2)), np.eye(3))
+
+    # small angles and angles close to pi
+    for angle in [0.0, 1e-8, 1e-5, np.pi - 1e-5, np.pi]:
+        xi = np.array([0.1, -0.2, 0.3, 0.0, angle, 0.0])
+        assert np.allclose(se3.exp(se3.log(se3.exp(xi))), se3.exp(xi))
+        if angle < np.pi:
+            assert np.allclose(se3.log(se3.exp(xi)), xi)
+
+
+def test_quaternion():
+    H, xi = random_transforms(200, seed=2)
+    q = se3.matrix_to_quaternion(H)
+    assert q.shape == (200, 4)
+    assert np.allclose(se3.quaternion_to_matrix(q), H[:, :3, :3])
+
+    rotation_z = se3.exp([0, 0, 0, 0, 0, np.pi / 2])
+    assert np.allclose(se3.matrix_to_quaternion(rotation_z), [0, 0, np.sqrt(0.5), np.sqrt(0.5)])
+
+
+def test_look_at():
+    eye = np.array([[1.0, 0.0, 0.5], [0.0, 2.0, 1.0]])
+    target = np.array([0.0, 0.0, 0.0])
+    H = se3.look_at(eye, target)
+    for frame, position in zip(H, eye):
+        assert np.allclose(frame[:3, :3].T @ frame[:3, :3], np.eye(3))
+        assert np.allclose(frame[:3, 2], (target - position) / np.linalg.norm(target - position))
+        assert abs(frame[2, 0]) < 1e-12  # x axis stays horizontal
+        assert np.allclose(frame[:3, 3], position)
+
+    # looking straight down or up, x = z cross up vanishes
+    H = se3.look_at([[0.0, 0.0, 1.0], [0.0, 0.0, -1.0], [1.0, 0.0, 0.5]], target)
+    assert np.all(np.isfinite(H))
+    assert np.allclose(np.matmul(np.swapaxes(H[:, :3, :3], 1, 2), H[:, :3, :3]), np.eye(3))
+    assert np.allclose(H[0, :3, 2], [0, 0, -1])
+    assert np.allclose(H[1, :3, 2], [0, 0, 1])
+    assert np.allclose(H[2], se3.look_at([1.0, 0.0, 0.5], target))
+
+
+def test_look_at_path():
+    # an overhead stretch: frames 40 to 60 look straight down, the others lean towards +x
+    t = np.linspace(-1, 1, 101)
+    eye = np.stack([t, np.zeros_like(t), np.ones_like(t)], axis=1)
+    target = eye * [1, 1, 0] + [1, 0, 0] * np.maximum(np.abs(t) - 0.2, 0)[:, None]
+    H = se3.look_at_path(eye, target)
+    assert np.allclose(H[:, :3, 2], se3.look_at(eye, target)[:, :3, 2])
+    assert np.allclose(np.matmul(np.swapaxes(H[:, :3, :3], 1, 2), H[:, :3, :3]), np.eye(3))
+    assert np.allclose(H[:40], se3.look_at(eye[:40], target[:40]))
+
+    # the x axis is carried across the overhead frames instead of snapping to z cross fallback_up
+    assert np.allclose(H[40:61, :3, 0], H[39, :3, 0])
+    steps = np.linalg.norm(se3.rotation_log(np.matmul(np.swapaxes(H[:-1, :3, :3], 1, 2), H[1:, :3, :3])), axis=1)
+    assert np.max(steps) < 0.2
+    fallback = se3.look_at(eye, target)
+    assert np.allclose(np.abs(np.dot(fallback[50, :3, 0], H[50, :3, 0])), 0)
@@ -0,0 +1,65 @@
+from cinebot_mini.robot_abstraction.simulated_cinebot import SimulatedCinebot
+from cinebot_mini.robot_abstraction.dynamixel_robot import DynamixelRobot
+from cinebot_mini.execution_routine.playback import TrajectoryPlayer
+import numpy as np
+import pytest
+import time
+
+
+def test_servo_response():
+    robot = SimulatedCinebot(latency=0.0, time_constant=0.01)
+    robot.initialize()
+    target = [0.5, -0.3, 0.2, 1.0, -0.5, 0.3]
+    robot.set_joint_angles(target)
+    time.sleep(0.1)
+
+    angles = robot.get_joint_angles()
+    # within one encoder tick of 0.088 (MX28) or 0.29 (AX12/XL320) degrees
+    resolution = np.radians([0.088, 0.088, 0.088, 0.29, 0.29, 0.29])
+    assert np.all(np.abs(np.array(angles) - target) < 2 * resolution)
+
+
+def test_torque_disabled_holds_position():
+    robot = SimulatedCinebot(latency=0.0, time_constant=0.01)
+    robot.set_joint_angles([0.5] * 6)
+    time.sleep(0.05)
+    assert np.allclose(robot.get_joint_angles(), 0.0, atol=0.01)
+
+
+def test_sync_write_transactions():
+    trajectory = np.linspace(0, 0.5, 60)[:, None] * np.ones(6)
+    per_joint = SimulatedCinebot(latency=0.0)
+    sync = SimulatedCinebot(latency=0.0, sync_write=True, sync_read=True)
+
+    for robot in [per_joint, sync]:
+        robot.initialize()
+        robot.reset_bus_stats()
+        TrajectoryPlayer(robot, trajectory, 600).play(verbose=False)
+
+    assert per_joint.bus_stats()["transactions"] == 6 * len(trajectory)
+    assert sync.bus_stats()["transactions"] == 2 * len(trajectory)
+    assert sync.bus_stats()["bus_time"] < per_joint.bus_stats()["bus_time"] / 2
+
+    timestamp, states = sync.get_joint_states(velocity=True, load=True)
+    assert states.shape == (3, 6)
+
+
+def test_transport_hooks_are_abstract():
+    # subclasses provide the single servo access of their transport
+    with pytest.raises(TypeError):
+        DynamixelRobot(None)
+
+
+def test_iter_joint_states():
+    robot = SimulatedCinebot(latency=0.0, sync_read=True)
+    robot.initialize()
+    samples = []
+    for timestamp, states in robot.iter_joint_states(200.0, velocity=True, load=True):
+        samples.append((timestamp, states))
+        if len(samples) == 5:
+            break
+    timestamps = np.array([timestamp for timestamp, states in samples])
+    assert np.all(np.diff(timestamps) > 0)
+    # samples are scheduled a period apart
+    assert np.mean(np.diff(timestamps)) > 0.5 / 200.0
+    assert all(states.shape == (3, 6) for timestamp, states in samples)
@@ -0,0 +1,77 @@
+from cinebot_mini.geometry_utils import ArcNDInterpolator, StreamingArcInterpolator
+from cinebot_mini.execution_routine.planner import sync_live_path
+from scipy.spatial import cKDTree
+import numpy as np
+
+
+def random_path(num_points=100, dims=3, seed=0):
+    return np.cumsum(np.random.RandomState(seed).normal(size=(num_points, dims)), axis=0)
+
+
+def test_interpolates_points_by_arc_length():
+    path = random_path()
+    interpolator = StreamingArcInterpolator(path, capacity=4)
+    assert interpolator.num_points == len(path)
+    assert np.allclose(interpolator.generate(interpolator.segment_starts[:len(path)]), path)
+
+    # on a smooth path, dense samples equally spaced in arc length have (nearly) equal chords
+    t = np.arange(60) * 0.3
+    interpolator = StreamingArcInterpolator(np.stack([np.cos(t), np.sin(t), 0.1 * t], axis=1))
+    samples = interpolator.generate(np.linspace(0, interpolator.length(), 20000))
+    chords = np.linalg.norm(np.diff(samples, axis=0), axis=1)
+    assert np.allclose(chords, interpolator.length() / 19999, rtol=1e-3)
+    assert abs(np.sum(chords) - interpolator.length()) < 1e-4 * interpolator.length()
+
+
+def test_append_is_local():
+    path = random_path(50, seed=1)
+    interpolator = StreamingArcInterpolator(path[:40])
+    tables = interpolator.segment_tables[:39].copy()
+    starts = interpolator.segment_starts[:39].copy()
+
+    for point in path[40:]:
+        interpolator.append(point)
+    # only the segment that was last gets refit
+    assert np.array_equal(interpolator.segment_tables[:38], tables[:38])
+    assert np.array_equal(interpolator.segment_starts[:39], starts)
+
+    rebuilt = StreamingArcInterpolator(path)
+    arc_lengths = np.linspace(0, rebuilt.length(), 500)
+    assert np.allclose(interpolator.generate(arc_lengths), rebuilt.generate(arc_lengths))
+
+
+def test_truncate():
+    path = random_path(30, seed=2)
+    interpolator = StreamingArcInterpolator(path)
+    interpolator.truncate(20)
+    rebuilt = StreamingArcInterpolator(path[:20])
+    assert interpolator.num_points == 20 and np.isclose(interpolator.length(), rebuilt.length())
+    arc_lengths = np.linspace(0, rebuilt.length(), 300)
+    assert np.allclose(interpolator.generate(arc_lengths), rebuilt.generate(arc_lengths))
+
+
+def test_sync_live_path_edits():
+    path = random_path(30, seed=3)
+    live_path = sync_live_path(None, list(path[:25]))
+    for edited in [path.copy(), path[:10].copy()]:
+        # move a point in the middle and the last point in place
+        edited[len(edited) // 2] += 0.5
+        edited[-1] -= 0.5
+        live_path = sync_live_path(live_path, list(edited))
+        rebuilt = StreamingArcInterpolator(edited)
+        arc_lengths = np.linspace(0, rebuilt.length(), 300)
+        assert np.allclose(live_path.generate(arc_lengths), rebuilt.generate(arc_lengths))
+
+
+def test_preview_close_to_planned_path():
+    # a densely recorded smooth path, the preview deviates by a few percent of the point spacing
+    t = np.arange(30) * 0.3
+    path = np.stack([np.cos(t), np.sin(t), 0.1 * t], axis=1)
+    preview = StreamingArcInterpolator(path)
+    planned = ArcNDInterpolator(path, num_cache=20, input_smoothing=0.0)
+    preview_samples = preview.generate(np.linspace(0, preview.length(), 20000))
+    planned_samples = planned.generate(np.linspace(0, planned.length(), 20000))
+    distance = max(np.max(cKDTree(planned_samples).query(preview_samples)[0]),
+                   np.max(cKDTree(preview_samples).query(planned_samples)[0]))
+    spacing = np.max(np.linalg.norm(np.diff(path, axis=0), axis=1))
+    assert distance < 0.05 * spacing
@@ -0,0 +1,48 @@
+from cinebot_mini.robot_abstraction.dynamixel_sync import (
+    LoopbackTransport,
+    SyncBus,
+    status_packet_v1,
+    status_packet_v2,
+    to_bytes,
+    speed_to_velocity)
+from cinebot_mini.robot_abstraction.dynamixel_robot import DEVICES
+import numpy as np
+
+
+def fake_servos(packet):
+    """ Answer sync reads with position = 100 * id + 1, speed = id, load = 1024 + id """
+    values = lambda ident: to_bytes(100 * ident + 1, 2) + to_bytes(ident, 2) + to_bytes(1024 + ident, 2)
+    if packet[2] == 0xFD and packet[4] == 0x84:
+        address, size, ids = packet[5], packet[6], packet[7:-1]
+        data = []
+        for ident in ids:
+            data += values(ident)[address - 36: address - 36 + size]
+        return status_packet_v1(0xFD, 0, data)
+    if packet[:4] == [0xFF, 0xFF, 0xFD, 0x00] and packet[7] == 0x82:
+        address, size, ids = packet[8], packet[10], packet[12:-2]
+        response = []
+        for ident in ids:
+            response += status_packet_v2(ident, 0, values(ident)[address - 37: address - 37 + size])
+        return response
+    return []
+
+
+def test_sync_read():
+    transport = LoopbackTransport(responder=fake_servos)
+    bus = SyncBus(transport, DEVICES)
+
+    raw = bus.read(("present_position", "present_speed", "present_load"))
+    assert transport.transactions == 2
+    assert raw[0].tolist() == [1, 101, 201, 301, 401, 501]
+    assert raw[1].tolist() == [0, 1, 2, 3, 4, 5]
+    assert raw[2].tolist() == [1024, 1025, 1026, 1027, 1028, 1029]
+
+    raw = bus.read()
+    assert raw.shape == (1, 6)
+    assert raw[0].tolist() == [1, 101, 201, 301, 401, 501]
+
+
+def test_speed_to_velocity():
+    models = ["MX28", "XL320"]
+    velocity = speed_to_velocity([[10, 1024 + 10]], models)
+    assert np.allclose(velocity, [[10 * 0.114 * np.pi / 30, -10 * 0.111 * np.pi / 30]])
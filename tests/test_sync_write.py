@@ -0,0 +1,51 @@
+from cinebot_mini.robot_abstraction.dynamixel_sync import (
+    LoopbackTransport,
+    SyncBus,
+    compute_crc16,
+    packet_v1,
+    sync_write_packet_v1)
+from cinebot_mini.robot_abstraction.dynamixel_robot import DEVICES
+
+
+def test_packet_v1():
+    # READ_DATA example from the Robotis protocol 1.0 manual
+    assert packet_v1(0x01, 0x02, [0x2B, 0x01]) == [0xFF, 0xFF, 0x01, 0x04, 0x02, 0x2B, 0x01, 0xCC]
+
+
+def test_sync_write_packet_v1():
+    # SYNC_WRITE example from the Robotis protocol 1.0 manual, 4 servos with 2 words each
+    values = {
+        0: 0x0010 | 0x0150 << 16,
+        1: 0x0220 | 0x0360 << 16,
+        2: 0x0030 | 0x0170 << 16,
+        3: 0x0220 | 0x0380 << 16
+    }
+    packet = sync_write_packet_v1(0x1E, 4, values)
+    assert packet == [0xFF, 0xFF, 0xFE, 0x18, 0x83, 0x1E, 0x04,
+                      0x00, 0x10, 0x00, 0x50, 0x01,
+                      0x01, 0x20, 0x02, 0x60, 0x03,
+                      0x02, 0x30, 0x00, 0x70, 0x01,
+                      0x03, 0x20, 0x02, 0x80, 0x03, 0x12]
+
+
+def test_crc16():
+    # PING example from the Robotis protocol 2.0 manual
+    assert compute_crc16([0xFF, 0xFF, 0xFD, 0x00, 0x01, 0x03, 0x00, 0x01]) == 0x4E19
+
+
+def test_transactions_per_frame():
+    transport = LoopbackTransport()
+    bus = SyncBus(transport, DEVICES)
+
+    num_frames = 120
+    for i in range(num_frames):
+        bus.write_goal_positions([2048, 2048, 2048, 512, 512, 512])
+
+    # one protocol 1.0 packet for MX28/AX12 and one protocol 2.0 packet for XL320
+    assert transport.transactions / num_frames == 2
+    assert transport.bytes_sent / num_frames == 23 + 17
+
+    p1, p2 = transport.packets[:2]
+    assert p1[2] == 0xFE and p1[4] == 0x83
+    assert p1[7::3][:5] == [0, 1, 2, 3, 4]
+    assert p2[:5] == [0xFF, 0xFF, 0xFD, 0x00, 0xFE] and p2[7] == 0x83
@@ -0,0 +1,122 @@
+from cinebot_mini.execution_routine.retiming import retime
+from cinebot_mini.execution_routine.trajectory_validation import validate_trajectory, check_trajectory
+from cinebot_mini.execution_routine.slomo_execution import SlomoModeExecution
+from cinebot_mini.execution_routine.planner import DirectPlanner
+from cinebot_mini.robot_abstraction.dynamixel_robot import DEVICES
+from cinebot_mini.robot_abstraction.joint_table import JointTable
+from cinebot_mini.robot_abstraction.robot import Robot
+import numpy as np
+import pytest
+import time
+
+
+class TableRobot(Robot):
+    def __init__(self, joint_table, recorded_angles=()):
+        self.joint_table = joint_table
+        self.recorded_angles = list(recorded_angles)
+        self.commands = []
+
+    def get_joint_table(self):
+        return self.joint_table
+
+    def set_joint_angles(self, angles):
+        self.commands.append(angles)
+
+    def get_joint_angles(self):
+        return self.recorded_angles.pop(0)
+
+
+def retimed_trajectory(table, fps=120):
+    t = np.linspace(0, 1, 50)[:, None]
+    path = np.hstack([1.5 * np.sin(3 * t), 2 * t, np.cos(2 * t), t, -t, 2.5 * t])
+    trajectory, duration = retime(path, table.velocity_limits, table.acceleration_limits, fps)
+    return trajectory
+
+
+def test_retimed_trajectory_is_valid():
+    table = JointTable.from_devices(DEVICES)
+    trajectory = retimed_trajectory(table)
+    report = validate_trajectory(trajectory, 120, table)
+
+    assert report["valid"]
+    for name in ["position", "velocity", "acceleration"]:
+        assert report[name + "_utilization"].shape == (6,)
+    assert np.all(report["position_utilization"] <= 1)
+    assert max(np.max(report["velocity_utilization"]), np.max(report["acceleration_utilization"])) > 0.95
+
+    # the same frames played twice as fast are not
+    report = validate_trajectory(trajectory, 240, table)
+    assert not report["valid"] and len(report["velocity_frames"]) > 0
+
+
+def test_violating_frames():
+    table = JointTable.from_devices(DEVICES)
+    fps = 100
+    trajectory = np.zeros((50, 6))
+    trajectory[30:, 2] = 1.9
+    trajectory[40, 4] = np.nan
+    report = validate_trajectory(trajectory, fps, table)
+
+    assert not report["valid"]
+    # joint 2 beyond its upper bound from frame 30, joint 4 not finite at frame 40
+    assert list(report["bound_frames"]) == list(range(30, 50))
+    # the jump arrives at frame 30 and accelerates through frames 29 and 30
+    assert list(report["velocity_frames"]) == [30]
+    assert list(report["acceleration_frames"]) == [29, 30]
+    assert report["position_utilization"][4] == np.inf
+    assert np.isclose(report["velocity_utilization"][2], 1.9 * fps / table.velocity_limits[2])
+
+    with pytest.raises(ValueError):
+        validate_trajectory(trajectory[:, :5], fps, table)
+
+    # single frames have no derivatives
+    report = validate_trajectory(trajectory[:1], fps, table)
+    assert report["valid"] and np.all(report["velocity_utilization"] == 0)
+
+
+def test_execution_gate():
+    table = JointTable.from_devices(DEVICES)
+    robot = TableRobot(table)
+    trajectory = retimed_trajectory(table)
+    assert check_trajectory(robot, trajectory, 120)["valid"]
+    assert check_trajectory(TableRobot(None), trajectory, 1000) is None
+
+    execution = SlomoModeExecution(robot, trajectory, fps=1000)
+    with pytest.raises(RuntimeError):
+        execution.execute()
+    assert len(robot.commands) == 0
+
+    # stop-motion routines only check the joint bounds
+    assert not check_trajectory(robot, trajectory, 1000, bounds_only=True)["valid"]
+    out_of_bounds = trajectory.copy()
+    out_of_bounds[10, 2] = 3.0
+    with pytest.raises(RuntimeError):
+        check_trajectory(robot, out_of_bounds, 1, bounds_only=True)
+
+
+def test_validation_time():
+    table = JointTable.from_devices(DEVICES)
+    trajectory = np.random.RandomState(0).uniform(-1, 1, (10000, 6))
+    validate_trajectory(trajectory, 60, table)
+    start = time.perf_counter()
+    for _ in range(10):
+        validate_trajectory(trajectory, 60, table)
+    assert (time.perf_counter() - start) / 10 < 0.02
+
+
+def test_retimed_plans_pass_the_gate():
+    # recordings through random waypoints, with sharp turns between them. The waypoints
+    # stay within half the joint ranges, the planned spline overshoots them at the turns.
+    table = JointTable.from_devices(DEVICES)
+    random = np.random.RandomState(1)
+    fps = 120
+    for _ in range(10):
+        waypoints = random.uniform(0.5 * table.lower, 0.5 * table.upper, (8, len(DEVICES)))
+        robot = TableRobot(table, waypoints.tolist())
+        planner = DirectPlanner(robot)
+        for _ in waypoints:
+            planner.record()
+        for eased in [False, True]:
+            trajectory, duration = planner.plan_retimed(fps=fps, eased=eased)
+            assert check_trajectory(robot, trajectory, fps)["valid"]
+            SlomoModeExecution(robot, trajectory, fps).validate()
@@ -0,0 +1,103 @@
+from cinebot_mini.geometry_utils.transformation_tree import TransformationTree
+from ikpy.chain import Chain
+import numpy as np
+import os
+
+URDF_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                         "..", "cinebot_mini", "robot_abstraction", "Cinebot.URDF")
+
+
+def translation(x, y, z):
+    matrix = np.eye(4)
+    matrix[:3, 3] = [x, y, z]
+    return matrix
+
+
+def build_tree():
+    chain = Chain.from_urdf_file(URDF_FILE)
+    chain.name = "arm"
+    tf_tree = TransformationTree()
+    tf_tree.add_node("ROOT", "real_root", translation(1.0, 0.0, 0.0))
+    tf_tree.add_chain("real_root", chain)
+    tf_tree.add_node("joint5", "camera", translation(0.0, 0.0, 0.05))
+    tf_tree.add_node("real_root", "subject", translation(0.0, 0.5, 0.0))
+    return tf_tree, chain
+
+
+def test_get_transform():
+    tf_tree, chain = build_tree()
+    state = [0.1, -0.6, -1.2, 2.0, 1.0, 0.5]
+    tf_tree.set_chain_state("arm", state)
+    frames = chain.forward_kinematics([0] + state, full_kinematics=True)
+
+    camera_to_real_root = frames[-1] @ translation(0.0, 0.0, 0.05)
+    assert np.allclose(tf_tree.get_transform("camera", "real_root"), camera_to_real_root)
+    assert np.allclose(tf_tree.get_transform("camera"), translation(1.0, 0.0, 0.0) @ camera_to_real_root)
+    assert np.allclose(tf_tree.get_transform("real_root", "camera"), np.linalg.inv(camera_to_real_root))
+    assert np.allclose(tf_tree.get_transform("joint5", "joint2"), np.linalg.inv(frames[3]) @ frames[6])
+    # different branches
+    expected = np.linalg.inv(translation(0.0, 0.5, 0.0)) @ camera_to_real_root
+    assert np.allclose(tf_tree.get_transform("camera", "subject"), expected)
+
+
+def test_invalidation():
+    tf_tree, chain = build_tree()
+    tf_tree.get_transform("camera")
+    tf_tree.get_transform("subject")
+    compiled = tf_tree.compile()
+    assert compiled.valid[compiled.ids["camera"]]
+
+    state = [0.3, 0.2, -0.4, 0.5, 0.6, -0.7]
+    tf_tree.set_chain_state("arm", state)
+    assert not compiled.valid[compiled.ids["camera"]]
+    assert compiled.valid[compiled.ids["subject"]]
+    frames = chain.forward_kinematics([0] + state, full_kinematics=True)
+    assert np.allclose(tf_tree.get_transform("joint3", "real_root"), frames[4])
+
+    tf_tree.set_node_transform("real_root", translation(0.0, 2.0, 0.0))
+    assert [compiled.names[i] for i in np.flatnonzero(compiled.valid)] == ["ROOT"]
+    assert np.allclose(tf_tree.get_transform("subject"), translation(0.0, 2.5, 0.0))
+    assert np.allclose(tf_tree.get_transform("joint3"), translation(0.0, 2.0, 0.0) @ frames[4])
+
+    # adding a node recompiles the tree
+    tf_tree.add_node("subject", "light", translation(0.0, 0.0, 1.0))
+    assert tf_tree.compile() is not compiled
+    assert np.allclose(tf_tree.get_transform("light"), translation(0.0, 2.5, 1.0))
+
+
+def test_compiled_layout():
+    tf_tree, chain = build_tree()
+    compiled = tf_tree.compile()
+    assert compiled.names[0] == "ROOT"
+    assert np.all(compiled.parents[1:] < np.arange(1, compiled.num_nodes()))
+    start, stop = compiled.chain_ranges["arm"]
+    assert compiled.names[start: stop] == [link.name for link in chain.links[1:]]
+    # the camera is in the subtree of the chain
+    real_root = compiled.ids["real_root"]
+    assert real_root < compiled.ids["camera"] < compiled.subtree_end[real_root]
+    assert compiled.subtree_end[compiled.ids["subject"]] == compiled.ids["subject"] + 1
+
+
+def test_transforms_trajectory():
+    tf_tree, chain = build_tree()
+    rng = np.random.RandomState(0)
+    configs = rng.uniform(-1, 1, (50, 6))
+    root_trajectory = np.array([translation(*offset) for offset in rng.uniform(-1, 1, (50, 3))])
+    frame_names = list(tf_tree.transforms.keys())
+
+    result = tf_tree.get_transforms_trajectory(
+        frame_names, {"arm": configs}, {"real_root": root_trajectory})
+    assert result.shape == (50, len(frame_names), 4, 4)
+
+    for t in range(50):
+        tf_tree.set_chain_state("arm", configs[t])
+        tf_tree.set_node_transform("real_root", root_trajectory[t])
+        for k, frame_name in enumerate(frame_names):
+            assert np.allclose(result[t, k], tf_tree.get_transform(frame_name))
+
+    # chains without a trajectory keep their current state
+    result = tf_tree.get_transforms_trajectory(["camera", "subject"], node_trajectories={"real_root": root_trajectory})
+    for t in range(50):
+        tf_tree.set_node_transform("real_root", root_trajectory[t])
+        assert np.allclose(result[t, 0], tf_tree.get_transform("camera"))
+        assert np.allclose(result[t, 1], tf_tree.get_transform("subject"))